@@ -1,17 +1,39 @@
-from dash import Dash, html, dash_table, dcc, callback, Output, Input, exceptions, State
+from dash import (
+    Dash,
+    html,
+    dash_table,
+    dcc,
+    callback,
+    Output,
+    Input,
+    exceptions,
+    State,
+    Patch,
+    no_update,
+)
 import dash_bootstrap_components as dbc
+import argparse
 import datetime
+import os
+import re
+import flask
 import plotly.graph_objects as go
 import plotly.subplots
 import plotly
-import pandas as pd
-import yfinance as yf
 import polars as pl
-import sqlalchemy as sql
 from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from plotly.subplots import make_subplots
 
+import cache
+import downsample
+import encoding
+import indicators
+import jobs
+import prices
+import storage
+
 colors = {
     "teal": "#0aabcf",
     "lightgreen": "#4aed90",
@@ -20,7 +42,151 @@ colors = {
     "maingraphcolor": "#5eb2c4",
 }
 
-app = Dash(__name__, external_stylesheets=[dbc.themes.CYBORG])
+# how much filing history a ticker is loaded with. most of the time only the last few years are looked at (the range buttons on the graphs go up to 5Y),
+# so only the filings inside the window are read (a range seek on the (ticker, filing date) index) and the prices start a year before the first of them.
+# "all" loads the whole history. the default comes from the environment, the dropdown next to the ticker input picks another one per submit
+WINDOW_YEARS = {"1Y": 1, "5Y": 5, "10Y": 10, "all": None}
+WINDOW_LABELS = {
+    "1Y": "Last year",
+    "5Y": "Last 5 years",
+    "10Y": "Last 10 years",
+    "all": "All filings",
+}
+DEFAULT_WINDOW = os.environ.get("INSIDER_WINDOW", "5Y")
+if DEFAULT_WINDOW not in WINDOW_YEARS:
+    DEFAULT_WINDOW = "5Y"
+
+
+# the trailing windows and signals getTransData.py computes (SIGNAL_WINDOWS / SIGNALS there), with the labels the dropdowns show
+SCREENER_WINDOWS = {30: "Last 30 days", 90: "Last 90 days", 365: "Last year"}
+SCREENER_SIGNALS = {
+    "cluster_buys": "Cluster buys",
+    "net_value": "Net dollar buying",
+    "buy_sell_ratio": "Buy / sell ratio",
+    "buy_gap_days": "First buy in years",
+}
+SCREENER_ROWS = 100
+SCREENER_COLUMNS = [
+    {"name": "Ticker", "id": "ticker", "type": "text"},
+    {"name": "Buys", "id": "cluster_buys", "type": "numeric"},
+    {"name": "Sells", "id": "sells", "type": "numeric"},
+    {
+        "name": "Net Bought ($)",
+        "id": "net_value",
+        "type": "numeric",
+        "format": dash_table.FormatTemplate.money(0),
+    },
+    {
+        "name": "Buy/Sell",
+        "id": "buy_sell_ratio",
+        "type": "numeric",
+        "format": dash_table.Format.Format(
+            precision=2, scheme=dash_table.Format.Scheme.fixed
+        ),
+    },
+    {"name": "Years Since Last Buy", "id": "buy_gap_years", "type": "numeric"},
+    {"name": "Last Filing", "id": "last_filing", "type": "text"},
+]
+
+
+def screener_layout():
+    """The screener page: a window and a signal to rank by, and the table of the top SCREENER_ROWS tickers. The rows are filled in by update_screener"""
+    return [
+        html.Div(
+            id="screenercontrols",
+            children=[
+                html.H6("Insider Screener", id="screenerheader"),
+                dbc.Select(
+                    id="screener_window",
+                    options=[
+                        {"label": label, "value": days}
+                        for days, label in SCREENER_WINDOWS.items()
+                    ],
+                    value=90,
+                ),
+                dbc.Select(
+                    id="screener_signal",
+                    options=[
+                        {"label": label, "value": signal}
+                        for signal, label in SCREENER_SIGNALS.items()
+                    ],
+                    value="cluster_buys",
+                ),
+            ],
+        ),
+        html.Div(id="screener_note"),
+        dash_table.DataTable(
+            id="screener_table",
+            columns=SCREENER_COLUMNS,
+            data=[],
+            page_size=SCREENER_ROWS,
+            fixed_rows={"headers": True},
+            style_table={"height": "70vh", "overflowY": "auto"},
+            style_header={
+                "color": "#5EB2C4",
+                "fontFamily": "white-rabbit",
+                "fontWeight": "bold",
+                "backgroundColor": "#060606",
+            },
+            style_cell={
+                "color": "#5465e3",
+                "fontFamily": "white-rabbit",
+                "textAlign": "center",
+                "backgroundColor": "#060606",
+                "border": "2px solid #5465e3",
+                "cursor": "pointer",
+            },
+        ),
+    ]
+
+
+# forward return horizons (trading days) support_scripts/eventStudy.py computes, HORIZONS there
+EVENT_HORIZONS = [5, 20, 60, 250]
+EVENT_SIDES = {"A": "Buys", "D": "Sells"}
+EVENT_COLUMNS = [
+    {"name": "Scope", "id": "scope", "type": "text"},
+    {"name": "Side", "id": "side", "type": "text"},
+    {"name": "Horizon (days)", "id": "horizon", "type": "numeric"},
+    {"name": "Events", "id": "events", "type": "numeric"},
+    {"name": "Mean Return (%)", "id": "mean_return", "type": "numeric"},
+    {"name": "Median Return (%)", "id": "median_return", "type": "numeric"},
+    {"name": "Hit Rate (%)", "id": "hit_rate", "type": "numeric"},
+]
+
+
+def events_layout():
+    """The event study tab: forward returns after insider buys and sells, market wide and for the shown ticker. Filled in by update_events"""
+    return [
+        html.H6("Returns After Insider Transactions", id="eventsheader"),
+        html.Div(id="events_note"),
+        dcc.Graph(id="events_graph", figure=go.Figure()),
+        dash_table.DataTable(
+            id="events_table",
+            columns=EVENT_COLUMNS,
+            data=[],
+            style_header={
+                "color": "#5EB2C4",
+                "fontFamily": "white-rabbit",
+                "fontWeight": "bold",
+                "backgroundColor": "#060606",
+            },
+            style_cell={
+                "color": "#5465e3",
+                "fontFamily": "white-rabbit",
+                "textAlign": "center",
+                "backgroundColor": "#060606",
+                "border": "2px solid #5465e3",
+            },
+        ),
+    ]
+
+
+# the graphs only exist once a ticker has been submitted, so their zoom callbacks refer to ids that arent in the initial layout
+app = Dash(
+    __name__,
+    external_stylesheets=[dbc.themes.CYBORG],
+    suppress_callback_exceptions=True,
+)
 app.title = "SEC Insider Trading Dashboard"
 app.layout = html.Div(
     id="bodydiv",
@@ -45,6 +211,8 @@ app.layout = html.Div(
                             options=[
                                 {"label": "Insider", "value": 1},
                                 {"label": "Technical", "value": 2},
+                                {"label": "Screener", "value": 3},
+                                {"label": "Event Study", "value": 4},
                             ],
                             value=1,
                         ),
@@ -60,15 +228,40 @@ app.layout = html.Div(
                             type="text",
                             placeholder="Enter Stock Ticker",
                         ),
-                        dbc.Button(
-                            "Submit",
-                            id="submit_button",
+                        html.Div(
+                            id="submitrow",
+                            children=[
+                                # how much of the filing history gets loaded, see WINDOW_YEARS
+                                dbc.Select(
+                                    id="window_select",
+                                    options=[
+                                        {"label": label, "value": window}
+                                        for window, label in WINDOW_LABELS.items()
+                                    ],
+                                    value=DEFAULT_WINDOW,
+                                ),
+                                dbc.Button(
+                                    "Submit",
+                                    id="submit_button",
+                                ),
+                            ],
                         ),
                     ],
                 ),
             ],
         ),
-        html.Div(id="maindiv", children=[]),
+        # the className picks which page is shown, see the clientside callback under get_layout
+        html.Div(id="maindiv", className="insider", children=[]),
+        # the screener isnt about one ticker so it lives outside maindiv and survives a submit, the css shows it when maindiv has the screener class
+        html.Div(id="screenerdiv", children=screener_layout()),
+        # same for the event study, it shows the market and the ticker from shown_ticker
+        html.Div(id="eventsdiv", children=events_layout()),
+        # ticker and date window the pages currently show, the zoom / table callbacks need them to fetch the cached data again
+        dcc.Store(id="shown_ticker"),
+        dcc.Store(id="shown_window"),
+        # ticker the technical page has been built for and the request to build it, the page is only made the first time it is opened
+        dcc.Store(id="page2_ticker"),
+        dcc.Store(id="page2_request"),
     ],
 )
 
@@ -76,136 +269,497 @@ app.layout = html.Div(
 @app.callback(
     # this makes it so the update function will only be called when the submit button is pressed. note the submit button is the only input and the text input is a state
     Output("maindiv", "children"),
-    [Input("submit_button", "n_clicks"), Input("radios", "value")],
-    [State("ticker_input", "value")],
+    Output("shown_ticker", "data"),
+    Output("shown_window", "data"),
+    Output("page2_ticker", "data"),
+    [Input("submit_button", "n_clicks")],
+    [State("ticker_input", "value"), State("window_select", "value")],
 )
 # also note the order of which the arguments are passed, input first then the text input value
-def get_layout(n_clicks, value, ticker_input):
+def get_layout(n_clicks, ticker_input, window):
+    """Lays out the insider page for a ticker and an empty container for the technical page. The loading itself runs as a background job (see jobs.py),
+    this only queues it and returns placeholders that poll_page_1 swaps for the table and the figures as they come in. Switching between the pages is
+    done in the browser, the technical page gets filled in by get_page_2_layout the first time it is shown
+    """
     if n_clicks is None:
         raise exceptions.PreventUpdate()
 
     # Input validation
     if len(ticker_input) > 5 or not ticker_input.isalpha() or len(ticker_input) == 0:
-        return html.H1("Invalid stock ticker input", style={"text-align": "center"})
+        return (
+            html.H1("Invalid stock ticker input", style={"text-align": "center"}),
+            None,
+            None,
+            None,
+        )
+
+    ticker = ticker_input.upper().strip()
+    window = window if window in WINDOW_YEARS else DEFAULT_WINDOW
+    job_id = job_queue.submit(
+        ("insider", *ticker_key(ticker, window)), page_1_steps(ticker, window)
+    )
+    page_1 = html.Div(
+        id="horizontaldiv",
+        children=[
+            dcc.Store(id="page1_job", data={"id": job_id, "sent": []}),
+            dcc.Interval(id="page1_poll", interval=POLL_INTERVAL),
+            html.Div(
+                id="graphdiv",
+                children=[
+                    dcc.Graph(figure=loading_figure(ticker), id="main_graph"),
+                    dcc.Graph(figure=loading_figure(ticker), id="histogram"),
+                ],
+            ),
+            html.Div(
+                id="tablediv",
+                children=[
+                    # header for the table:
+                    dbc.Row(
+                        html.H6(
+                            f"Insider Transaction Data for {ticker}",
+                            id="tableheader",
+                        )
+                    ),
+                    html.Div(id="innertablediv", children=[]),
+                ],
+            ),
+        ],
+    )
+    return [page_1, html.Div(id="page2div", children=[])], ticker, window, None
 
-    stock_data, db_df = get_stock_data(ticker_input)
 
-    # check which radio button is selected
-    if value == 1:
-        return html.Div(
-            id="horizontaldiv",
-            children=[
-                html.Div(
-                    id="graphdiv",
-                    children=[
-                        dcc.Graph(
-                            figure=get_main_graph(ticker_input, stock_data, db_df),
-                            id="main_graph",
-                        ),
-                        dcc.Graph(
-                            figure=histogram_df_manipulation(
-                                ticker_input, stock_data, db_df
-                            ),
-                            id="histogram",
-                        ),
-                    ],
-                ),
-                html.Div(
-                    id="tablediv",
-                    children=[
-                        # header for the table:
-                        dbc.Row(
-                            html.H6(
-                                f"Insider Transaction Data for {ticker_input.upper()}",
-                                id="tableheader",
-                            )
-                        ),
-                        html.Div(
-                            id="innertablediv",
-                            children=[
-                                dbc.Table.from_dataframe(
-                                    get_table_df(db_df),
-                                    id="table",
-                                ),
-                            ],
-                        ),
-                    ],
-                ),
-            ],
+def page_1_steps(ticker, window):
+    # the table comes first (it only needs the data), then the figures. both pages share the same cached data for the ticker (see load_ticker)
+    return [
+        ("data", lambda results: ticker_data(ticker, window)),
+        (
+            "table",
+            lambda results: get_table(
+                ticker, results["data"]["stock_data"], results["data"]["since"]
+            ),
+        ),
+        (
+            "main_graph",
+            lambda results: get_main_graph(
+                ticker, results["data"]["stock_data"], results["data"]["db_df"]
+            ),
+        ),
+        (
+            "histogram",
+            lambda results: histogram_df_manipulation(
+                ticker,
+                results["data"]["stock_data"],
+                results["data"]["monthly_volume"],
+            ),
+        ),
+    ]
+
+
+@app.callback(
+    Output("innertablediv", "children"),
+    Output("main_graph", "figure"),
+    Output("histogram", "figure"),
+    Output("horizontaldiv", "children"),
+    Output("page1_job", "data"),
+    Output("page1_poll", "disabled"),
+    Input("page1_poll", "n_intervals"),
+    State("page1_job", "data"),
+)
+def poll_page_1(n_intervals, job_state):
+    parts, job_state, done, error = collect(
+        job_state, ["table", "main_graph", "histogram"]
+    )
+    page = no_update if error is None else error_message(error)
+    return *parts, page, job_state, done
+
+
+# page switching never goes to the server: the radio only swaps the className of maindiv (the css hides the other pages) and asks for the technical page
+# to be built when it is opened for a ticker it hasnt been built for yet. after that its figures stay in the page and switching back and forth is free
+app.clientside_callback(
+    """
+    function(page, shown, built, shownWindow) {
+        const request = page === 2 && shown && shown !== built ? {ticker: shown, window: shownWindow, at: Date.now()} : window.dash_clientside.no_update;
+        return [{1: "insider", 2: "technical", 3: "screener", 4: "events"}[page], request];
+    }
+    """,
+    Output("maindiv", "className"),
+    Output("page2_request", "data"),
+    Input("radios", "value"),
+    Input("shown_ticker", "data"),
+    State("page2_ticker", "data"),
+    State("shown_window", "data"),
+)
+
+
+@app.callback(
+    Output("page2div", "children"),
+    Output("page2_ticker", "data", allow_duplicate=True),
+    Input("page2_request", "data"),
+    prevent_initial_call=True,
+)
+def get_page_2_layout(request):
+    # same as the insider page, the figures are made by a background job and poll_page_2 fills them in
+    ticker, window = request["ticker"], request["window"]
+    job_id = job_queue.submit(
+        ("technical", *ticker_key(ticker, window)), page_2_steps(ticker, window)
+    )
+    return [
+        dcc.Store(id="page2_job", data={"id": job_id, "sent": []}),
+        dcc.Interval(id="page2_poll", interval=POLL_INTERVAL),
+        dcc.Graph(figure=loading_figure(ticker), id="main_fig_2"),
+        dcc.Graph(figure=loading_figure(ticker), id="ta_fig_2"),
+        dcc.Graph(figure=loading_figure(ticker), id="bollinger_fig_2"),
+    ], ticker
+
+
+@app.callback(
+    Output("main_fig_2", "figure"),
+    Output("ta_fig_2", "figure"),
+    Output("bollinger_fig_2", "figure"),
+    Output("page2div", "children", allow_duplicate=True),
+    Output("page2_job", "data"),
+    Output("page2_poll", "disabled"),
+    Input("page2_poll", "n_intervals"),
+    State("page2_job", "data"),
+    prevent_initial_call="initial_duplicate",
+)
+def poll_page_2(n_intervals, job_state):
+    parts, job_state, done, error = collect(
+        job_state, ["main_fig_2", "ta_fig_2", "bollinger_fig_2"]
+    )
+    page = no_update if error is None else error_message(error)
+    return *parts, page, job_state, done
+
+
+def collect(job_state, parts):
+    """The parts of a page's job that are done but havent been sent to the page yet, for the poll callbacks
+
+    Args:
+        job_state (dict): the page's job store, the job id and the parts already sent
+        parts (list[str]): names of the job steps the poll callback has outputs for, in output order
+
+    Returns:
+        tuple[list, dict, bool, str]: the new parts (no_update for the others), the updated job store, whether the job is finished
+        (polling stops) and an error message for the page if it failed
+    """
+    job = job_queue.get(job_state["id"])
+    if job is None:
+        return (
+            [no_update] * len(parts),
+            job_state,
+            True,
+            "Please submit the ticker again",
         )
-    else:
-        main_fig, ta_fig, bollinger_fig = get_page_2(ticker_input)
-        return html.Div(
-            id="page2div",
-            children=[
-                dcc.Graph(figure=main_fig, id="main_fig_2"),
-                dcc.Graph(figure=ta_fig, id="ta_fig_2"),
-                dcc.Graph(figure=bollinger_fig, id="bollinger_fig_2"),
-            ],
+    # done before results, a finished job has published all of its results
+    done = job.done
+    results, sent = job.results, set(job_state["sent"])
+    values = []
+    for part in parts:
+        if part in results and part not in sent:
+            values.append(results[part])
+            sent.add(part)
+        else:
+            values.append(no_update)
+    error = None
+    if job.error is not None:
+        error = (
+            str(job.error)
+            if isinstance(job.error, LookupError)
+            else f"Something went wrong loading {job.key[1]}"
         )
+    return values, {"id": job.id, "sent": sorted(sent)}, done, error
+
+
+def error_message(text):
+    return html.H1(text, style={"text-align": "center"})
+
+
+def loading_figure(ticker):
+    """Empty placeholder shown in place of a figure until its job step is done"""
+    fig = go.Figure()
+    fig.update_layout(
+        annotations=[
+            dict(
+                text=f"Loading {ticker}...",
+                showarrow=False,
+                font=dict(family="white-rabbit", size=18, color="#5eb2c4"),
+            )
+        ],
+        xaxis_visible=False,
+        yaxis_visible=False,
+        paper_bgcolor="#7b8b8f",
+        plot_bgcolor="#7b8b8f",
+    )
+    return fig
+
+
+# background jobs for the slow part of a ticker load, the number of workers can be set from the environment or the command line.
+# the pages poll their job every POLL_INTERVAL ms until it is done
+job_queue = jobs.JobQueue(workers=int(os.environ.get("INSIDER_WORKERS", 4)))
+POLL_INTERVAL = 250
+
+
+# time spent on each step of the recent jobs, and how long they waited for a worker
+@app.server.route("/job-stats")
+def job_stats():
+    return flask.jsonify(job_queue.stats())
 
 
-def get_stock_data(ticker_input):
+# prepared data for recently viewed tickers, shared by both pages and every user. size in MB and time to live in seconds can be set from the environment
+ticker_cache = cache.TTLCache(
+    max_bytes=int(os.environ.get("INSIDER_CACHE_MB", 256)) * 1024 * 1024,
+    ttl=float(os.environ.get("INSIDER_CACHE_TTL", 3600)),
+)
+
+
+def window_start(window):
+    """First filing date a window includes, YYYY-MM-DD, None for the whole history. Rounded down to the first of the month so it stays the same
+    all month long (the cache keys, the saved indicator state for the window)
     """
-    Once a ticker is supplied this function gets all necessary data for that given stock. Uses the local DB and yfinance
+    years = WINDOW_YEARS[window]
+    if years is None:
+        return None
+    today = date.today()
+    return date(today.year - years, today.month, 1).isoformat()
+
+
+def ticker_key(ticker, window=DEFAULT_WINDOW):
+    # the data version and todays date make a newly loaded quarter or a new trading day a different entry, each window is an entry of its own
+    return ticker, window, storage.data_version(), date.today()
+
+
+def ticker_data(ticker, window=DEFAULT_WINDOW):
+    # load_ticker for the job steps, a ticker without any filings (in the window) ends the job with the message for the page
+    data = load_ticker(ticker, window)
+    if data["stock_data"] is None:
+        since = data["since"]
+        raise LookupError(
+            f"No insider transactions found for {ticker}"
+            + ("" if since is None else f" since {since}")
+        )
+    return data
+
+
+def load_ticker(ticker_input, window=DEFAULT_WINDOW):
+    """Everything both pages need for a ticker: the price history, the insider transactions and the technical indicators. Computed once and then served
+    from ticker_cache, the key includes the date window, the data version and todays date so a newly loaded quarter or a new trading day gives a fresh entry.
+    The cached frames are shared, nothing downstream is allowed to modify them in place.
     """
-    """TODO: add try / except here"""
-    # will have to implement checks to prevent sqli just because itll be fun to do so
     ticker = ticker_input.upper().strip()
-
-    engine = sql.create_engine(
-        "sqlite:////home/kole/pythonStuff/dataAnalyticsProj/insiderdashboard/real.db"
+    window = window or DEFAULT_WINDOW
+    return ticker_cache.get_or_compute(
+        ticker_key(ticker, window), lambda: prepare_ticker(ticker, window)
     )
-    con = engine.connect()
-    query = f'SELECT * FROM insider_data WHERE ISSUERTRADINGSYMBOL = "{ticker}"'
 
-    """TODO: add try / except here"""
-    # initialize dataframe with results from the query
-    db_df = pd.read_sql(query, con)
 
-    if len(db_df) == 0:
-        return html.H1(
-            f"No insider transactions found for {ticker}",
-            style={"text-align": "center"},
-        )
-    # access oldest avail insider transaction date
-    oldest_date = db_df["FILING_DATE"].min()
-    # subtract 2 years from oldest inside trade
+def prepare_ticker(ticker, window=DEFAULT_WINDOW):
+    # the monthly volume is another read of its own, it runs while get_stock_data waits on the rows / prices
+    since = window_start(window)
+    monthly_volume = io_pool.submit(storage.read_monthly_volume, ticker, since)
+    stock_data, db_df = get_stock_data(ticker, since)
+    if stock_data is None:
+        return {"stock_data": None, "db_df": db_df, "since": since}
+    return {
+        "stock_data": stock_data,
+        "db_df": db_df,
+        "since": since,
+        # every window starts its price history on a different day, each keeps its own saved indicator state
+        "indicators": indicators.with_indicators(
+            ticker if since is None else f"{ticker}.{window}", stock_data
+        ),
+        "monthly_volume": monthly_volume.result(),
+    }
+
+
+# exposes the hit / miss counts of the ticker cache
+@app.server.route("/cache-stats")
+def cache_stats():
+    return flask.jsonify(ticker_cache.stats())
+
+
+# reads for a ticker that dont depend on each other (insider rows, price history, monthly volume) run side by side on these threads.
+# separate from the job workers so a job waiting on its reads never waits for a job worker
+io_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("INSIDER_IO_THREADS", 8)),
+    thread_name_prefix="insider-io",
+)
+
+
+def get_stock_data(ticker_input, since=None):
+    """
+    Once a ticker is supplied this function gets all necessary data for that given stock. Uses the local DB and yfinance.
+    The price history only needs the date of the oldest filing, which comes from a cheap indexed MIN query, so the full insider rows are read
+    on the io_pool while the prices are fetched. A cold load takes about as long as the slower of the two instead of both added up.
+    With since only the filings from that day on are read and the prices start a year before the oldest of those
+    """
+    ticker = ticker_input.upper().strip()
+
+    # initialize dataframe with results from the configured backend (sqlite or parquet, see storage.py)
+    rows = io_pool.submit(storage.read_insider_data, ticker, since)
+    # access oldest avail insider transaction date (in the window)
+    oldest_date = storage.first_filing_date(ticker, since)
+    if oldest_date is None:
+        return None, rows.result()
+    # subtract 1 year from oldest inside trade
     oldest_date = (
         datetime.datetime.strptime(oldest_date, "%Y-%m-%d")
         - datetime.timedelta(days=365 * 1)
     ).date()
     todays_date = date.today().strftime("%Y-%m-%d")
-    # get stock data on the daily timeframe from the oldest avail insider (actions=True gives us info about stock split)
-    stock_data = yf.download(ticker, start=oldest_date, end=todays_date, actions=True)
-
-    # get all rows where stock splits are not = 0
-    split = stock_data[stock_data["Stock Splits"] != 0]
-    # if there are stock splits -> change the price per share to that stock close price on that given day (thus reflecting the stock split)
-    if len(split) > 0:
-        for index, row in db_df.iterrows():
-            try:
-                db_df.at[index, "TRANS_PRICEPERSHARE"] = round(
-                    stock_data.loc[row["FILING_DATE"], "Close"], 2
-                )
-            except KeyError:
-                db_df.drop(index)
+    # get stock data on the daily timeframe from the oldest avail insider, served from the local price cache (only the missing days get downloaded)
+    stock_data = prices.get_price_history(ticker, oldest_date, todays_date)
+    db_df = rows.result()
+
+    # put the insider prices / share counts on the same split adjusted basis as the price history
+    db_df = adjust_for_splits(db_df, stock_data)
 
     return stock_data, db_df
 
 
+def adjust_for_splits(db_df, stock_data):
+    """Adjusts the insider transactions for every stock split that happened after they were filed, so they line up with the split adjusted price history.
+    A filing gets the product of all the split ratios dated after its filing date (4.0 for a 4:1 split, 0.1 for a 1:10 reverse split), the price per share is
+    divided by it and the share counts multiplied by it. The factor for every filing is found with one as-of lookup (search_sorted) into the cumulative split factors.
+
+    Args:
+        db_df (pl.DataFrame): insider transactions, FILING_DATE as pl.Date
+        stock_data (pd.DataFrame): price history with the Stock Splits column, indexed by date
+
+    Returns:
+        pl.DataFrame: adjusted copy of db_df (or db_df itself if there were no splits)
+    """
+    split_dates, factor_after = split_factors(stock_data)
+    if len(split_dates) == 0:
+        return db_df
+    # first split strictly after each filing date -> a filing on the split day itself is already post split
+    position = pl.Series(split_dates.astype("datetime64[D]")).search_sorted(
+        db_df["FILING_DATE"], side="right"
+    )
+    factor = pl.Series(factor_after).gather(position)
+
+    return db_df.with_columns(
+        (pl.col("TRANS_PRICEPERSHARE") / factor).round(2),
+        pl.col("TRANS_SHARES") * factor,
+        pl.col("SHRS_OWND_FOLWNG_TRANS") * factor,
+    )
+
+
+def split_factors(stock_data):
+    """The split dates of a price history and the factor for filings before each of them
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: split dates, factor_after[i] = product of the ratios of split i and every split after it, with a trailing 1 for
+        filings after the last split
+    """
+    splits = stock_data.loc[stock_data["Stock Splits"] != 0, "Stock Splits"]
+    factor_after = np.append(np.cumprod(splits.values[::-1])[::-1], 1.0)
+    return splits.index.values, factor_after
+
+
 """ 
 START FIRST PAGE GRAPHS ------------------------
 """
 
 
+# the daily series in the graphs are downsampled (see downsample.py). these build the data of those traces, in the order the figures add them,
+# for the whole history when the figure is made and for the zoomed in range in the relayoutData callbacks below
+def main_graph_data(stock_data, x0=None, x1=None):
+    rows = downsample.view(stock_data, x0, x1)
+    return [dict(x=encoding.dates(rows.index), y=encoding.numbers(rows["Close"]))]
+
+
+def main_fig_data(df, x0=None, x1=None):
+    rows = downsample.view(df, x0, x1, downsample.ohlc_rows)
+    x = encoding.dates(rows.index)
+    candles = dict(
+        x=x,
+        open=encoding.numbers(rows["Open"]),
+        high=encoding.numbers(rows["High"]),
+        low=encoding.numbers(rows["Low"]),
+        close=encoding.numbers(rows["Close"]),
+    )
+    return [candles] + [
+        dict(x=x, y=encoding.numbers(rows[column]))
+        for column in ["50_day", "100_day", "200_day"]
+    ]
+
+
+def bollinger_data(df, x0=None, x1=None):
+    rows = downsample.view(df, x0, x1)
+    x = encoding.dates(rows.index)
+    return [
+        dict(x=x, y=encoding.numbers(rows[column]))
+        for column in ["Close", "LB", "UB", "20_day"]
+    ]
+
+
+def visible_range(relayout):
+    """The x range a graph was zoomed / panned to from its relayoutData, (None, None) once it is reset to the whole history.
+    Anything that didnt change the x axis (resizing, y axis scale buttons) doesnt need new data
+    """
+    relayout = relayout or {}
+    if relayout.get("xaxis.autorange"):
+        return None, None
+    if "xaxis.range[0]" in relayout:
+        return relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    if "xaxis.range" in relayout:
+        return tuple(relayout["xaxis.range"])
+    raise exceptions.PreventUpdate()
+
+
+def zoom_patch(build, frame, relayout, ticker, window):
+    """Swaps the data of the downsampled traces for the new x range, everything else in the figure (and the zoom itself) stays as it is in the browser"""
+    x0, x1 = visible_range(relayout)
+    data = load_ticker(ticker, window)
+    if data["stock_data"] is None:
+        raise exceptions.PreventUpdate()
+    patch = Patch()
+    for i, trace in enumerate(build(data[frame], x0, x1)):
+        for key, value in trace.items():
+            patch["data"][i][key] = encoding.packed(value)
+    return patch
+
+
+@app.callback(
+    Output("main_graph", "figure", allow_duplicate=True),
+    Input("main_graph", "relayoutData"),
+    State("shown_ticker", "data"),
+    State("shown_window", "data"),
+    prevent_initial_call=True,
+)
+def zoom_main_graph(relayout, ticker, window):
+    return zoom_patch(main_graph_data, "stock_data", relayout, ticker, window)
+
+
+@app.callback(
+    Output("main_fig_2", "figure", allow_duplicate=True),
+    Input("main_fig_2", "relayoutData"),
+    State("shown_ticker", "data"),
+    State("shown_window", "data"),
+    prevent_initial_call=True,
+)
+def zoom_main_fig(relayout, ticker, window):
+    return zoom_patch(main_fig_data, "indicators", relayout, ticker, window)
+
+
+@app.callback(
+    Output("bollinger_fig_2", "figure", allow_duplicate=True),
+    Input("bollinger_fig_2", "relayoutData"),
+    State("shown_ticker", "data"),
+    State("shown_window", "data"),
+    prevent_initial_call=True,
+)
+def zoom_bollinger_fig(relayout, ticker, window):
+    return zoom_patch(bollinger_data, "indicators", relayout, ticker, window)
+
+
 def get_main_graph(ticker, stock_data, db_df):
     """This function creates the main graph in the application. This graph shows the stock closing price with all insider transactions overlaid. This function handles much of the graph styling too.
 
     Args:
         ticker (str): _description_
         stock_data (pd.DataFrame): dataframe containing the daily stock closing price and its index is the date
-        db_df (pd.DataFrame): dataframe containing all of the insider transaction information for the particular stock
+        db_df (pl.DataFrame): dataframe containing all of the insider transaction information for the particular stock
 
     Returns:
         go.Figure: The main graph to be displayed in the application
@@ -213,9 +767,7 @@ def get_main_graph(ticker, stock_data, db_df):
     # print(db_df.head())
     fig = go.Figure()
     # stock_data.index is the date, then the y axis is plotting the closing price
-    fig.add_trace(
-        go.Scatter(x=stock_data.index, y=stock_data["Close"], name="Stock Price")
-    )
+    fig.add_trace(go.Scatter(**main_graph_data(stock_data)[0], name="Stock Price"))
     fig.update_traces(
         line_color="#5465e3",
     )
@@ -329,108 +881,91 @@ def get_main_graph(ticker, stock_data, db_df):
         plot_bgcolor="#5eb2c4",
         updatemenus=updatemenus,
     )
-    fig.update_xaxes()
-    return fig
+    return encoding.date_axes(fig)
 
 
-def add_insider_trace1(fig, db_df):
-    # Filter the DataFrame into buy and sell DataFrames
-    df_buy = db_df[db_df["TRANS_ACQUIRED_DISP_CD"] == "A"]
-    df_sell = db_df[db_df["TRANS_ACQUIRED_DISP_CD"] == "D"]
-
-    # create a scatter plot for the insider trading info:
-    insider_buy = go.Scatter(
-        x=df_buy["FILING_DATE"],
-        y=df_buy[
-            "TRANS_PRICEPERSHARE"
-        ],  # stock_data.loc[db_df['FILING_DATE'], 'Close'],
-        mode="markers",
-        marker=dict(color="green", size=8, opacity=0.7),
-        name="Insider Buys",
-        hovertext=db_df.apply(
-            lambda row: f"Insider Transaction Info:<br>Shares:{row['TRANS_SHARES']}<br>Avg Cost: ${row['TRANS_PRICEPERSHARE']}<br>Filed on {row['FILING_DATE']}",
-            axis=1,
-        ),
-        hoverinfo="text",
-        visible=True,
-    )
-    insider_sell = go.Scatter(
-        x=df_sell["FILING_DATE"],
-        y=df_sell[
-            "TRANS_PRICEPERSHARE"
-        ],  # stock_data.loc[db_df['FILING_DATE'], 'Close'],
-        mode="markers",
-        marker=dict(color="red", size=8, opacity=0.7),
-        name="Insider Sales",
-        hovertext=db_df.apply(
-            lambda row: f"Insider Transaction Info:<br>Shares:{row['TRANS_SHARES']}<br>Avg Cost: ${row['TRANS_PRICEPERSHARE']}<br>Filed on {row['FILING_DATE']}",
-            axis=1,
-        ),
-        hoverinfo="text",
-        visible=True,
-    )
+# hover text for the insider markers. plotly fills it in from each point's own values in the browser, so no per point strings get built or sent
+INSIDER_HOVER = "Insider Transaction Info:<br>Shares:%{customdata}<br>Avg Cost: $%{y}<br>Filed on %{x|%Y-%m-%d}<extra></extra>"
+
+
+def insider_traces(db_df, **kwargs):
+    """Builds the scatter traces for the insider buys and sales, used by both pages
+
+    Args:
+        db_df (pl.DataFrame): the insider transactions for the ticker
+        **kwargs: extra go.Scatter settings for both traces (visibility, legend)
+
+    Returns:
+        list[go.Scatter]: the buy trace and the sell trace
+    """
+    traces = []
+    for code, color, name in [
+        ("A", "green", "Insider Buys"),
+        ("D", "red", "Insider Sales"),
+    ]:
+        df = db_df.filter(pl.col("TRANS_ACQUIRED_DISP_CD") == code)
+        traces.append(
+            go.Scatter(
+                x=encoding.dates(df["FILING_DATE"].to_numpy()),
+                # exact prices even with float32 on, they are shown in the hover text
+                y=df["TRANS_PRICEPERSHARE"].to_numpy().astype(np.float64),
+                customdata=df["TRANS_SHARES"].to_numpy(),
+                mode="markers",
+                marker=dict(color=color, size=8, opacity=0.7),
+                name=name,
+                hovertemplate=INSIDER_HOVER,
+                **kwargs,
+            )
+        )
+    return traces
 
-    # Add traces to the figure
-    fig.add_trace(insider_buy)
-    fig.add_trace(insider_sell)
+
+def add_insider_trace1(fig, db_df):
+    fig.add_traces(insider_traces(db_df, visible=True))
     return fig
 
 
-def histogram_df_manipulation(ticker, stock_data, db_df):
-    """This function manipulates the insider data DataFrame creates monthly volume etc and creates the a histogram containing the insider trading volume and overlays the stock price (by calling helper method)
+def histogram_df_manipulation(ticker, stock_data, monthly_volume):
+    """This function lines the monthly insider trading volume up with the monthly average stock price and creates the histogram (by calling helper method).
+    The monthly volume comes precomputed from the rollup table maintained by the ingest (see storage.read_monthly_volume)
 
     Args:
         ticker (str): _description_
         stock_data (DataFrame): DataFrame containing the stock prices
-        db_df (DataFrame): DataFrame containing all of the insider transaction data for the stock ticker specified
+        monthly_volume (pl.DataFrame): monthly insider buy / sell dollar volume for the stock ticker specified
 
     Returns:
         go.Figure: The histogram to be displayed in the application
     """
-    # create date column
-    stock_data["Date"] = stock_data.index
-
-    # create new dataframe containing all of the dates, convert them to datetime objects and remove the date index
-    stock_date = stock_data[["Date"]]
-    stock_date["Date"] = pd.to_datetime(stock_date["Date"])
-    stock_date.reset_index(drop=True, inplace=True)
-
-    # group by filing date -> get duplicate dates sum the total shares and avg the price per share
-    db_df = (
-        db_df.groupby("FILING_DATE")
-        .agg(
-            TRANS_SHARES=("TRANS_SHARES", "sum"),
-            TRANSPRICEPERSHARE=("TRANS_PRICEPERSHARE", "mean"),
-            TRANS_ACQUIRED_DISP_CD=("TRANS_ACQUIRED_DISP_CD", "first"),
-        )
-        .reset_index()
+    # average close for every month of price history
+    monthly_close = (
+        price_frame(stock_data, "Close")
+        .group_by(pl.col("Date").dt.truncate("1mo").alias("month"))
+        .agg(pl.col("Close").mean())
+        .sort("month")
     )
 
-    # add new row called VOLUME made by multiplying shares and price per share then remove all other rows besides that and filing date
-    db_df["VOLUME"] = db_df["TRANS_SHARES"] * db_df["TRANSPRICEPERSHARE"]
-    db_df["Date"] = pd.to_datetime(db_df["FILING_DATE"])
-    # select only date, buy/sell and volume columns
-    db_df = db_df[["Date", "VOLUME", "TRANS_ACQUIRED_DISP_CD"]]
-
-    # merge dfs
-    volume_df = pd.merge(stock_date, db_df, on="Date", how="left")
-    # fill NaN with 0
-    volume_df.fillna({"VOLUME": 0}, inplace=True)
-    # set date back as the index
-    volume_df.set_index("Date", inplace=True)
-    # Create a 'quarter' column
-    volume_df["month"] = volume_df.index.to_period("M")
-    # Group by quarter and sum volume
-    monthly_data = volume_df.groupby("month")["VOLUME"].sum().reset_index()
-    # Convert PeriodIndex to Timestamp
-    monthly_data["month"] = monthly_data["month"].dt.to_timestamp()
-
-    stock_data = stock_data[["Close"]]
-    stock_data["month"] = stock_data.index.to_period("M")
-    monthly_stock = stock_data.groupby("month")["Close"].mean().reset_index()
-    monthly_stock["month"] = monthly_stock["month"].dt.to_timestamp()
-
-    return get_histogram(monthly_data, monthly_stock, ticker)
+    # total (buys + sells) dollar volume per month, months without any insider transactions are 0
+    volume = monthly_volume.select(
+        "month", VOLUME=pl.col("buy_value") + pl.col("sell_value")
+    )
+    monthly = monthly_close.join(volume, on="month", how="left").with_columns(
+        pl.col("VOLUME").fill_null(0.0)
+    )
+
+    return get_histogram(
+        monthly.select("month", "VOLUME"), monthly.select("month", "Close"), ticker
+    )
+
+
+def price_frame(stock_data, *columns):
+    """Columns of the (pandas, date indexed) price history as a polars frame with the day in a Date column, for the groupby work"""
+    return pl.DataFrame(
+        {
+            "Date": stock_data.index.to_numpy().astype("datetime64[D]"),
+            **{column: stock_data[column].to_numpy() for column in columns},
+        }
+    )
 
 
 def get_histogram(monthly_data, monthly_stock, ticker):
@@ -441,8 +976,8 @@ def get_histogram(monthly_data, monthly_stock, ticker):
     # Create the histogram
     fig.add_trace(
         go.Bar(
-            x=monthly_data["month"],
-            y=monthly_data["VOLUME"],
+            x=encoding.dates(monthly_data["month"].to_numpy()),
+            y=encoding.numbers(monthly_data["VOLUME"].to_numpy()),
             name="Insider Trading Volume",
             marker_color="#5eb2c4",
         ),
@@ -451,8 +986,8 @@ def get_histogram(monthly_data, monthly_stock, ticker):
     # Add stock price line trace with secondary y-axis
     fig.add_trace(
         go.Scatter(
-            x=monthly_data["month"],
-            y=monthly_stock["Close"],
+            x=encoding.dates(monthly_data["month"].to_numpy()),
+            y=encoding.numbers(monthly_stock["Close"].to_numpy()),
             name="Stock Price",
             line=dict(color="#5eb2c4"),
         ),
@@ -526,35 +1061,346 @@ def get_histogram(monthly_data, monthly_stock, ticker):
         secondary_y=True,
         type="log",
     )
-    return fig
+    return encoding.date_axes(fig)
+
+
+# rows the insider table sends to the browser at a time, the table only renders the rows scrolled into view (virtualization)
+TABLE_PAGE_SIZE = 100
+NUMERIC_COLUMNS = {"Shares", "Price", "Change in Holdings (%)"}
+# the filter operators the table can put in its filter_query -> the ones storage.read_table_page understands
+FILTER_OPERATORS = {
+    "eq": "=",
+    "=": "=",
+    "ne": "!=",
+    "!=": "!=",
+    "lt": "<",
+    "<": "<",
+    "le": "<=",
+    "<=": "<=",
+    "gt": ">",
+    ">": ">",
+    "ge": ">=",
+    ">=": ">=",
+    "contains": "contains",
+    "datestartswith": "startswith",
+}
 
 
-def get_table_df(db_df: pd.DataFrame) -> pd.DataFrame:
-    """Creates the table containing all of the insider transaction data. Also adds a change in holding columns by calculating the % change in insider holdings after the transaction.
+def get_table(ticker, stock_data, since=None):
+    """Creates the insider transaction table. Only the first page is in the layout, paging, sorting and filtering are done by the database in page_table
+    so the browser never gets more than TABLE_PAGE_SIZE rows at once, however many filings the ticker has.
+    Shares and price are split adjusted, the change in holdings is the % change in insider holdings after the transaction.
 
     Args:
-        db_df (pd.DataFrame): DataFrame containing the insider transaction data
+        ticker (str): cleaned up ticker
+        stock_data (pd.DataFrame): price history, for the split factors
+        since (str): first filing date of the ticker's date window, None for the whole history
 
     Returns:
-        pd.DataFrame: The updated DataFrame to be used in the creation of the dbc.Table, which will be displayed in the application.
+        list: the table and the store holding its paging state
     """
+    pages = table_pages(ticker, stock_data, storage.DEFAULT_SORT, [], since)
+    return [
+        dcc.Store(id="table_pages", data=pages),
+        dash_table.DataTable(
+            id="table",
+            columns=[
+                {
+                    "name": column,
+                    "id": column,
+                    "type": "numeric" if column in NUMERIC_COLUMNS else "text",
+                }
+                for column in storage.TABLE_COLUMNS
+            ],
+            data=table_rows(ticker, stock_data, pages, 0),
+            page_action="custom",
+            page_current=0,
+            page_size=TABLE_PAGE_SIZE,
+            page_count=page_count(pages),
+            sort_action="custom",
+            sort_mode="single",
+            sort_by=[],
+            filter_action="custom",
+            filter_query="",
+            fixed_rows={"headers": True},
+            virtualization=True,
+            style_table={"height": "100%", "overflowY": "auto"},
+            style_header={
+                "color": "#5EB2C4",
+                "fontFamily": "white-rabbit",
+                "fontWeight": "bold",
+                "backgroundColor": "#060606",
+            },
+            style_filter={"backgroundColor": "#7b8b8f"},
+            style_cell={
+                "color": "#5465e3",
+                "fontFamily": "white-rabbit",
+                "textAlign": "center",
+                "backgroundColor": "#060606",
+                "border": "2px solid #5465e3",
+            },
+        ),
+    ]
+
 
-    db_df["change"] = round(
-        ((db_df["TRANS_SHARES"] / db_df["SHRS_OWND_FOLWNG_TRANS"]) * 100), 2
+def table_pages(ticker, stock_data, sort, filters, since=None):
+    """Paging state of the table for one sort / filter: the number of matching rows and the keyset cursor each visited page ends with.
+    Lives in the table_pages store so it is json (lists, str keys)
+    """
+    return {
+        "sort": list(sort),
+        "filters": [list(part) for part in filters],
+        "since": since,
+        "count": storage.count_table_rows(
+            ticker, table_splits(stock_data), filters, since
+        ),
+        "cursors": {},
+    }
+
+
+def table_rows(ticker, stock_data, pages, page):
+    """Reads one page of the table, starting from the cursor of the page before it when that one has been read already. Remembers the cursor the page ends on"""
+    cursor = pages["cursors"].get(str(page))
+    rows, next_cursor = storage.read_table_page(
+        ticker,
+        table_splits(stock_data),
+        sort=tuple(pages["sort"]),
+        filters=[tuple(part) for part in pages["filters"]],
+        after=None if cursor is None else tuple(cursor),
+        offset=page * TABLE_PAGE_SIZE,
+        limit=TABLE_PAGE_SIZE,
+        since=pages["since"],
     )
+    if next_cursor is not None:
+        pages["cursors"][str(page + 1)] = list(next_cursor)
+    return rows.to_dicts()
+
 
-    new_columns = ["Date", "Shares", "Price", "Buy/Sell", "Change in Holdings (%)"]
-    table_df = pd.DataFrame(columns=new_columns)
+def page_count(pages):
+    return max(1, -(-pages["count"] // TABLE_PAGE_SIZE))
 
-    table_df["Date"] = db_df["FILING_DATE"]
-    table_df["Shares"] = db_df["TRANS_SHARES"]
-    table_df["Price"] = db_df["TRANS_PRICEPERSHARE"]
-    table_df["Buy/Sell"] = db_df["TRANS_ACQUIRED_DISP_CD"].map(
-        {"A": "Buy", "D": "Sell"}
+
+def table_splits(stock_data):
+    # (split date, factor for filings before it) pairs for the sql, same factors adjust_for_splits uses for the graphs
+    split_dates, factor_after = split_factors(stock_data)
+    return [
+        (str(day)[:10], float(factor)) for day, factor in zip(split_dates, factor_after)
+    ]
+
+
+def parse_filter(filter_query):
+    """Turns the table's filter_query ("{Price} > 10 && {Buy/Sell} contains Buy") into (column, operator, value) filters for storage.read_table_page.
+    Parts that dont parse (unknown column / operator, text in a number column) are left out
+    """
+    filters = []
+    for part in (filter_query or "").split(" && "):
+        match = re.fullmatch(r"\{(.+?)\}\s+(\S+)\s+(.+)", part.strip())
+        if match is None:
+            continue
+        column, operator, value = match.groups()
+        if column not in storage.TABLE_COLUMNS or operator not in FILTER_OPERATORS:
+            continue
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'`":
+            value = value[1:-1]
+        if column in NUMERIC_COLUMNS:
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+        filters.append((column, FILTER_OPERATORS[operator], value))
+    return filters
+
+
+@app.callback(
+    Output("table", "data"),
+    Output("table", "page_count"),
+    Output("table", "page_current"),
+    Output("table_pages", "data"),
+    Input("table", "page_current"),
+    Input("table", "sort_by"),
+    Input("table", "filter_query"),
+    State("table_pages", "data"),
+    State("shown_ticker", "data"),
+    State("shown_window", "data"),
+    prevent_initial_call=True,
+)
+def page_table(page, sort_by, filter_query, pages, ticker, window):
+    data = load_ticker(ticker, window)
+    if data["stock_data"] is None:
+        raise exceptions.PreventUpdate()
+    sort = storage.DEFAULT_SORT
+    if sort_by:
+        sort = (sort_by[0]["column_id"], sort_by[0]["direction"])
+    filters = parse_filter(filter_query)
+    # a new sort or filter starts over on the first page with fresh cursors
+    if [list(sort), [list(part) for part in filters]] != [
+        pages["sort"],
+        pages["filters"],
+    ]:
+        pages = table_pages(ticker, data["stock_data"], sort, filters, data["since"])
+        page = 0
+    rows = table_rows(ticker, data["stock_data"], pages, page or 0)
+    return rows, page_count(pages), page or 0, pages
+
+
+"""
+SCREENER PAGE ------------------------
+"""
+
+
+def screener_rows(window_days, signal):
+    """Top tickers for a window and signal as table rows (the row id is the ticker, see open_screener_ticker) and the as of date of the signals, None if there are none"""
+    signals = storage.read_signals(window_days, signal, SCREENER_ROWS)
+    as_of = signals["as_of"][0] if len(signals) else None
+    rows = signals.select(
+        pl.col("ticker").alias("id"),
+        "ticker",
+        "cluster_buys",
+        "sells",
+        pl.col("net_value").round(0),
+        "buy_sell_ratio",
+        buy_gap_years=(pl.col("buy_gap_days") / 365.25).round(1),
+        last_filing=pl.col("last_filing").dt.to_string("%Y-%m-%d"),
+    )
+    return rows.to_dicts(), as_of
+
+
+@app.callback(
+    Output("screener_table", "data"),
+    Output("screener_note", "children"),
+    Input("radios", "value"),
+    Input("screener_window", "value"),
+    Input("screener_signal", "value"),
+)
+def update_screener(page, window_days, signal):
+    # only read while the page is shown, every open reads again so a newly loaded quarter shows up without a restart (it is one index walk)
+    if page != 3 or signal not in SCREENER_SIGNALS:
+        raise exceptions.PreventUpdate()
+    rows, as_of = screener_rows(int(window_days), signal)
+    if as_of is None:
+        return (
+            [],
+            "No screener signals yet, run support_scripts/getTransData.py to build them",
+        )
+    days = int(window_days)
+    return (
+        rows,
+        f"{len(rows)} tickers with filings in the {days} days up to {as_of}, ranked by {SCREENER_SIGNALS[signal].lower()}. Click a row to open the ticker",
     )
-    table_df["Change in Holdings (%)"] = db_df["change"]
 
-    return table_df
+
+@app.callback(
+    Output("ticker_input", "value"),
+    Output("radios", "value"),
+    Output("submit_button", "n_clicks"),
+    Output("screener_table", "active_cell"),
+    Input("screener_table", "active_cell"),
+    State("submit_button", "n_clicks"),
+    prevent_initial_call=True,
+)
+def open_screener_ticker(active_cell, n_clicks):
+    # clicking a row loads its ticker on the insider page the same way the submit button does. the cell is unselected again so clicking the same row later still fires
+    if not active_cell or active_cell.get("row_id") is None:
+        raise exceptions.PreventUpdate()
+    return active_cell["row_id"], 1, (n_clicks or 0) + 1, None
+
+
+"""
+EVENT STUDY PAGE ------------------------
+"""
+
+
+def event_rows(stats):
+    """Statistics rows from storage.read_event_stats as table rows, returns in %"""
+    return stats.select(
+        scope=pl.when(pl.col("ticker") == storage.MARKET)
+        .then(pl.lit("Market"))
+        .otherwise(pl.col("ticker")),
+        side=pl.col("code").replace_strict(EVENT_SIDES, default=pl.col("code")),
+        horizon=pl.col("horizon"),
+        events=pl.col("events"),
+        mean_return=(pl.col("mean_return") * 100).round(2),
+        median_return=(pl.col("median_return") * 100).round(2),
+        hit_rate=(pl.col("hit_rate") * 100).round(1),
+    ).to_dicts()
+
+
+def get_events_figure(stats, ticker):
+    """Mean forward return per horizon as grouped bars, buys green and sells red, the market's faded next to the ticker's"""
+    fig = go.Figure()
+    labels = [f"{days} days" for days in EVENT_HORIZONS]
+    scopes = [(storage.MARKET, 0.5)] + ([(ticker, 1.0)] if ticker else [])
+    for scope, opacity in scopes:
+        for code, color in [("A", "green"), ("D", "red")]:
+            rows = stats.filter((pl.col("ticker") == scope) & (pl.col("code") == code))
+            if len(rows) == 0:
+                continue
+            mean = dict(zip(rows["horizon"].to_list(), rows["mean_return"].to_list()))
+            name = "Market" if scope == storage.MARKET else scope
+            fig.add_trace(
+                go.Bar(
+                    x=labels,
+                    y=[
+                        None if mean.get(days) is None else mean[days] * 100
+                        for days in EVENT_HORIZONS
+                    ],
+                    name=f"{name} {EVENT_SIDES[code].lower()}",
+                    marker=dict(color=color, opacity=opacity),
+                    hovertemplate="%{x}: %{y:.2f}%<extra>%{fullData.name}</extra>",
+                )
+            )
+    fig.update_layout(
+        barmode="group",
+        title=dict(
+            font=dict(family="white-rabbit", size=18, color="#5465e3", weight="bold"),
+            text="<b>Mean Return After Insider Transactions</b>",
+            x=0.1,
+        ),
+        xaxis_title="Trading days after the filing",
+        yaxis_title="Mean Return (%)",
+        legend=dict(
+            font=dict(family="white-rabbit", size=12, color="#5465e3", weight="bold"),
+        ),
+        paper_bgcolor="#7b8b8f",
+        plot_bgcolor="#5465e3",
+        xaxis_title_font=dict(
+            family="white-rabbit", size=14, color="#5465e3", weight="bold"
+        ),
+        yaxis_title_font=dict(
+            family="white-rabbit", size=14, color="#5465e3", weight="bold"
+        ),
+        xaxis_tickfont=dict(family="white-rabbit", weight="bold", color="#5465e3"),
+        yaxis_tickfont=dict(family="white-rabbit", weight="bold", color="#5465e3"),
+    )
+    fig.update_yaxes(showgrid=False)
+    return fig
+
+
+@app.callback(
+    Output("events_graph", "figure"),
+    Output("events_table", "data"),
+    Output("events_note", "children"),
+    Input("radios", "value"),
+    Input("shown_ticker", "data"),
+)
+def update_events(page, ticker):
+    # precomputed by eventStudy.py, so like the screener this is read again every time the tab is opened
+    if page != 4:
+        raise exceptions.PreventUpdate()
+    stats = storage.read_event_stats(ticker)
+    if len(stats) == 0:
+        return (
+            go.Figure(),
+            [],
+            "No event study results yet, run support_scripts/eventStudy.py to compute them",
+        )
+    note = "Forward returns from the first close on or after each filing date, over every insider filing with cached prices"
+    if ticker and not (stats["ticker"] == ticker).any():
+        note += (
+            f". No results for {ticker}, its prices werent cached when the study ran"
+        )
+    return get_events_figure(stats, ticker), event_rows(stats), note
 
 
 """ 
@@ -627,56 +1473,25 @@ updatemenus = [
 ]
 
 
-def get_page_2(ticker):
-    stock_data, db_df = get_stock_data(ticker)
-
-    stock_data["20_day"] = stock_data["Close"].rolling(window=20).mean()
-    stock_data["50_day"] = stock_data["Close"].rolling(window=50).mean()
-    stock_data["100_day"] = stock_data["Close"].rolling(window=100).mean()
-    stock_data["200_day"] = stock_data["Close"].rolling(window=200).mean()
-    # find crosses of the 50 day and 200 day
-    stock_data["crossover"] = 0
-    stock_data.loc[
-        (stock_data["50_day"] > stock_data["200_day"])
-        & (stock_data["50_day"].shift(1) <= stock_data["200_day"].shift(1)),
-        "crossover",
-    ] = 1
-    stock_data.loc[
-        (stock_data["50_day"] < stock_data["200_day"])
-        & (stock_data["50_day"].shift(1) >= stock_data["200_day"].shift(1)),
-        "crossover",
-    ] = -1
-
-    # Calculate the 20-period Standard Deviation (SD)
-    stock_data["SD"] = stock_data["Close"].rolling(window=20).std()
-
-    # Calculate the Upper Bollinger Band (UB) and Lower Bollinger Band (LB)
-    stock_data["UB"] = stock_data["20_day"] + 2 * stock_data["SD"]
-    stock_data["LB"] = stock_data["20_day"] - 2 * stock_data["SD"]
-
-    # Calculate RSI
-    delta = stock_data["Close"].diff()
-    gain = delta.copy()
-    loss = delta.copy()
-    gain[gain < 0] = 0
-    loss[loss > 0] = 0
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = abs(loss.rolling(window=14).mean())
-    rs = avg_gain / avg_loss
-    stock_data["rsi"] = 100 - (100 / (1 + rs))
-    # Calculate the percentage change
-    stock_data["pct_change"] = (
-        (stock_data["Close"] - stock_data["Open"]) / stock_data["Open"] * 100
-    )
-
-    # see if price increased or decreased for volume chart
-    stock_data["Increase"] = stock_data["Close"] >= stock_data["Open"]
-
-    main_fig = make_main_fig(stock_data, db_df, ticker)
-    ta_fig = make_ta_fig(stock_data, ticker)
-    bollinger_fig = make_bollinger_fig(stock_data, ticker)
-
-    return main_fig, ta_fig, bollinger_fig
+def page_2_steps(ticker, window):
+    """Job steps building the 3 figures on the technical page from the cached ticker data (see load_ticker)"""
+    return [
+        ("data", lambda results: ticker_data(ticker, window)),
+        (
+            "main_fig_2",
+            lambda results: make_main_fig(
+                results["data"]["indicators"], results["data"]["db_df"], ticker
+            ),
+        ),
+        (
+            "ta_fig_2",
+            lambda results: make_ta_fig(results["data"]["indicators"], ticker),
+        ),
+        (
+            "bollinger_fig_2",
+            lambda results: make_bollinger_fig(results["data"]["indicators"], ticker),
+        ),
+    ]
 
 
 def make_main_fig(df, db_df, ticker):
@@ -685,20 +1500,17 @@ def make_main_fig(df, db_df, ticker):
 
     Args:
         df (pd.DataFrame): df contianinng all of the stock price data along with SMAs, RSI, Volume and crossover columns
-        db_df (pd.DataFrame): df containing all of the insider transaction data
+        db_df (pl.DataFrame): df containing all of the insider transaction data
         ticker (str): the ticker that was input by the user
 
     Returns:
         go.Figure: a plotly figure containing all of the data described above
     """
     fig = go.Figure()
+    candles, sma_50, sma_100, sma_200 = main_fig_data(df)
     fig.add_trace(
         go.Candlestick(
-            x=df.index,
-            open=df["Open"],
-            high=df["High"],
-            low=df["Low"],
-            close=df["Close"],
+            **candles,
             name=f"{ticker} Stock Price",
             increasing_line_color="#4aed90",  # Green hex color
             decreasing_line_color="#e04343",  # Red hex color
@@ -710,8 +1522,7 @@ def make_main_fig(df, db_df, ticker):
     ) * 100
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["50_day"],
+            **sma_50,
             mode="lines",
             name="50 Day MA",
             line=dict(color="#b143e0"),
@@ -719,8 +1530,7 @@ def make_main_fig(df, db_df, ticker):
     )
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["100_day"],
+            **sma_100,
             mode="lines",
             name="100 Day MA",
             line=dict(color="#5eb2c4"),
@@ -728,8 +1538,7 @@ def make_main_fig(df, db_df, ticker):
     )
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["200_day"],
+            **sma_200,
             mode="lines",
             name="200 Day MA",
             line=dict(color="#436be0"),
@@ -785,7 +1594,7 @@ def make_main_fig(df, db_df, ticker):
         height=650,
         updatemenus=updatemenus,
     )
-    return fig
+    return encoding.date_axes(fig)
 
 
 def add_crosses(df, fig):
@@ -799,16 +1608,16 @@ def add_crosses(df, fig):
         go.Figure: The updated figure
     """
     golden_crosses = go.Scatter(
-        x=df[df["crossover"] == 1].index,
-        y=df[df["crossover"] == 1]["50_day"],
+        x=encoding.dates(df[df["crossover"] == 1].index),
+        y=encoding.numbers(df[df["crossover"] == 1]["50_day"]),
         mode="markers",
         marker=dict(size=12, color="#4aed90", line=dict(width=2, color="white")),
         name="Golden Cross",
     )
 
     death_crosses = go.Scatter(
-        x=df[df["crossover"] == -1].index,
-        y=df[df["crossover"] == -1]["50_day"],
+        x=encoding.dates(df[df["crossover"] == -1].index),
+        y=encoding.numbers(df[df["crossover"] == -1]["50_day"]),
         mode="markers",
         marker=dict(size=12, color="#e04343", line=dict(width=2, color="white")),
         name="Death Cross",
@@ -835,8 +1644,8 @@ def make_ta_fig(df, ticker):
     # Add RSI plot
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["rsi"],
+            x=encoding.dates(df.index),
+            y=encoding.numbers(df["rsi"]),
             name="RSI",
             mode="lines",
             line=dict(color="#5465e3"),
@@ -863,9 +1672,15 @@ def make_ta_fig(df, ticker):
     # Create the volume histogram
     fig.add_trace(
         go.Bar(
-            x=volume_df["week"],
-            y=volume_df["Volume"],
-            marker_color=np.where(df["Increase"], "#4aed90", "#e04343"),
+            x=encoding.dates(volume_df["week"].to_numpy()),
+            y=encoding.numbers(volume_df["Volume"].to_numpy()),
+            # 0 / 1 per bar mapped onto red / green, one byte per bar instead of a color string
+            marker=dict(
+                color=df["Increase"].to_numpy(dtype=np.int8),
+                colorscale=[[0, "#e04343"], [1, "#4aed90"]],
+                cmin=0,
+                cmax=1,
+            ),
             name="Weekly Volume",
         ),
         row=2,
@@ -907,7 +1722,7 @@ def make_ta_fig(df, ticker):
     fig.update_yaxes(
         tickfont=dict(size=12, color="#5465e3", weight="bold"), row=2, col=1
     )
-    return fig
+    return encoding.date_axes(fig)
 
 
 def make_bollinger_fig(df, ticker):
@@ -920,11 +1735,11 @@ def make_bollinger_fig(df, ticker):
     Returns:
         go.Figure: Figuring displaying the bollinger bands
     """
+    close, lower, upper, middle = bollinger_data(df)
     fig = go.Figure()
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["Close"],
+            **close,
             mode="lines",
             name="Stock Price",
             line=dict(color="black", width=2),
@@ -932,8 +1747,7 @@ def make_bollinger_fig(df, ticker):
     )
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["LB"],
+            **lower,
             mode="lines",
             name="Lower Bollinger Band",
             line=dict(color="#e04343"),
@@ -941,8 +1755,7 @@ def make_bollinger_fig(df, ticker):
     )
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["UB"],
+            **upper,
             mode="lines",
             name="Upper Bollinger Band",
             fill="tonexty",
@@ -951,8 +1764,7 @@ def make_bollinger_fig(df, ticker):
     )
     fig.add_trace(
         go.Scatter(
-            x=df.index,
-            y=df["20_day"],
+            **middle,
             mode="lines",
             name="Middle Band",
             line=dict(color="#b143e0"),
@@ -1004,70 +1816,41 @@ def make_bollinger_fig(df, ticker):
         updatemenus=updatemenus,
     )
 
-    return fig
+    return encoding.date_axes(fig)
 
 
 def add_weekly_volume(stock_data):
-    # helper func to aggregate volume by weeks
-
-    volume_df = pd.DataFrame(stock_data["Volume"])
-    volume_df.set_index(stock_data.index, inplace=True)
-    # Create a 'quarter' column
-    volume_df["week"] = volume_df.index.to_period("W")
-    # Group by quarter and sum volume
-    monthly_data = volume_df.groupby("week")["Volume"].sum().reset_index()
-    # Convert PeriodIndex to Timestamp
-    monthly_data["week"] = monthly_data["week"].dt.to_timestamp()
-
-    return monthly_data
+    # helper func to aggregate volume by weeks, each week is dated on its monday
+    return (
+        price_frame(stock_data, "Volume")
+        .group_by(pl.col("Date").dt.truncate("1w").alias("week"))
+        .agg(pl.col("Volume").sum())
+        .sort("week")
+    )
 
 
 def add_insider_trace2(fig, db_df):
     """
     Adds the insider stock transaction data to the graph. For this graph it will start out invisible and users can turn on as needed.
     """
-    # Filter the DataFrame into buy and sell DataFrames
-    df_buy = db_df[db_df["TRANS_ACQUIRED_DISP_CD"] == "A"]
-    df_sell = db_df[db_df["TRANS_ACQUIRED_DISP_CD"] == "D"]
-
-    # create a scatter plot for the insider trading info:
-    insider_buy = go.Scatter(
-        x=df_buy["FILING_DATE"],
-        y=df_buy[
-            "TRANS_PRICEPERSHARE"
-        ],  # stock_data.loc[db_df['FILING_DATE'], 'Close'],
-        mode="markers",
-        marker=dict(color="green", size=8, opacity=0.7),
-        name="Insider Buys",
-        hovertext=db_df.apply(
-            lambda row: f"Insider Transaction Info:<br>Shares:{row['TRANS_SHARES']}<br>Avg Cost: ${row['TRANS_PRICEPERSHARE']}<br>Filed on {row['FILING_DATE']}",
-            axis=1,
-        ),
-        hoverinfo="text",
-        showlegend=True,
-        visible="legendonly",
-    )
-    insider_sell = go.Scatter(
-        x=df_sell["FILING_DATE"],
-        y=df_sell[
-            "TRANS_PRICEPERSHARE"
-        ],  # stock_data.loc[db_df['FILING_DATE'], 'Close'],
-        mode="markers",
-        marker=dict(color="red", size=8, opacity=0.7),
-        name="Insider Sales",
-        hovertext=db_df.apply(
-            lambda row: f"Insider Transaction Info:<br>Shares:{row['TRANS_SHARES']}<br>Avg Cost: ${row['TRANS_PRICEPERSHARE']}<br>Filed on {row['FILING_DATE']}",
-            axis=1,
-        ),
-        hoverinfo="text",
-        showlegend=True,
-        visible="legendonly",
-    )
-    # Add traces to the figure
-    fig.add_trace(insider_buy)
-    fig.add_trace(insider_sell)
+    fig.add_traces(insider_traces(db_df, showlegend=True, visible="legendonly"))
     return fig
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SEC insider trading dashboard")
+    parser.add_argument(
+        "--db", help="path to the sqlite database (default $INSIDER_DB_PATH or real.db)"
+    )
+    parser.add_argument("--backend", choices=["sqlite", "parquet"])
+    parser.add_argument("--parquet-dir")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="background jobs loading tickers at the same time (default $INSIDER_WORKERS or 4)",
+    )
+    args = parser.parse_args()
+    storage.configure(args.backend, args.db, args.parquet_dir)
+    if args.workers:
+        job_queue = jobs.JobQueue(workers=args.workers)
     app.run(debug=True)
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import polars as pl
+
+"""
+Small in memory LRU cache with a time to live, used by app.py to keep each ticker's prepared data around so both pages (and every user) share one copy
+instead of querying the database and the price history again on every click.
+"""
+
+
+def frame_bytes(value):
+    """Rough size of a cached value: the memory used by every pandas / polars DataFrame / Series in it (looks inside dicts, lists and tuples)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, (pl.DataFrame, pl.Series)):
+        return int(value.estimated_size())
+    if isinstance(value, dict):
+        return sum(frame_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(frame_bytes(v) for v in value)
+    return 0
+
+
+class TTLCache:
+    """Least recently used cache bounded by total size, where every entry also expires ttl seconds after it was computed.
+    get_or_compute makes sure a missing key is only computed once even if several callbacks ask for it at the same time.
+
+    Args:
+        max_bytes (int): once the entries add up to more than this the least recently used ones are dropped
+        ttl (float): seconds an entry stays valid
+        sizeof (callable): returns the size in bytes of a value
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=3600, sizeof=frame_bytes):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        # key -> (expires at, size, value), ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_compute(self, key, compute):
+        value, found = self._get(key)
+        if found:
+            return value
+        # only one thread computes a given key, the others wait here and then find it in the cache
+        try:
+            with self._key_lock(key):
+                value, found = self._get(key, count=False)
+                if found:
+                    return value
+                with self._lock:
+                    self.misses += 1
+                value = compute()
+                self._put(key, value)
+        finally:
+            # also when compute raises (a bad ticker), otherwise every failing key keeps its lock forever
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return value
+
+    def _get(self, key, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[2], True
+
+    def _put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            # always keep the newest entry, even if it is bigger than the whole budget on its own
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
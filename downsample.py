@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+"""
+Downsampling of the daily price series before they go into a figure. A ticker with filings back to 2006 has thousands of daily bars per trace and a browser
+cant show more points than the graph is pixels wide anyway, so every trace is cut down to about MAX_POINTS:
+    line traces   -> largest triangle three buckets (LTTB), keeps the peaks and dips a plain every nth point would drop
+    candlesticks  -> one candle per bucket of days (first open, highest high, lowest low, last close), i.e. weekly / monthly candles when zoomed out
+view() does this for a visible date range, that range gets the full budget (every bar once it is short enough) and the rest of the history a coarse overview
+so panning doesnt show an empty graph. app.py calls it again with the new range whenever the user zooms (see the relayoutData callbacks).
+Settings come from environment variables:
+    INSIDER_MAX_POINTS -> points per trace in the visible range (default 1500)
+"""
+
+MAX_POINTS = int(os.environ.get("INSIDER_MAX_POINTS", 1500))
+# share of MAX_POINTS spent on the history on either side of the visible range
+OVERVIEW_SHARE = 0.25
+
+
+def lttb(x, y, n_out):
+    """Largest triangle three buckets: picks n_out points of a line that keep its visual shape. The first and last point are always kept, every bucket in between
+    keeps the point forming the largest triangle with the point kept from the previous bucket and the average of the next bucket.
+
+    Args:
+        x (np.ndarray): float x values, increasing
+        y (np.ndarray): float y values (nan points are only kept if the whole bucket is nan)
+        n_out (int): number of points to keep
+
+    Returns:
+        np.ndarray: sorted positions of the points to keep
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the first and last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # average of every bucket up front, the triangle for bucket i uses the average of bucket i + 1 (the last point for the final bucket)
+    counts = ends - starts
+    avg_x = np.add.reduceat(x[1 : n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(np.nan_to_num(y[1 : n - 1]), starts - 1) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    # each bucket depends on the point chosen in the one before it so this is a loop. buckets only hold a handful of points, plain python floats beat a
+    # numpy call per bucket there (about 10x for a 5000 day history). a nan area never compares greater, so nan points are skipped
+    xs, ys = x.tolist(), y.tolist()
+    keep = [0]
+    previous = 0
+    for lo, hi, nx, ny in zip(
+        starts.tolist(), ends.tolist(), next_x.tolist(), next_y.tolist()
+    ):
+        px, py = xs[previous], ys[previous]
+        dx, dy = px - nx, ny - py
+        best, previous = -1.0, lo
+        for j in range(lo, hi):
+            area = abs(dx * (ys[j] - py) - (px - xs[j]) * dy)
+            if area > best:
+                best, previous = area, j
+        keep.append(previous)
+    keep.append(n - 1)
+    return np.array(keep, dtype=np.int64)
+
+
+def lttb_rows(df, n_out, column="Close"):
+    """Rows of df that LTTB keeps for column. The other columns (SMAs, bands) come from the same rows so all the lines stay lined up"""
+    x = df.index.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    y = df[column].to_numpy(dtype=np.float64)
+    return df.iloc[lttb(x, y, n_out)]
+
+
+def ohlc_rows(df, n_out):
+    """Merges runs of days into n_out candles: first open, highest high, lowest low and last close of each bucket, dated on the bucket's first day.
+    Any other column (SMAs) is taken from the bucket's first day too
+    """
+    if len(df) <= n_out:
+        return df
+    starts = np.linspace(0, len(df), n_out, endpoint=False).astype(np.int64)
+    ends = np.append(starts[1:], len(df))
+    out = df.iloc[starts].copy()
+    out["High"] = np.fmax.reduceat(df["High"].to_numpy(dtype=np.float64), starts)
+    out["Low"] = np.fmin.reduceat(df["Low"].to_numpy(dtype=np.float64), starts)
+    out["Close"] = df["Close"].to_numpy()[ends - 1]
+    return out
+
+
+def view(df, x0=None, x1=None, reduce=lttb_rows, max_points=None):
+    """Downsampled rows of a daily frame for a figure, full detail (up to max_points) between x0 and x1 and an overview of the rest
+
+    Args:
+        df (pd.DataFrame): daily bars indexed by date
+        x0 (str | pd.Timestamp): first visible day, None for the start of the history
+        x1 (str | pd.Timestamp): last visible day, None for the end of the history
+        reduce (callable): lttb_rows for line traces, ohlc_rows for candlesticks
+        max_points (int): points for the visible range, defaults to MAX_POINTS
+
+    Returns:
+        pd.DataFrame: the rows to plot, same columns as df
+    """
+    max_points = max_points or MAX_POINTS
+    index = df.index
+    lo = 0 if x0 is None else index.searchsorted(pd.Timestamp(x0), side="left")
+    hi = len(df) if x1 is None else index.searchsorted(pd.Timestamp(x1), side="right")
+    # one extra bar either side so the line runs all the way to the edges of the graph
+    lo, hi = max(lo - 1, 0), min(hi + 1, len(df))
+    side = max(int(max_points * OVERVIEW_SHARE), 3)
+    parts = [
+        reduce(df.iloc[:lo], side),
+        reduce(df.iloc[lo:hi], max_points),
+        reduce(df.iloc[hi:], side),
+    ]
+    return pd.concat([part for part in parts if len(part)])
@@ -0,0 +1,82 @@
+import base64
+import os
+
+import numpy as np
+import pandas as pd
+
+"""
+Compact encoding of the figure data sent to the browser. plotly already sends numeric numpy arrays as base64 typed arrays ({"dtype": "f8", "bdata": ...}),
+but dates go out as one ISO string per point ("2014-07-02T00:00:00.000000", 28 bytes) that plotly.js then has to parse one by one. Here dates become float64
+milliseconds since the epoch instead, which are sent as a typed array (plotly.js has no int64 typed arrays, float64 holds every millisecond exactly)
+and read as dates on an axis whose type is set to "date" (see date_axes). Prices can optionally go out as float32, half the bytes for about 7 significant digits.
+Settings come from environment variables:
+    INSIDER_TYPED_DATES -> 0 sends dates as ISO strings again (default 1)
+    INSIDER_FLOAT32     -> 1 sends prices and indicators as float32 (default 0)
+"""
+
+TYPED_DATES = os.environ.get("INSIDER_TYPED_DATES", "1") == "1"
+FLOAT32 = os.environ.get("INSIDER_FLOAT32", "0") == "1"
+
+
+def dates(values):
+    """Dates for a trace's x (or any other date) data: epoch milliseconds as float64 when TYPED_DATES is on, otherwise left as they are
+
+    Args:
+        values (np.ndarray | pd.DatetimeIndex | pd.Series | list): dates, or YYYY-MM-DD strings
+
+    Returns:
+        np.ndarray | the input: what to hand to plotly
+    """
+    if not TYPED_DATES:
+        return values
+    # numpy dates (polars Date columns come out as datetime64[D]) convert without going through pandas
+    if isinstance(values, np.ndarray) and values.dtype.kind == "M":
+        return values.astype("datetime64[ms]").astype(np.float64)
+    # the index unit depends on where the dates came from (ns, us from parquet), asi8 is in that unit
+    return (
+        pd.DatetimeIndex(pd.to_datetime(values)).as_unit("ms").asi8.astype(np.float64)
+    )
+
+
+def numbers(values):
+    """Float data for a trace (prices, indicators): float32 when FLOAT32 is on, float64 otherwise. Always a numpy array so plotly sends it as a typed array"""
+    return np.asarray(values, dtype=np.float32 if FLOAT32 else np.float64)
+
+
+def date_axes(fig):
+    """Epoch milliseconds are just numbers to plotly.js, every x axis has to be told it shows dates"""
+    if TYPED_DATES:
+        fig.update_xaxes(type="date")
+    return fig
+
+
+# numpy dtype -> the dtype names plotly.js knows for typed arrays
+TYPED_ARRAY_DTYPES = {
+    "float64": "f8",
+    "float32": "f4",
+    "int32": "i4",
+    "int16": "i2",
+    "int8": "i1",
+    "uint8": "u1",
+}
+
+
+def packed(values):
+    """A numeric array in plotly's typed array form, anything else as it is. plotly does this itself for whole figures, but values set through a dash Patch
+    are sent as plain json lists
+
+    Args:
+        values: trace data, usually from dates() / numbers()
+
+    Returns:
+        dict | the input: {"dtype": ..., "bdata": base64 of the raw bytes} for arrays plotly.js can read as typed arrays
+    """
+    if (
+        not isinstance(values, np.ndarray)
+        or values.dtype.name not in TYPED_ARRAY_DTYPES
+    ):
+        return values
+    return {
+        "dtype": TYPED_ARRAY_DTYPES[values.dtype.name],
+        "bdata": base64.b64encode(np.ascontiguousarray(values)).decode("ascii"),
+    }
@@ -0,0 +1,450 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+"""
+Technical indicators for the second page: the 20 / 50 / 100 / 200 day SMAs, golden / death crosses of the 50 and 200 day, bollinger bands and RSI.
+A full computation runs as numpy kernels over the close array (compute_matrix), no pandas rolling objects or intermediate Series.
+Recomputing them over a ticker's whole history on every load is wasted work when only the last day or two of prices are new, so IndicatorCache keeps each ticker's
+indicator values next to its cached price history (see prices.py) together with the rolling state needed to extend them: the last closes, the window sums,
+the sum of squares for the bollinger window and the last gains / losses for RSI. New bars are folded into that state one at a time, O(new bars) per load.
+Settings come from environment variables:
+    INSIDER_PRICE_CACHE -> folder the indicator files are kept in, the same one the prices use (default price_cache)
+"""
+
+SMA_WINDOWS = [20, 50, 100, 200]
+# the bollinger bands reuse the 20 day SMA's window sum, so this has to be one of SMA_WINDOWS
+BOLLINGER_WINDOW = 20
+RSI_WINDOW = 14
+# closes kept in the state, enough to know which close drops out of the longest window
+TAIL = max(SMA_WINDOWS) + 1
+
+INDICATOR_COLUMNS = [f"{window}_day" for window in SMA_WINDOWS] + [
+    "crossover",
+    "SD",
+    "UB",
+    "LB",
+    "rsi",
+    "pct_change",
+    "Increase",
+]
+
+
+def compute(stock_data, rsi_method="simple"):
+    """Computes every indicator over the whole price history, used the first time a ticker is seen and whenever the cached state cant be extended
+
+    Args:
+        stock_data (pd.DataFrame): daily price history with Open and Close columns
+        rsi_method (str): "simple" (rolling mean of the gains / losses, what the dashboard shows) or "wilder" (wilder's smoothing)
+
+    Returns:
+        pd.DataFrame: the INDICATOR_COLUMNS, same index as stock_data
+    """
+    matrix = compute_matrix(
+        stock_data["Open"].to_numpy(dtype=np.float64),
+        stock_data["Close"].to_numpy(dtype=np.float64),
+        rsi_method,
+    )
+    return to_frame(matrix, stock_data.index)
+
+
+def compute_matrix(opens, closes, rsi_method="simple"):
+    """Array version of compute: every indicator straight from the contiguous float64 open / close arrays. Each result is written into its column of one
+    preallocated (column major, so every column is contiguous) matrix and a single running sum of the closes serves all four SMA windows.
+
+    Args:
+        opens (np.ndarray): float64 opens
+        closes (np.ndarray): float64 closes
+        rsi_method (str): "simple" or "wilder", see rsi_kernel
+
+    Returns:
+        np.ndarray: float64 matrix with one row per bar and one column per INDICATOR_COLUMNS entry
+    """
+    out = np.full((len(closes), len(INDICATOR_COLUMNS)), np.nan, order="F")
+    column = {name: out[:, i] for i, name in enumerate(INDICATOR_COLUMNS)}
+
+    sums, gaps = running_sums(closes)
+    for window in SMA_WINDOWS:
+        window_mean(sums, gaps, window, out=column[f"{window}_day"])
+    # find crosses of the 50 day and 200 day
+    column["crossover"][:] = crossovers(column["50_day"], column["200_day"])
+
+    # 20 period standard deviation and the upper / lower bollinger bands 2 SDs either side of the 20 day SMA
+    sma = column[f"{BOLLINGER_WINDOW}_day"]
+    rolling_std(closes, BOLLINGER_WINDOW, sma, out=column["SD"])
+    np.multiply(column["SD"], 2, out=column["UB"])
+    np.subtract(sma, column["UB"], out=column["LB"])
+    column["UB"] += sma
+
+    column["rsi"][:] = rsi_kernel(closes, RSI_WINDOW, rsi_method)
+
+    np.subtract(closes, opens, out=column["pct_change"])
+    column["pct_change"] /= opens
+    column["pct_change"] *= 100
+    # see if price increased or decreased for volume chart
+    np.greater_equal(closes, opens, out=column["Increase"])
+    return out
+
+
+def running_sums(values):
+    """Cumulative sum with a leading 0 (nan counted as 0) and the cumulative count of nans, so any window's sum and nan count are one subtraction each"""
+    gaps = np.isnan(values)
+    sums = np.zeros(len(values) + 1)
+    np.cumsum(np.where(gaps, 0.0, values), out=sums[1:])
+    if not gaps.any():
+        return sums, None
+    counts = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(gaps, out=counts[1:])
+    return sums, counts
+
+
+def window_mean(sums, gaps, window, out=None):
+    """Mean of the last window values from running_sums, nan until the window is full or while it holds a nan, same as pandas rolling(window).mean()"""
+    bars = len(sums) - 1
+    out = np.empty(bars) if out is None else out
+    out[: window - 1] = np.nan
+    if bars < window:
+        out[:] = np.nan
+        return out
+    full = out[window - 1 :]
+    np.subtract(sums[window:], sums[:-window], out=full)
+    full /= window
+    if gaps is not None:
+        full[gaps[window:] - gaps[:-window] > 0] = np.nan
+    return out
+
+
+def rolling_mean(values, window):
+    sums, gaps = running_sums(values)
+    return window_mean(sums, gaps, window)
+
+
+def rolling_std(values, window, means, out=None):
+    """Sample standard deviation of the last window values (pandas rolling(window).std()). Two pass around the already computed window means, numerically as
+    stable as welford's running update without looping over the bars in python: the squared deviations are added up one window offset at a time, so every step
+    is a contiguous vector operation over all the bars with two reused buffers
+    """
+    out = np.empty(len(values)) if out is None else out
+    out[: window - 1] = np.nan
+    if len(values) < window:
+        out[:] = np.nan
+        return out
+    bars = len(values) - window + 1
+    centers = means[window - 1 :]
+    total = out[window - 1 :]
+    total[:] = 0.0
+    deviation = np.empty(bars)
+    for offset in range(window):
+        np.subtract(values[offset : offset + bars], centers, out=deviation)
+        np.multiply(deviation, deviation, out=deviation)
+        total += deviation
+    total /= window - 1
+    np.sqrt(total, out=total)
+    return out
+
+
+def wilder_mean(values, window):
+    """Wilder's smoothing: the first value is the plain mean of the first window values, then avg = avg + (value - avg) / window.
+    The recursion is solved in closed form a block of bars at a time (avg_t = d^t * (avg_0 + a * cumsum(value_k / d^k))) so there is no python loop per bar,
+    the block size keeps d^-k well away from overflowing. A nan carries through to every later bar.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    alpha = 1.0 / window
+    out[window - 1] = values[:window].mean()
+    rest = values[window:]
+    block = 256
+    powers = (1 - alpha) ** np.arange(1, block + 1)
+    previous = out[window - 1]
+    for start in range(0, len(rest), block):
+        chunk = rest[start : start + block]
+        scale = powers[: len(chunk)]
+        smoothed = scale * (previous + alpha * np.cumsum(chunk / scale))
+        out[window + start : window + start + len(chunk)] = smoothed
+        previous = smoothed[-1]
+    return out
+
+
+def rsi_kernel(closes, window=RSI_WINDOW, method="simple"):
+    """RSI of a close array, nan for the first window bars
+
+    Args:
+        closes (np.ndarray): float64 closes
+        window (int): number of daily changes averaged
+        method (str): "simple" averages the last window gains / losses (what the dashboard has always shown), "wilder" uses wilder's smoothing
+
+    Returns:
+        np.ndarray: RSI between 0 and 100
+    """
+    out = np.full(len(closes), np.nan)
+    if len(closes) <= window:
+        return out
+    delta = np.diff(closes)
+    gains = np.maximum(delta, 0.0)
+    losses = np.maximum(-delta, 0.0)
+    # maximum would turn a nan change into 0, keep it nan like pandas does
+    gains[np.isnan(delta)] = np.nan
+    losses[np.isnan(delta)] = np.nan
+    if method == "wilder":
+        avg_gain, avg_loss = wilder_mean(gains, window), wilder_mean(losses, window)
+    elif method == "simple":
+        avg_gain, avg_loss = rolling_mean(gains, window), rolling_mean(losses, window)
+        # the running sum leaves rounding dust behind in windows without a single gain (or loss), those have to be exactly 0
+        for values, avg in ((gains, avg_gain), (losses, avg_loss)):
+            moved, _ = running_sums((values > 0).astype(np.float64))
+            avg[window - 1 :][moved[window:] - moved[:-window] == 0] = 0.0
+    else:
+        raise ValueError(f"unknown rsi method {method!r}, use simple or wilder")
+    out[1:] = rsi(avg_gain, avg_loss)
+    return out
+
+
+def crossovers(fast, slow, prev_fast=np.nan, prev_slow=np.nan):
+    """1 on the days fast closes above slow after being at or below it the day before, -1 for the opposite cross, 0 otherwise.
+    prev_fast / prev_slow are the values of the day before the first one (nan if there is none)
+    """
+    # sign of fast - slow changing between two days is a cross, comparisons with nan are false so nothing is flagged before both SMAs exist
+    spread = fast - slow
+    before = np.empty_like(spread)
+    before[0] = prev_fast - prev_slow
+    before[1:] = spread[:-1]
+    out = np.zeros(len(spread), dtype=np.int64)
+    out[(spread > 0) & (before <= 0)] = 1
+    out[(spread < 0) & (before >= 0)] = -1
+    return out
+
+
+def rsi(avg_gain, avg_loss):
+    # no losses in the window -> rs is inf and rsi 100, a window without any movement is nan, same as pandas gives
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def seed_state(stock_data, matrix):
+    """Rolling state after the last bar of a full computation, or None if the recent closes have gaps (nan) the running sums couldnt carry over.
+    The bollinger sum of squares is kept around a reference close (the last one here) so it doesnt lose precision on high priced stocks.
+    """
+    closes = stock_data["Close"].to_numpy(dtype=np.float64)
+    tail = closes[-TAIL:]
+    if np.isnan(tail).any():
+        return None
+    deltas = np.diff(closes[-(RSI_WINDOW + 1) :])
+    reference = float(tail[-1])
+    return {
+        "first": stock_data.index[0].isoformat(),
+        "last": stock_data.index[-1].isoformat(),
+        "count": len(closes),
+        "closes": tail.tolist(),
+        "sums": {str(window): float(tail[-window:].sum()) for window in SMA_WINDOWS},
+        "reference": reference,
+        "sum_sq": float(((tail[-BOLLINGER_WINDOW:] - reference) ** 2).sum()),
+        "gains": np.clip(deltas, 0, None).tolist(),
+        "losses": np.clip(deltas, None, 0).tolist(),
+        "fast": float(matrix[-1, INDICATOR_COLUMNS.index("50_day")]),
+        "slow": float(matrix[-1, INDICATOR_COLUMNS.index("200_day")]),
+    }
+
+
+def extend(state, new_bars):
+    """Folds new bars into the rolling state one at a time. Each bar adds its close to every window sum and takes away the close that just left the window,
+    so the cost only depends on the number of new bars, not on how long the history is.
+
+    Args:
+        state (dict): rolling state from seed_state or a previous extend, updated in place
+        new_bars (pd.DataFrame): the bars after state["last"], with Open and Close columns and no nan closes
+
+    Returns:
+        np.ndarray: float64 matrix with one row per new bar and one column per INDICATOR_COLUMNS entry
+    """
+    closes = state["closes"]
+    sums = {int(window): value for window, value in state["sums"].items()}
+    reference = state["reference"]
+    sum_sq = state["sum_sq"]
+    gains, losses = state["gains"], state["losses"]
+    count = state["count"]
+
+    bars = len(new_bars)
+    means = {window: np.full(bars, np.nan) for window in SMA_WINDOWS}
+    sd = np.full(bars, np.nan)
+    avg_gain = np.full(bars, np.nan)
+    avg_loss = np.full(bars, np.nan)
+    for i, close in enumerate(new_bars["Close"].to_numpy(dtype=np.float64).tolist()):
+        if count > 0:
+            delta = close - closes[-1]
+            gains.append(max(delta, 0.0))
+            losses.append(min(delta, 0.0))
+            del gains[:-RSI_WINDOW], losses[:-RSI_WINDOW]
+        closes.append(close)
+        count += 1
+
+        for window in SMA_WINDOWS:
+            sums[window] += close
+            if count > window:
+                sums[window] -= closes[-window - 1]
+            if count >= window:
+                means[window][i] = sums[window] / window
+
+        sum_sq += (close - reference) ** 2
+        if count > BOLLINGER_WINDOW:
+            sum_sq -= (closes[-BOLLINGER_WINDOW - 1] - reference) ** 2
+        if count >= BOLLINGER_WINDOW:
+            shifted = sums[BOLLINGER_WINDOW] - BOLLINGER_WINDOW * reference
+            variance = (sum_sq - shifted * shifted / BOLLINGER_WINDOW) / (
+                BOLLINGER_WINDOW - 1
+            )
+            sd[i] = math.sqrt(max(variance, 0.0))
+
+        # the 14 deltas are summed directly so a window with no losses comes out as exactly 0 like it does with pandas
+        if count > RSI_WINDOW:
+            avg_gain[i] = sum(gains) / RSI_WINDOW
+            avg_loss[i] = abs(sum(losses) / RSI_WINDOW)
+        del closes[:-TAIL]
+
+    fast, slow = means[50], means[200]
+    opens = new_bars["Open"].to_numpy(dtype=np.float64)
+    closes_new = new_bars["Close"].to_numpy(dtype=np.float64)
+    columns = [means[window] for window in SMA_WINDOWS] + [
+        crossovers(fast, slow, state["fast"], state["slow"]),
+        sd,
+        means[BOLLINGER_WINDOW] + 2 * sd,
+        means[BOLLINGER_WINDOW] - 2 * sd,
+        rsi(avg_gain, avg_loss),
+        (closes_new - opens) / opens * 100,
+        closes_new >= opens,
+    ]
+
+    state.update(
+        last=new_bars.index[-1].isoformat(),
+        count=count,
+        sums={str(window): value for window, value in sums.items()},
+        sum_sq=sum_sq,
+        fast=float(fast[-1]),
+        slow=float(slow[-1]),
+    )
+    return np.column_stack(columns).astype(np.float64)
+
+
+# matrix -> DataFrame with the crossover / Increase columns back to int / bool. one column at a time, DataFrame.astype with a dict copies the whole frame per column
+def to_frame(matrix, index):
+    dtypes = {"crossover": np.int64, "Increase": bool}
+    return pd.DataFrame(
+        {
+            name: matrix[:, i].astype(dtypes.get(name, np.float64), copy=False)
+            for i, name in enumerate(INDICATOR_COLUMNS)
+        },
+        index=index,
+    )
+
+
+class IndicatorCache:
+    """Keeps each ticker's indicators in <cache_dir>/<TICKER>.indicators.npy (one float64 row per bar, one column per INDICATOR_COLUMNS entry, rows line up
+    with the price history) and the rolling state in <TICKER>.indicators.json. A raw array loads and saves in about a millisecond, parquet took longer than just
+    recomputing everything with pandas. A request whose price history starts on the same day and still has the same close on the last day the state covers only
+    computes the bars after it. Anything else (older filings moved the start back, the history was split re adjusted, nan closes) recomputes everything and starts a new state.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, ticker, stock_data) -> pd.DataFrame:
+        """Indicators for a ticker's price history
+
+        Args:
+            ticker (str): ticker symbol
+            stock_data (pd.DataFrame): the ticker's daily price history, from prices.get_price_history
+
+        Returns:
+            pd.DataFrame: the INDICATOR_COLUMNS, same index as stock_data
+        """
+        with self._lock(ticker):
+            matrix, state = self._load(ticker)
+            if not self._extendable(stock_data, matrix, state):
+                return self._recompute(ticker, stock_data)
+            new_bars = stock_data.iloc[state["count"] :]
+            if len(new_bars) == 0:
+                return to_frame(matrix, stock_data.index)
+            if new_bars["Close"].isna().any():
+                return self._recompute(ticker, stock_data)
+            matrix = np.concatenate([matrix, extend(state, new_bars)])
+            self._store(ticker, matrix, state)
+            return to_frame(matrix, stock_data.index)
+
+    def _recompute(self, ticker, stock_data):
+        matrix = compute_matrix(
+            stock_data["Open"].to_numpy(dtype=np.float64),
+            stock_data["Close"].to_numpy(dtype=np.float64),
+        )
+        self._store(ticker, matrix, seed_state(stock_data, matrix))
+        return to_frame(matrix, stock_data.index)
+
+    @staticmethod
+    def _extendable(stock_data, matrix, state):
+        if state is None or len(stock_data) < state["count"]:
+            return False
+        last = state["count"] - 1
+        return (
+            stock_data.index[0] == pd.Timestamp(state["first"])
+            and stock_data.index[last] == pd.Timestamp(state["last"])
+            and matrix.shape == (state["count"], len(INDICATOR_COLUMNS))
+            and abs(stock_data["Close"].iloc[last] - state["closes"][-1])
+            <= 1e-6 * max(1.0, abs(state["closes"][-1]))
+        )
+
+    def _paths(self, ticker):
+        base = os.path.join(self.cache_dir, ticker + ".indicators")
+        return base + ".npy", base + ".json"
+
+    def _load(self, ticker):
+        data_path, state_path = self._paths(ticker)
+        if not (os.path.exists(data_path) and os.path.exists(state_path)):
+            return None, None
+        with open(state_path) as f:
+            state = json.load(f)
+        return np.load(data_path), state
+
+    def _store(self, ticker, matrix, state):
+        data_path, state_path = self._paths(ticker)
+        if state is None:
+            # nothing the next load could extend, make sure an old state isnt picked up either
+            for path in (data_path, state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        # write to temp files and swap them in so a reader never sees half a file. the file object keeps np.save from adding its own .npy suffix
+        with open(data_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(state_path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(data_path + ".tmp", data_path)
+        os.replace(state_path + ".tmp", state_path)
+
+    def _lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+
+_cache = None
+
+
+def configure(cache_dir=None):
+    """Swaps the folder used by with_indicators"""
+    global _cache
+    _cache = IndicatorCache(
+        cache_dir or os.environ.get("INSIDER_PRICE_CACHE", "price_cache")
+    )
+
+
+def with_indicators(ticker, stock_data) -> pd.DataFrame:
+    """Returns a copy of the price history with the SMAs, golden / death crosses, bollinger bands, RSI and daily change added. Only the bars since the last call are computed"""
+    if _cache is None:
+        configure()
+    return pd.concat([stock_data, _cache.get(ticker, stock_data)], axis=1)
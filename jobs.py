@@ -0,0 +1,141 @@
+"""
+In process background job queue used by app.py for the slow part of a ticker load (database read, price download, indicators, figures).
+A callback only submits a job and returns, so a slow ticker doesnt hold a dash worker, and the page polls the job (dcc.Interval) to pick up
+each part as soon as it is done. Threads instead of processes: the work is mostly sql / network / numpy which release the GIL, the jobs share
+the ticker cache in app.py and the finished parts (figures, table components) dont have to be pickled. No broker or extra packages needed.
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """One submitted job: named steps run in order, each one gets the results of the steps before it
+
+    Args:
+        key (tuple): identifies the work, a job with the same key that is still running is reused instead of starting another one
+        steps (list[tuple[str, callable]]): (name, func(results)) pairs, func gets the dict of the results so far
+    """
+
+    def __init__(self, key, steps):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.steps = steps
+        self.results = {}
+        # step name -> seconds it took
+        self.timings = {}
+        self.error = None
+        self.done = False
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "key": [str(part) for part in self.key],
+            "done": self.done,
+            "error": None if self.error is None else str(self.error),
+            "queued": None if self.started is None else self.started - self.submitted,
+            "total": None if self.finished is None else self.finished - self.submitted,
+            "steps": dict(self.timings),
+        }
+
+
+class JobQueue:
+    """Thread pool running Jobs, finished jobs are kept around (the newest keep of them) so the browser can still collect their results
+
+    Args:
+        workers (int): jobs running at the same time, the rest wait in the pool's queue
+        keep (int): finished jobs remembered
+    """
+
+    def __init__(self, workers=4, keep=200):
+        self.workers = workers
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="insider-job")
+        # job id -> Job, oldest first
+        self._jobs = OrderedDict()
+        self._running = {}
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.reused = 0
+        self.failed = 0
+
+    def submit(self, key, steps):
+        """Queues the steps as a job, returns its id (the id of the running job with the same key if there is one)"""
+        with self._lock:
+            running = self._running.get(key)
+            if running is not None:
+                self.reused += 1
+                return running.id
+            job = Job(key, steps)
+            self._jobs[job.id] = job
+            self._running[key] = job
+            self.submitted += 1
+            self._trim()
+        self._pool.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        """The Job with that id, None once it has been forgotten"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.started = time.monotonic()
+        results = {}
+        for name, func in job.steps:
+            start = time.perf_counter()
+            try:
+                value = func(results)
+            except Exception as e:
+                # LookupError is an expected outcome (nothing found for the ticker), anything else gets its traceback printed
+                if not isinstance(e, LookupError):
+                    traceback.print_exc()
+                job.error = e
+                break
+            results[name] = value
+            job.timings[name] = time.perf_counter() - start
+            # published one step at a time so the page can show it before the rest is done
+            job.results = dict(results)
+        job.finished = time.monotonic()
+        with self._lock:
+            job.done = True
+            self._running.pop(job.key, None)
+            self._recent.append(job.summary())
+            if job.error is not None:
+                self.failed += 1
+
+    def _trim(self):
+        # drops the oldest finished jobs beyond keep, running ones always stay
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            recent = list(self._recent)
+            stats = {
+                "workers": self.workers,
+                "running": len(self._running),
+                "submitted": self.submitted,
+                "reused": self.reused,
+                "failed": self.failed,
+            }
+        # average seconds per step over the recent jobs, plus the time spent waiting for a worker
+        steps = {}
+        for job in recent:
+            for name, seconds in list(job["steps"].items()) + [
+                ("queued", job["queued"])
+            ]:
+                if seconds is not None:
+                    steps.setdefault(name, []).append(seconds)
+        stats["average"] = {name: sum(v) / len(v) for name, v in steps.items()}
+        stats["recent"] = recent[-20:]
+        return stats
@@ -0,0 +1,185 @@
+import abc
+import datetime
+import json
+import os
+import threading
+
+import pandas as pd
+
+"""
+Daily price history for the dashboard. Prices come from a provider (yfinance by default) and get cached on disk, one parquet file per ticker, so after the first load
+of a ticker only the days since the last cached bar are downloaded. Settings come from environment variables:
+    INSIDER_PRICE_CACHE    -> folder the cache lives in (default price_cache)
+    INSIDER_PRICE_FIXTURES -> if set, prices are read from <dir>/<TICKER>.csv instead of the network (offline deployments and tests)
+"""
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+
+class PriceProvider(abc.ABC):
+    """Anything that can return daily OHLCV + actions for a ticker. fetch should return a DataFrame with a DatetimeIndex named Date and the PRICE_COLUMNS,
+    covering start (inclusive) to end (exclusive) like yfinance does. An empty frame means there is no data.
+    """
+
+    @abc.abstractmethod
+    def fetch(self, ticker, start, end) -> pd.DataFrame:
+        pass
+
+
+class YFinanceProvider(PriceProvider):
+    def fetch(self, ticker, start, end):
+        # imported here so offline setups using the fixture provider dont need yfinance at all
+        import yfinance as yf
+
+        # actions=True gives us info about stock splits
+        df = yf.download(ticker, start=start, end=end, actions=True, progress=False)
+        # newer yfinance versions return (Price, Ticker) column pairs even for one ticker
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+        return normalize(df)
+
+
+class FixtureProvider(PriceProvider):
+    """Reads prices from <folder>/<TICKER>.csv files, in the same layout yfinance's DataFrame.to_csv writes"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def fetch(self, ticker, start, end):
+        path = os.path.join(self.folder, f"{ticker}.csv")
+        if not os.path.exists(path):
+            return normalize(pd.DataFrame(columns=PRICE_COLUMNS))
+        df = normalize(pd.read_csv(path, index_col=0, parse_dates=True))
+        return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+
+
+# puts every provider's output into the same shape: tz naive DatetimeIndex called Date, sorted, only the columns we use
+def normalize(df):
+    df = df.reindex(columns=PRICE_COLUMNS).fillna(
+        {"Dividends": 0.0, "Stock Splits": 0.0}
+    )
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index.rename("Date")
+    return df.sort_index()
+
+
+class PriceCache:
+    """Keeps each ticker's daily bars in <cache_dir>/<TICKER>.parquet with a small json file next to it recording what range has been fetched.
+    A request only goes to the provider for what the cache is missing: the days after the last cached bar, or everything if an earlier start is asked for.
+    The provider's prices are split (and with yfinance's auto adjust, dividend) adjusted, so when the newest cached bar no longer matches what the provider returns
+    for that same day the whole history has been re adjusted and gets downloaded again.
+    """
+
+    def __init__(self, provider: PriceProvider, cache_dir):
+        self.provider = provider
+        self.cache_dir = cache_dir
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, ticker, start, end) -> pd.DataFrame:
+        """Daily bars for ticker from start (inclusive) to end (exclusive)
+
+        Args:
+            ticker (str): ticker symbol
+            start (datetime.date | str): first day wanted
+            end (datetime.date | str): day after the last day wanted
+
+        Returns:
+            pd.DataFrame: PRICE_COLUMNS indexed by Date
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # two callbacks asking for the same ticker at once should only download it once
+        with self._lock(ticker):
+            df = self._refresh(ticker, start, end)
+        return df[(df.index >= start) & (df.index < end)]
+
+    def _refresh(self, ticker, start, end):
+        df, meta = self._load(ticker)
+        if df is None or start < pd.Timestamp(meta["start"]):
+            return self._store(
+                ticker, self.provider.fetch(ticker, start, end), start, end
+            )
+        if end <= pd.Timestamp(meta["end"]):
+            return df
+        if len(df) == 0:
+            # nothing cached yet (not trading when we last asked), just try the whole range again
+            return self._store(
+                ticker,
+                self.provider.fetch(ticker, pd.Timestamp(meta["start"]), end),
+                pd.Timestamp(meta["start"]),
+                end,
+            )
+
+        # ask for the last cached day again as well, it should come back unchanged unless the history was re adjusted
+        last = df.index[-1]
+        tail = self.provider.fetch(ticker, last, end)
+        if len(tail) == 0:
+            return self._store(ticker, df, pd.Timestamp(meta["start"]), end)
+        if last not in tail.index or not _same_bar(df.loc[last], tail.loc[last]):
+            return self._store(
+                ticker,
+                self.provider.fetch(ticker, pd.Timestamp(meta["start"]), end),
+                pd.Timestamp(meta["start"]),
+                end,
+            )
+        df = pd.concat([df[df.index < last], tail])
+        return self._store(ticker, df, pd.Timestamp(meta["start"]), end)
+
+    def _paths(self, ticker):
+        base = os.path.join(self.cache_dir, ticker)
+        return base + ".parquet", base + ".json"
+
+    def _load(self, ticker):
+        data_path, meta_path = self._paths(ticker)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return pd.read_parquet(data_path), meta
+
+    def _store(self, ticker, df, start, end):
+        data_path, meta_path = self._paths(ticker)
+        # write to temp files and swap them in so a reader never sees half a file
+        df.to_parquet(data_path + ".tmp")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"start": start.isoformat(), "end": end.isoformat()}, f)
+        os.replace(data_path + ".tmp", data_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        return df
+
+    def _lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+
+def _same_bar(old, new):
+    return abs(old["Close"] - new["Close"]) <= 1e-6 * max(1.0, abs(old["Close"]))
+
+
+def default_provider():
+    fixtures = os.environ.get("INSIDER_PRICE_FIXTURES")
+    if fixtures:
+        return FixtureProvider(fixtures)
+    return YFinanceProvider()
+
+
+_cache = None
+
+
+def configure(provider=None, cache_dir=None):
+    """Swaps the provider and / or the cache folder used by get_price_history"""
+    global _cache
+    _cache = PriceCache(
+        provider or default_provider(),
+        cache_dir or os.environ.get("INSIDER_PRICE_CACHE", "price_cache"),
+    )
+
+
+def get_price_history(ticker, start, end=None) -> pd.DataFrame:
+    """Daily bars for ticker from start up to (not including) end, defaults to today. Served from the on disk cache, only missing days are downloaded"""
+    if _cache is None:
+        configure()
+    return _cache.get(ticker, start, end or datetime.date.today())
@@ -0,0 +1,674 @@
+import glob
+import operator
+import os
+import urllib.parse
+
+import numpy as np
+import polars as pl
+import sqlalchemy as sql
+
+"""
+Data access layer for the dashboard, every read of the insider transaction data goes through here. Two backends are supported:
+    sqlite  (default) -> the real.db file built by support_scripts/getTransData.py
+    parquet -> the ticker sorted parquet files written by getTransData.py --backend parquet
+Settings come from the INSIDER_BACKEND, INSIDER_DB_PATH and INSIDER_PARQUET_DIR environment variables, or from the app.py command line through configure().
+The sqlite database is opened read only through one pooled engine shared by every callback, so a request only borrows a connection instead of building an engine.
+Both backends return the same polars DataFrame so the rest of app.py doesnt care which one is used. The sqlite rows go from the cursor straight into
+typed polars columns (see query_frame), no pandas on the way in.
+The insider table on page 1 is never read whole, read_table_page gets one sorted / filtered page at a time.
+The screener page only reads the precomputed signal table (read_signals), never the filings, and the event study tab only the statistics table (read_event_stats).
+The sqlite file can be in either table layout (see LAYOUTS), the one getTransData.py loads or the compact copy written by support_scripts/migrateToV2.py.
+"""
+
+BACKEND = os.environ.get("INSIDER_BACKEND", "sqlite")
+DB_PATH = os.environ.get("INSIDER_DB_PATH", "real.db")
+PARQUET_DIR = os.environ.get("INSIDER_PARQUET_DIR", "parquet")
+
+# columns the dashboard uses, in the order they are stored
+INSIDER_COLUMNS = [
+    "ACCESSION_NUMBER",
+    "FILING_DATE",
+    "ISSUERTRADINGSYMBOL",
+    "TRANS_SHARES",
+    "TRANS_PRICEPERSHARE",
+    "TRANS_ACQUIRED_DISP_CD",
+    "SHRS_OWND_FOLWNG_TRANS",
+]
+# polars types the insider rows are built into, FILING_DATE comes back from the database as stored and is turned into a pl.Date after (see read_sqlite)
+INSIDER_SCHEMA = {
+    "ACCESSION_NUMBER": pl.String,
+    "FILING_DATE": pl.String,
+    "ISSUERTRADINGSYMBOL": pl.String,
+    "TRANS_SHARES": pl.Float64,
+    "TRANS_PRICEPERSHARE": pl.Float64,
+    "TRANS_ACQUIRED_DISP_CD": pl.String,
+    "SHRS_OWND_FOLWNG_TRANS": pl.Float64,
+}
+MONTHLY_SCHEMA = {
+    "month": pl.String,
+    "buy_shares": pl.Float64,
+    "sell_shares": pl.Float64,
+    "buy_value": pl.Float64,
+    "sell_value": pl.Float64,
+    "filings": pl.Int64,
+}
+
+# the sqlite file is either the v1 layout getTransData.py loads or the compact v2 copy support_scripts/migrateToV2.py writes (ticker ids, dates as days since
+# 1970-01-01, buy / sell as 1 / 0, clustered on ticker and date). the queries are written against these names so one set of sql reads both. day is the filing date
+# the way it is stored (what the primary key / index is sorted on), date the same as a YYYY-MM-DD string, code the "A" / "D" buy / sell code
+LAYOUTS = {
+    1: {
+        "table": "insider_data",
+        "ticker": "ISSUERTRADINGSYMBOL = :ticker",
+        "day": "FILING_DATE",
+        "date": "FILING_DATE",
+        "accession": "ACCESSION_NUMBER",
+        "shares": "TRANS_SHARES",
+        "price": "TRANS_PRICEPERSHARE",
+        "code": "TRANS_ACQUIRED_DISP_CD",
+        "owned": "SHRS_OWND_FOLWNG_TRANS",
+        "epoch_days": False,
+    },
+    2: {
+        "table": "insider_filings",
+        # the id is looked up once, the filings are then one range of the primary key
+        "ticker": "ticker_id = (SELECT ticker_id FROM tickers WHERE symbol = :ticker)",
+        "day": "filing_day",
+        "date": "date(filing_day * 86400, 'unixepoch')",
+        "accession": "accession",
+        "shares": "shares",
+        "price": "price",
+        "code": "CASE acquired WHEN 1 THEN 'A' WHEN 0 THEN 'D' END",
+        "owned": "owned_after",
+        "epoch_days": True,
+    },
+}
+
+# the day comes back as stored and is turned into a pl.Date in read_sqlite
+TICKER_SQL = """SELECT {accession} AS ACCESSION_NUMBER, {day} AS FILING_DATE, :ticker AS ISSUERTRADINGSYMBOL, {shares} AS TRANS_SHARES,
+    {price} AS TRANS_PRICEPERSHARE, {code} AS TRANS_ACQUIRED_DISP_CD, {owned} AS SHRS_OWND_FOLWNG_TRANS FROM {table} WHERE {ticker}{since}"""
+
+FIRST_FILING_SQL = "SELECT MIN({day}) FROM {table} WHERE {ticker}{since}"
+
+# per month buy / sell volume, maintained by getTransData.py in insider_monthly (migrateToV2.py copies it)
+MONTHLY_SQL = "SELECT month, buy_shares, sell_shares, buy_value, sell_value, filings FROM insider_monthly WHERE ticker = :ticker{since} ORDER BY month"
+# same numbers straight from the filings, for databases that were loaded before the rollup tables existed
+MONTHLY_FALLBACK_SQL = """SELECT substr({date}, 1, 8) || '01' AS month,
+    SUM(CASE WHEN {code} = 'A' THEN {shares} ELSE 0 END) AS buy_shares, SUM(CASE WHEN {code} = 'D' THEN {shares} ELSE 0 END) AS sell_shares,
+    SUM(CASE WHEN {code} = 'A' THEN {shares} * {price} ELSE 0 END) AS buy_value,
+    SUM(CASE WHEN {code} = 'D' THEN {shares} * {price} ELSE 0 END) AS sell_value, COUNT(*) AS filings
+    FROM {table} WHERE {ticker}{since} GROUP BY 1 ORDER BY 1"""
+
+_engine = None
+_layout = None
+
+
+def configure(backend=None, db_path=None, parquet_dir=None):
+    """Overrides the settings taken from the environment (used by the app.py command line). Drops the current engine so the next read opens the new database"""
+    global BACKEND, DB_PATH, PARQUET_DIR, _engine, _layout
+    BACKEND = backend or BACKEND
+    DB_PATH = db_path or DB_PATH
+    PARQUET_DIR = parquet_dir or PARQUET_DIR
+    _layout = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+
+def get_engine() -> sql.Engine:
+    """The one engine every read shares, created on first use. The file is opened with mode=ro so the dashboard can never write to it,
+    and check_same_thread is off because pooled connections get handed to whichever thread dash runs the callback on.
+    """
+    global _engine
+    if _engine is None:
+        path = urllib.parse.quote(os.path.abspath(DB_PATH))
+        _engine = sql.create_engine(
+            f"sqlite:///file:{path}?mode=ro&uri=true",
+            poolclass=sql.pool.QueuePool,
+            pool_size=5,
+            max_overflow=10,
+            connect_args={"check_same_thread": False},
+        )
+    return _engine
+
+
+def layout():
+    """Column names of the sqlite database's table layout (one of LAYOUTS), from the PRAGMA user_version migrateToV2.py sets. Read once per engine"""
+    global _layout
+    if _layout is None:
+        with get_engine().connect() as con:
+            version = con.execute(sql.text("PRAGMA user_version")).scalar()
+        _layout = LAYOUTS[2] if version >= 2 else LAYOUTS[1]
+    return _layout
+
+
+def layout_sql(template, names=None, since=""):
+    # fills the column names of the current layout (and the date window predicate from since_sql) into a query
+    return template.format(since=since, **(names or layout()))
+
+
+def since_sql(since, params, column, value=None):
+    """Range predicate limiting a query to a date window. On the stored filing date it is part of the (ticker, filing date) index / v2 primary key seek,
+    so only the rows inside the window are ever read
+
+    Args:
+        since (str): first day of the window YYYY-MM-DD, None for the whole history (no predicate)
+        params (dict): bound parameters of the query, the window start is added here
+        column (str): column compared against it
+        value: the window start the way column stores it, since itself by default
+
+    Returns:
+        str: " AND column >= :since", empty without a window
+    """
+    if since is None:
+        return ""
+    params["since"] = since if value is None else value
+    return f" AND {column} >= :since"
+
+
+def stored_day(day, names):
+    """YYYY-MM-DD -> the filing date the way the layout stores it (for bound parameters compared against names["day"])"""
+    if day is not None and names["epoch_days"]:
+        return int(np.datetime64(day, "D").astype(np.int64))
+    return day
+
+
+def day_string(value, names):
+    """A stored filing date as YYYY-MM-DD"""
+    if not names["epoch_days"]:
+        return value
+    return str(np.datetime64(int(value), "D"))
+
+
+def query_frame(query, params, schema):
+    """Runs a query on a pooled connection and builds a polars frame from the rows. Goes through the plain sqlite3 cursor under the pool, its fetchall
+    hands back bare tuples which get transposed into one sequence per column for polars (about 2.5x faster than handing polars the rows, no SQLAlchemy
+    row objects, no pandas object columns). The column types are given up front so nothing has to be inferred and an empty result still has every column
+
+    Args:
+        query (str): sql with :name parameters
+        params (dict): bound parameters
+        schema (dict): column name -> polars type, in the order the query selects them
+
+    Returns:
+        pl.DataFrame: the result
+    """
+    with get_engine().connect() as con:
+        rows = con.connection.driver_connection.execute(query, params).fetchall()
+    return pl.DataFrame(dict(zip(schema, zip(*rows))), schema=schema)
+
+
+def data_version():
+    """Changes whenever the insider data does (a new quarter loaded), used as part of the cache key in app.py. Just the modification time of the
+    database file, or of the newest parquet file, so it is a couple of stat calls.
+    """
+    if BACKEND == "parquet":
+        files = glob.glob(os.path.join(PARQUET_DIR, "*.parquet"))
+        return max((os.path.getmtime(f) for f in files), default=0.0)
+    return os.path.getmtime(DB_PATH) if os.path.exists(DB_PATH) else 0.0
+
+
+def read_insider_data(ticker: str, since=None) -> pl.DataFrame:
+    """Gets the insider transactions for a ticker from the configured backend
+
+    Args:
+        ticker (str): cleaned up (upper case, stripped) ticker
+        since (str): only filings on or after this YYYY-MM-DD, None for every filing the ticker has
+
+    Returns:
+        pl.DataFrame: one row per filing with the insider_data columns, FILING_DATE is a pl.Date
+    """
+    if BACKEND == "parquet":
+        return read_parquet(ticker, since)
+    return read_sqlite(ticker, since)
+
+
+def first_filing_date(ticker: str, since=None):
+    """Date of the oldest filing for a ticker, without reading the filings themselves. Enough to know how much price history to fetch,
+    so app.py can start on the prices while the rows are still being read
+
+    Args:
+        ticker (str): cleaned up (upper case, stripped) ticker
+        since (str): oldest filing on or after this YYYY-MM-DD, None to look at the whole history
+
+    Returns:
+        str | None: YYYY-MM-DD, None if the ticker has no filings (in the window)
+    """
+    if BACKEND == "parquet":
+        first = (
+            scan_ticker(ticker, since)
+            .select(pl.col("FILING_DATE").min())
+            .collect()
+            .item()
+        )
+        return None if first is None else first.strftime("%Y-%m-%d")
+    # answered from the (ticker, filing date) index / v2 primary key, one seek instead of a scan of the ticker's rows
+    names = layout()
+    params = {"ticker": ticker}
+    window = since_sql(since, params, names["day"], stored_day(since, names))
+    with get_engine().connect() as con:
+        first = con.execute(
+            sql.text(layout_sql(FIRST_FILING_SQL, names, window)), params
+        ).scalar()
+    return None if first is None else day_string(first, names)
+
+
+def read_sqlite(ticker, since=None):
+    # the ticker is bound as a parameter, never formatted into the sql (only the layout's column names are). the with block hands the connection back to the pool
+    names = layout()
+    params = {"ticker": ticker}
+    window = since_sql(since, params, names["day"], stored_day(since, names))
+    schema = dict(INSIDER_SCHEMA)
+    if names["epoch_days"]:
+        # days since 1970-01-01 is exactly how polars stores a Date, a cast instead of parsing
+        schema["FILING_DATE"] = pl.Int32
+        day = pl.col("FILING_DATE").cast(pl.Date)
+    else:
+        day = pl.col("FILING_DATE").str.to_date("%Y-%m-%d", strict=False)
+    df = query_frame(layout_sql(TICKER_SQL, names, window), params, schema)
+    return df.with_columns(day)
+
+
+def scan_ticker(ticker, since=None):
+    # the files are sorted by ticker (then filing date) so both filters get pushed into the scan and only the row groups whose min/max range covers them are read
+    lf = pl.scan_parquet(os.path.join(PARQUET_DIR, "*.parquet")).filter(
+        pl.col("ISSUERTRADINGSYMBOL") == ticker
+    )
+    if since is not None:
+        lf = lf.filter(pl.col("FILING_DATE") >= pl.lit(since).str.to_date())
+    return lf
+
+
+def read_parquet(ticker, since=None):
+    df = scan_ticker(ticker, since).select(INSIDER_COLUMNS).collect()
+    return df
+
+
+def read_monthly_volume(ticker: str, since=None) -> pl.DataFrame:
+    """Monthly insider buy / sell volume for a ticker from the rollup table (a single indexed range read)
+
+    Args:
+        ticker (str): cleaned up (upper case, stripped) ticker
+        since (str): only the months from the one this YYYY-MM-DD falls in, None for every month
+
+    Returns:
+        pl.DataFrame: month (pl.Date, first day of the month), buy_shares, sell_shares, buy_value, sell_value (shares * price) and filings, sorted by month
+    """
+    # a window counts whole months, the one it starts in included
+    month = None if since is None else since[:8] + "01"
+    if BACKEND == "parquet":
+        df = monthly_parquet(ticker, month)
+    else:
+        names = layout()
+        params = {"ticker": ticker}
+        with get_engine().connect() as con:
+            has_rollup = sql.inspect(con).has_table("insider_monthly")
+        if has_rollup:
+            query = layout_sql(MONTHLY_SQL, names, since_sql(month, params, "month"))
+        else:
+            window = since_sql(month, params, names["day"], stored_day(month, names))
+            query = layout_sql(MONTHLY_FALLBACK_SQL, names, window)
+        df = query_frame(query, params, MONTHLY_SCHEMA).with_columns(
+            pl.col("month").str.to_date("%Y-%m-%d")
+        )
+    return df
+
+
+# the parquet store has no rollup table, the aggregation runs inside the pushed down scan instead
+def monthly_parquet(ticker, since=None):
+    buy = pl.col("TRANS_ACQUIRED_DISP_CD") == "A"
+    sell = pl.col("TRANS_ACQUIRED_DISP_CD") == "D"
+    value = pl.col("TRANS_SHARES") * pl.col("TRANS_PRICEPERSHARE")
+    return (
+        scan_ticker(ticker, since)
+        .group_by(pl.col("FILING_DATE").dt.truncate("1mo").alias("month"))
+        .agg(
+            buy_shares=pl.col("TRANS_SHARES").filter(buy).sum(),
+            sell_shares=pl.col("TRANS_SHARES").filter(sell).sum(),
+            buy_value=value.filter(buy).sum(),
+            sell_value=value.filter(sell).sum(),
+            filings=pl.len(),
+        )
+        .sort("month")
+        .collect()
+    )
+
+
+# the screener page ranks tickers by the signals getTransData.py precomputes after every load (insider_signals, one row per trailing window and ticker).
+# the ranked read walks the index of the signal it sorts by, so a view costs the rows it shows whatever the size of insider_data
+SIGNALS = ["cluster_buys", "net_value", "buy_sell_ratio", "buy_gap_days"]
+SIGNALS_SQL = """SELECT ticker, as_of, cluster_buys, sells, net_value, buy_sell_ratio, buy_gap_days, last_filing FROM insider_signals
+    WHERE window_days = :window ORDER BY {signal} DESC, ticker LIMIT :limit"""
+SIGNALS_SCHEMA = {
+    "ticker": pl.String,
+    "as_of": pl.String,
+    "cluster_buys": pl.Int64,
+    "sells": pl.Int64,
+    "net_value": pl.Float64,
+    "buy_sell_ratio": pl.Float64,
+    "buy_gap_days": pl.Int64,
+    "last_filing": pl.String,
+}
+
+
+def read_signals(window_days: int, signal: str, limit: int = 100) -> pl.DataFrame:
+    """Tickers ranked by one screener signal, highest first (ties by ticker, no buys in the window last for buy_gap_days)
+
+    Args:
+        window_days (int): trailing window the signals were computed over, one of getTransData.SIGNAL_WINDOWS
+        signal (str): column to rank by, one of SIGNALS
+        limit (int): rows returned
+
+    Returns:
+        pl.DataFrame: the SIGNALS_SCHEMA columns with as_of (last day of the window) and last_filing as pl.Date, empty if the signals havent been built yet
+    """
+    if signal not in SIGNALS:
+        raise ValueError(f"cant rank by {signal}")
+    if BACKEND == "parquet":
+        path = os.path.join(PARQUET_DIR, "signals", "signals.parquet")
+        if not os.path.exists(path):
+            return pl.DataFrame(schema=SIGNALS_SCHEMA).with_columns(
+                pl.col("as_of", "last_filing").cast(pl.Date)
+            )
+        return (
+            pl.scan_parquet(path)
+            .filter(pl.col("window_days") == window_days)
+            .sort(signal, "ticker", descending=[True, False], nulls_last=True)
+            .head(limit)
+            .select(list(SIGNALS_SCHEMA))
+            .collect()
+        )
+    with get_engine().connect() as con:
+        has_signals = sql.inspect(con).has_table("insider_signals")
+    if not has_signals:
+        rows = pl.DataFrame(schema=SIGNALS_SCHEMA)
+    else:
+        rows = query_frame(
+            SIGNALS_SQL.format(signal=signal),
+            {"window": window_days, "limit": limit},
+            SIGNALS_SCHEMA,
+        )
+    return rows.with_columns(pl.col("as_of", "last_filing").str.to_date("%Y-%m-%d"))
+
+
+# the event study tab reads the statistics support_scripts/eventStudy.py stores: forward returns after the filings per ticker, buy / sell and horizon,
+# the market wide ones under the ticker MARKET. a ticker's rows and the market's are two primary key range reads. MARKET cant clash with a real ticker
+# (getTransData.py strips everything but letters)
+MARKET = "*"
+EVENT_STATS_SQL = """SELECT ticker, code, horizon, events, mean_return, median_return, hit_rate FROM insider_event_stats
+    WHERE ticker IN (:market, :ticker) ORDER BY ticker = :ticker, code, horizon"""
+EVENT_STATS_SCHEMA = {
+    "ticker": pl.String,
+    "code": pl.String,
+    "horizon": pl.Int64,
+    "events": pl.Int64,
+    "mean_return": pl.Float64,
+    "median_return": pl.Float64,
+    "hit_rate": pl.Float64,
+}
+
+
+def read_event_stats(ticker=None) -> pl.DataFrame:
+    """Forward return statistics after insider filings, market wide and for one ticker
+
+    Args:
+        ticker (str): cleaned up ticker, None for only the market wide rows
+
+    Returns:
+        pl.DataFrame: the EVENT_STATS_SCHEMA columns, market rows (ticker MARKET) first then the ticker's, each by code and horizon. empty if the study hasnt been run
+    """
+    params = {"market": MARKET, "ticker": ticker or MARKET}
+    if BACKEND == "parquet":
+        path = os.path.join(PARQUET_DIR, "events", "stats.parquet")
+        if not os.path.exists(path):
+            return pl.DataFrame(schema=EVENT_STATS_SCHEMA)
+        return (
+            pl.scan_parquet(path)
+            .filter(pl.col("ticker").is_in([MARKET, params["ticker"]]))
+            .sort(pl.col("ticker") == params["ticker"], "code", "horizon")
+            .select(list(EVENT_STATS_SCHEMA))
+            .collect()
+        )
+    with get_engine().connect() as con:
+        has_stats = sql.inspect(con).has_table("insider_event_stats")
+    if not has_stats:
+        return pl.DataFrame(schema=EVENT_STATS_SCHEMA)
+    return query_frame(EVENT_STATS_SQL, params, EVENT_STATS_SCHEMA)
+
+
+# the insider transaction table on page 1 is read one page at a time (see read_table_page). display column -> sql expression (in LAYOUTS names), {factor} is the
+# split factor of the filing (see split_factor_sql) so shares and price are on the same split adjusted basis as the graphs. the factor cancels out of the change in holdings
+TABLE_SQL = {
+    "Date": "{date}",
+    "Shares": "{shares} * {factor}",
+    "Price": "ROUND({price} / {factor}, 2)",
+    "Buy/Sell": "CASE {code} WHEN 'A' THEN 'Buy' WHEN 'D' THEN 'Sell' END",
+    "Change in Holdings (%)": "ROUND({shares} * 100.0 / {owned}, 2)",
+}
+TABLE_COLUMNS = list(TABLE_SQL)
+TEXT_COLUMNS = {"Date", "Buy/Sell"}
+# filter operators -> the polars comparison for the parquet backend (contains / startswith are string matches in both backends)
+COMPARE = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+TABLE_OPERATORS = set(COMPARE) | {"contains", "startswith"}
+# the table starts out with the newest filings first
+DEFAULT_SORT = ("Date", "desc")
+
+
+def split_factor_sql(splits, params, names):
+    """CASE expression giving every filing the product of the split ratios dated after it (adds the split dates / factors to params)
+
+    Args:
+        splits (list[tuple[str, float]]): (split date YYYY-MM-DD, factor) in date order, filings before a split date (and on / after the one before it) get its factor
+        params (dict): bound parameters of the query, filled in here
+        names (dict): column names of the table layout (LAYOUTS)
+
+    Returns:
+        str: sql expression, just 1.0 without any splits
+    """
+    if not splits:
+        return "1.0"
+    cases = []
+    for i, (day, factor) in enumerate(splits):
+        params[f"split_{i}"] = stored_day(day, names)
+        params[f"factor_{i}"] = float(factor)
+        cases.append(f"WHEN {names['day']} < :split_{i} THEN :factor_{i}")
+    return f"(CASE {' '.join(cases)} ELSE 1.0 END)"
+
+
+def check_table_query(column, direction, filters):
+    # column names and operators end up in the sql text (only the values are bound), so anything but the known ones is refused
+    if column not in TABLE_SQL or direction not in ("asc", "desc"):
+        raise ValueError(f"cant sort the insider table by {column} {direction}")
+    for name, op, _ in filters:
+        if name not in TABLE_SQL or op not in TABLE_OPERATORS:
+            raise ValueError(f"cant filter the insider table on {name} {op}")
+
+
+def quote(name):
+    # display names have spaces, slashes etc in them
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sort_key_sql(column, expression, names):
+    # keyset pagination compares (sort key, accession) row values, a null would never compare so it gets pushed below everything else.
+    # the date is never null and has to stay the bare stored column so the index on (ticker, filing date, accession) / the v2 primary key is used
+    if column == "Date":
+        return names["day"]
+    return f"IFNULL({expression}, {repr('') if column in TEXT_COLUMNS else -1e308})"
+
+
+def table_query_sql(ticker, splits, filters, names, since=None):
+    # display column expressions, WHERE clause and its parameters shared by the page and the count query
+    params = {"ticker": ticker}
+    factor = split_factor_sql(splits, params, names)
+    columns = {
+        name: expr.format(factor=factor, **names) for name, expr in TABLE_SQL.items()
+    }
+    where = [
+        names["ticker"]
+        + since_sql(since, params, names["day"], stored_day(since, names))
+    ]
+    for i, (column, op, value) in enumerate(filters):
+        params[f"filter_{i}"] = value
+        if op == "contains":
+            where.append(f"instr({columns[column]}, :filter_{i}) > 0")
+        elif op == "startswith":
+            where.append(
+                f"substr({columns[column]}, 1, length(:filter_{i})) = :filter_{i}"
+            )
+        else:
+            where.append(f"{columns[column]} {op} :filter_{i}")
+    return columns, where, params
+
+
+def read_table_page(
+    ticker: str,
+    splits=(),
+    sort=None,
+    filters=(),
+    after=None,
+    offset=0,
+    limit=50,
+    since=None,
+):
+    """One page of the insider transaction table for a ticker, sorted and filtered by the database. With a cursor the page starts right after the previous one
+    in the index order (keyset pagination), only a jump to a page that hasnt been visited yet falls back to OFFSET.
+
+    Args:
+        ticker (str): cleaned up (upper case, stripped) ticker
+        splits (list[tuple[str, float]]): split dates / factors, see split_factor_sql
+        sort (tuple[str, str]): (column, "asc" | "desc"), DEFAULT_SORT when None
+        filters (list[tuple[str, str, object]]): (column, operator, value), operator one of TABLE_OPERATORS
+        after (tuple): cursor returned with the previous page, offset is ignored when it is set
+        offset (int): rows to skip when there is no cursor
+        limit (int): rows per page
+        since (str): only filings on or after this YYYY-MM-DD, None for the whole history
+
+    Returns:
+        tuple[pl.DataFrame, tuple]: the rows (TABLE_COLUMNS) and the cursor for the page after it, None on the last page
+    """
+    column, direction = sort or DEFAULT_SORT
+    check_table_query(column, direction, filters)
+    if BACKEND == "parquet":
+        df = table_page_parquet(
+            ticker, splits, column, direction, filters, after, since=since
+        )
+        df = df.slice(0 if after is not None else offset, limit)
+    else:
+        names = layout()
+        columns, where, params = table_query_sql(ticker, splits, filters, names, since)
+        key = sort_key_sql(column, columns[column], names)
+        accession = names["accession"]
+        if after is not None:
+            params["after_key"], params["after_accession"] = after
+            compare = "<" if direction == "desc" else ">"
+            where.append(
+                f"({key}, {accession}) {compare} (:after_key, :after_accession)"
+            )
+        else:
+            params["offset"] = int(offset)
+        params["limit"] = int(limit)
+        query = (
+            f"SELECT {', '.join(f'{expr} AS {quote(name)}' for name, expr in columns.items())}, {key} AS _key, {accession} AS _accession "
+            f"FROM {names['table']} WHERE {' AND '.join(where)} ORDER BY _key {direction}, {accession} {direction} "
+            f"LIMIT :limit{'' if after is not None else ' OFFSET :offset'}"
+        )
+        df = query_frame(query, params, table_schema(column, names))
+    cursor = None
+    if len(df) == limit:
+        # plain python values, they go through the browser (dcc.Store) and back
+        cursor = (df["_key"][-1], df["_accession"][-1])
+    return df.select(TABLE_COLUMNS), cursor
+
+
+def table_schema(column, names):
+    # polars types of the table page query, the sort key has the type of the column it sorts by (the stored day for the date)
+    schema = {
+        name: pl.String if name in TEXT_COLUMNS else pl.Float64
+        for name in TABLE_COLUMNS
+    }
+    if column == "Date":
+        key = pl.Int64 if names["epoch_days"] else pl.String
+    else:
+        key = schema[column]
+    return {**schema, "_key": key, "_accession": pl.String}
+
+
+def count_table_rows(ticker: str, splits=(), filters=(), since=None) -> int:
+    """Number of rows of the insider table matching the filters (in the window since starts), for the page count"""
+    check_table_query(*DEFAULT_SORT, filters)
+    if BACKEND == "parquet":
+        lf = table_page_parquet(
+            ticker, splits, "Date", "desc", filters, None, lazy=True, since=since
+        )
+        return lf.select(pl.len()).collect().item()
+    names = layout()
+    _, where, params = table_query_sql(ticker, splits, filters, names, since)
+    query = sql.text(
+        f"SELECT COUNT(*) FROM {names['table']} WHERE {' AND '.join(where)}"
+    )
+    with get_engine().connect() as con:
+        return con.execute(query, params).scalar()
+
+
+def table_page_parquet(
+    ticker, splits, column, direction, filters, after, lazy=False, since=None
+):
+    # same query as the sqlite one on the ticker sorted parquet files. without a cursor the caller slices out the page (or counts the rows with lazy=True)
+    lf = scan_ticker(ticker, since)
+    day = pl.col("FILING_DATE").dt.to_string("%Y-%m-%d")
+    factor = pl.lit(1.0)
+    for split_day, split_factor in reversed(list(splits)):
+        factor = pl.when(day < split_day).then(float(split_factor)).otherwise(factor)
+    shares = pl.col("TRANS_SHARES")
+    columns = {
+        "Date": day,
+        "Shares": shares * factor,
+        "Price": (pl.col("TRANS_PRICEPERSHARE") / factor).round(2),
+        "Buy/Sell": pl.col("TRANS_ACQUIRED_DISP_CD").replace_strict(
+            {"A": "Buy", "D": "Sell"}, default=None
+        ),
+        # 0 shares owned afterwards is a null like in sqlite, not inf
+        "Change in Holdings (%)": (
+            shares
+            * 100.0
+            / pl.when(pl.col("SHRS_OWND_FOLWNG_TRANS") != 0).then(
+                pl.col("SHRS_OWND_FOLWNG_TRANS")
+            )
+        ).round(2),
+    }
+    lf = lf.select(**columns, _accession=pl.col("ACCESSION_NUMBER"))
+    for name, op, value in filters:
+        target = pl.col(name)
+        if op == "contains":
+            lf = lf.filter(
+                target.cast(pl.String).str.contains(str(value), literal=True)
+            )
+        elif op == "startswith":
+            lf = lf.filter(target.cast(pl.String).str.starts_with(str(value)))
+        else:
+            lf = lf.filter(COMPARE[op](target, value))
+    if lazy:
+        return lf
+    key = pl.col(column)
+    if column != "Date":
+        key = key.fill_null("" if column in TEXT_COLUMNS else -1e308)
+    lf = lf.with_columns(_key=key)
+    if after is not None:
+        after_key, after_accession = after
+        before = direction == "desc"
+        past_key = pl.col("_key") < after_key if before else pl.col("_key") > after_key
+        past_accession = (
+            pl.col("_accession") < after_accession
+            if before
+            else pl.col("_accession") > after_accession
+        )
+        lf = lf.filter(past_key | ((pl.col("_key") == after_key) & past_accession))
+    return lf.sort(["_key", "_accession"], descending=direction == "desc").collect()
@@ -0,0 +1,1305 @@
+"""
+Small benchmark / sanity check scripts for the ingest and dashboard code. Each sub command times the new implementation against the one it replaced and checks
+that both give the same answer. Run from the repo root, e.g. python support_scripts/benchmarks.py dups --rows 100000 1000000 10000000
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+from polars.testing import assert_frame_equal
+
+import getTransData
+
+# storage.py and the other dashboard modules live in the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import indicators
+import storage
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "..", "testNBs", "testData")
+
+
+def write_synthetic_trans(path, rows, dup_rate=0.3, seed=0):
+    """Writes a NONDERIV_TRANS.tsv shaped file with the columns the ingest reads. Roughly dup_rate of the rows share their ACCESSION_NUMBER with at least one other row"""
+    rng = np.random.default_rng(seed)
+    # draw accession ids from a pool smaller than the number of rows so some of them repeat
+    pool = max(1, int(rows * (1 - dup_rate)))
+    ids = rng.integers(0, pool, rows)
+    pl.DataFrame(
+        {
+            # same shape as the SEC ids (0001250853-24-000009) so the column is read back as a string
+            "ACCESSION_NUMBER": "0000000000-24-"
+            + pl.Series(ids).cast(pl.Utf8).str.zfill(9),
+            "TRANS_SHARES": rng.integers(1, 100_000, rows).astype(np.float64),
+            "TRANS_PRICEPERSHARE": rng.integers(1, 50_000, rows) / 100,
+            "TRANS_ACQUIRED_DISP_CD": rng.choice(["A", "D"], rows),
+            "SHRS_OWND_FOLWNG_TRANS": rng.integers(1, 10_000_000, rows).astype(
+                np.float64
+            ),
+        }
+    ).write_csv(path, separator="\t")
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def check_dups(path):
+    # both implementations have to agree, group order is not defined for the loop so compare sorted
+    fast = getTransData.get_trans_frame(path).collect().sort("ACCESSION_NUMBER")
+    slow = (
+        getTransData.get_trans_frame(path, vectorized=False)
+        .collect()
+        .sort("ACCESSION_NUMBER")
+    )
+    price = "TRANS_PRICEPERSHARE"
+    assert_frame_equal(fast.drop(price), slow.drop(price))
+    # a mean that lands exactly on a half cent (1.275) can round either way: the loop uses python's round on a mean whose last bit depends on the order
+    # polars sums the group in, df_dups rounds inside polars. so the rounded price is allowed to be off by that one cent and nothing more
+    assert_frame_equal(
+        fast.select(price),
+        slow.select(price),
+        check_exact=False,
+        rel_tol=0,
+        abs_tol=0.010001,
+    )
+
+
+def bench_dups(args):
+    check_dups(os.path.join(TEST_DATA, "NONDERIV_TRANS.tsv"))
+    print("df_dups matches df_dups_loop on testNBs/testData")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"trans_{rows}.tsv")
+            write_synthetic_trans(path, rows)
+            _, fast = timed(lambda: getTransData.get_trans_frame(path).collect())
+            line = f"{rows:>10} rows  vectorized {fast:8.3f}s"
+            # the loop is quadratic, past a few hundred thousand rows it takes way too long to bother timing
+            if rows <= args.loop_max:
+                check_dups(path)
+                _, slow = timed(
+                    lambda: getTransData.get_trans_frame(
+                        path, vectorized=False
+                    ).collect()
+                )
+                line += f"  loop {slow:8.3f}s  speedup {slow / fast:6.1f}x"
+            print(line)
+
+
+# same table and index that createRealDBtable.py sets up
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS "insider_data" (ACCESSION_NUMBER VARCHAR(200), FILING_DATE VARCHAR(200), ISSUERTRADINGSYMBOL VARCHAR(200), TRANS_SHARES REAL, TRANS_PRICEPERSHARE REAL, TRANS_ACQUIRED_DISP_CD VARCHAR(100), SHRS_OWND_FOLWNG_TRANS REAL)"""
+
+
+def synthetic_combined(rows, tickers=5000, seed=0):
+    """A frame shaped like getTransData.get_combined_frame output (one row per accession number, filing date parsed, cleaned ticker)"""
+    rng = np.random.default_rng(seed)
+    names = np.array(
+        ["".join(chr(65 + c) for c in rng.integers(0, 26, 4)) for _ in range(tickers)]
+    )
+    start = datetime.date(2006, 1, 1)
+    return pl.DataFrame(
+        {
+            "ACCESSION_NUMBER": "0000000000-24-"
+            + pl.Series(np.arange(rows)).cast(pl.Utf8).str.zfill(9),
+            "FILING_DATE": pl.Series(
+                [
+                    start + datetime.timedelta(days=int(d))
+                    for d in rng.integers(0, 6500, rows)
+                ]
+            ),
+            "ISSUERTRADINGSYMBOL": names[rng.integers(0, tickers, rows)],
+            "TRANS_SHARES": rng.integers(1, 100_000, rows).astype(np.float64),
+            "TRANS_PRICEPERSHARE": rng.integers(1, 50_000, rows) / 100,
+            "TRANS_ACQUIRED_DISP_CD": rng.choice(["A", "D"], rows),
+            "SHRS_OWND_FOLWNG_TRANS": rng.integers(1, 10_000_000, rows).astype(
+                np.float64
+            ),
+        }
+    )
+
+
+def new_db(path):
+    con = sqlite3.connect(path)
+    con.execute(CREATE_TABLE)
+    con.execute(getTransData.TICKER_INDEX)
+    getTransData.ensure_schema(con)
+    return con
+
+
+# the insert path from before bulk mode: numpy object array per chunk, index maintained on every insert and a commit per 10k rows
+def legacy_insert(df, con, chunk_size=10000):
+    cur = sqlite3.Cursor(con)
+    query = "INSERT INTO insider_data (ACCESSION_NUMBER, FILING_DATE, ISSUERTRADINGSYMBOL, TRANS_SHARES, TRANS_PRICEPERSHARE, TRANS_ACQUIRED_DISP_CD, SHRS_OWND_FOLWNG_TRANS) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    for i in range(0, len(df), chunk_size):
+        data = (
+            df[i : i + chunk_size]
+            .with_columns(pl.col("FILING_DATE").dt.to_string("%Y-%m-%d"))
+            .to_numpy()
+        )
+        cur.executemany(query, data)
+        con.commit()
+
+
+def bulk_insert(df, con, chunk_size=10000):
+    cur = sqlite3.Cursor(con)
+    getTransData.start_bulk_load(con)
+    getTransData.insert_frame(df.lazy(), con, cur, chunk_size, track=False)
+    con.commit()
+    getTransData.finish_bulk_load(con)
+
+
+def bench_insert(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            df = synthetic_combined(rows)
+            for name, func in [("before", legacy_insert), ("bulk", bulk_insert)]:
+                con = new_db(os.path.join(tmp, f"{name}_{rows}.db"))
+                _, elapsed = timed(func, df, con)
+                count = con.execute("SELECT COUNT(*) FROM insider_data").fetchone()[0]
+                con.close()
+                assert count == rows
+                print(
+                    f"{rows:>10} rows  {name:>6} {elapsed:8.2f}s  {rows / elapsed:>12,.0f} rows/sec"
+                )
+
+
+def dir_size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+
+
+def bench_storage(args):
+    df = synthetic_combined(args.rows, tickers=args.tickers)
+    tickers = df["ISSUERTRADINGSYMBOL"].unique().sample(args.lookups, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "real.db")
+        con = new_db(db_path)
+        bulk_insert(df, con)
+        con.close()
+        # split the rows into "quarters" the same way the ingest writes them, one ticker sorted file each
+        parquet_dir = os.path.join(tmp, "parquet")
+        os.makedirs(parquet_dir)
+        quarter = pl.Series(np.arange(len(df)) % args.quarters)
+        for i, part in enumerate(df.with_columns(q=quarter).partition_by("q")):
+            part.drop("q").sort("ISSUERTRADINGSYMBOL", "FILING_DATE").write_parquet(
+                os.path.join(parquet_dir, f"{i}.parquet"),
+                row_group_size=getTransData.PARQUET_ROW_GROUP,
+            )
+
+        storage.configure(db_path=db_path, parquet_dir=parquet_dir)
+        _, sqlite_time = timed(lambda: [storage.read_sqlite(t) for t in tickers])
+        _, parquet_time = timed(lambda: [storage.read_parquet(t) for t in tickers])
+
+        print(f"{args.rows} rows, {args.tickers} tickers, {args.lookups} lookups")
+        print(
+            f"sqlite   {sqlite_time / args.lookups * 1000:8.2f} ms/lookup  {dir_size_mb(db_path):8.1f} MB"
+        )
+        print(
+            f"parquet  {parquet_time / args.lookups * 1000:8.2f} ms/lookup  {dir_size_mb(parquet_dir):8.1f} MB"
+        )
+
+
+def bench_schema(args):
+    import migrateToV2
+
+    df = synthetic_combined(args.rows, tickers=args.tickers)
+    tickers = df["ISSUERTRADINGSYMBOL"].unique().sample(args.lookups, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        v1_path, v2_path = os.path.join(tmp, "real.db"), os.path.join(tmp, "real_v2.db")
+        con = new_db(v1_path)
+        bulk_insert(df, con)
+        # the bulk load leaves free pages behind, the v2 file is written compact
+        con.execute("VACUUM")
+        con.close()
+        _, migrate_time = timed(migrateToV2.migrate, v1_path, v2_path)
+        print(
+            f"{args.rows} rows, {args.tickers} tickers, {args.lookups} lookups, migrated in {migrate_time:.1f}s"
+        )
+
+        read = {}
+        for name, path in [("v1", v1_path), ("v2", v2_path)]:
+            storage.configure(backend="sqlite", db_path=path)
+            # opens the engine and reads the layout before the clock starts
+            storage.first_filing_date(tickers[0])
+            frames, rows_time = timed(
+                lambda: [storage.read_insider_data(t) for t in tickers]
+            )
+            firsts, first_time = timed(
+                lambda: [storage.first_filing_date(t) for t in tickers]
+            )
+            pages, page_time = timed(
+                lambda: [storage.read_table_page(t, limit=100) for t in tickers]
+            )
+            read[name] = frames, firsts, pages
+            print(
+                f"{name}  {dir_size_mb(path):8.1f} MB  rows {rows_time / args.lookups * 1000:6.2f} ms/ticker  "
+                f"first filing {first_time / args.lookups * 1000:5.2f} ms  table page {page_time / args.lookups * 1000:5.2f} ms"
+            )
+
+    # both layouts give the same filings (row order isnt part of the contract), first dates and table pages
+    key = ["FILING_DATE", "ACCESSION_NUMBER"]
+    for want, got in zip(read["v1"][0], read["v2"][0]):
+        assert_frame_equal(want.sort(key), got.sort(key))
+    assert read["v1"][1] == read["v2"][1]
+    for (want, _), (got, _) in zip(read["v1"][2], read["v2"][2]):
+        assert_frame_equal(want, got)
+
+
+# the split handling get_stock_data used to do: one .loc lookup per filing (it replaced the price with the close on the filing day)
+def legacy_split_loop(db_df, stock_data):
+    db_df = db_df.copy()
+    for index, row in db_df.iterrows():
+        try:
+            db_df.at[index, "TRANS_PRICEPERSHARE"] = round(
+                stock_data.loc[row["FILING_DATE"], "Close"], 2
+            )
+        except KeyError:
+            db_df.drop(index)
+    return db_df
+
+
+def bench_splits(args):
+    import pandas as pd
+    import app
+
+    rng = np.random.default_rng(0)
+    days = pd.bdate_range("2006-01-01", "2024-12-31")
+    stock_data = pd.DataFrame(
+        {"Close": rng.uniform(10, 100, len(days)), "Stock Splits": 0.0}, index=days
+    )
+    stock_data.loc[days[[1000, 2500, 4000]], "Stock Splits"] = [2.0, 3.0, 0.5]
+    for filings in args.filings:
+        filing_days = days[rng.integers(0, len(days), filings)]
+        db_df = pd.DataFrame(
+            {
+                "FILING_DATE": filing_days.strftime("%Y-%m-%d"),
+                "TRANS_SHARES": rng.integers(1, 10_000, filings).astype(float),
+                "TRANS_PRICEPERSHARE": rng.uniform(10, 100, filings).round(2),
+                "SHRS_OWND_FOLWNG_TRANS": rng.integers(1, 1_000_000, filings).astype(
+                    float
+                ),
+            }
+        )
+        _, old = timed(legacy_split_loop, db_df, stock_data)
+        filings_df = pl.from_pandas(db_df).with_columns(
+            pl.col("FILING_DATE").str.to_date("%Y-%m-%d")
+        )
+        adjusted, new = timed(app.adjust_for_splits, filings_df, stock_data)
+        # spot check one filing before all three splits -> 2 * 3 * 0.5 = 3
+        first = int(np.argmin(filing_days))
+        assert np.isclose(
+            adjusted["TRANS_SHARES"][first], db_df["TRANS_SHARES"].iloc[first] * 3
+        )
+        print(
+            f"{filings:>8} filings  row loop {old * 1000:9.1f} ms  vectorized {new * 1000:7.2f} ms  speedup {old / new:7.0f}x"
+        )
+
+
+# the get_indicators code from app.py before the incremental engine, the reference the engine is checked against
+def legacy_indicators(stock_data):
+    stock_data = stock_data.copy()
+    stock_data["20_day"] = stock_data["Close"].rolling(window=20).mean()
+    stock_data["50_day"] = stock_data["Close"].rolling(window=50).mean()
+    stock_data["100_day"] = stock_data["Close"].rolling(window=100).mean()
+    stock_data["200_day"] = stock_data["Close"].rolling(window=200).mean()
+    stock_data["crossover"] = 0
+    stock_data.loc[
+        (stock_data["50_day"] > stock_data["200_day"])
+        & (stock_data["50_day"].shift(1) <= stock_data["200_day"].shift(1)),
+        "crossover",
+    ] = 1
+    stock_data.loc[
+        (stock_data["50_day"] < stock_data["200_day"])
+        & (stock_data["50_day"].shift(1) >= stock_data["200_day"].shift(1)),
+        "crossover",
+    ] = -1
+    stock_data["SD"] = stock_data["Close"].rolling(window=20).std()
+    stock_data["UB"] = stock_data["20_day"] + 2 * stock_data["SD"]
+    stock_data["LB"] = stock_data["20_day"] - 2 * stock_data["SD"]
+    delta = stock_data["Close"].diff()
+    gain = delta.copy()
+    loss = delta.copy()
+    gain[gain < 0] = 0
+    loss[loss > 0] = 0
+    avg_gain = gain.rolling(window=14).mean()
+    avg_loss = abs(loss.rolling(window=14).mean())
+    rs = avg_gain / avg_loss
+    stock_data["rsi"] = 100 - (100 / (1 + rs))
+    stock_data["pct_change"] = (
+        (stock_data["Close"] - stock_data["Open"]) / stock_data["Open"] * 100
+    )
+    stock_data["Increase"] = stock_data["Close"] >= stock_data["Open"]
+    return stock_data
+
+
+def synthetic_prices(bars, start_price=100.0, seed=0):
+    """Random walk daily bars (Open / Close) on business days, with a flat stretch so the RSI sees windows without any losses"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    close[bars // 3 : bars // 3 + 30] = close[bars // 3]
+    days = pd.bdate_range("2000-01-03", periods=bars)
+    return pd.DataFrame(
+        {"Open": close * np.exp(rng.normal(0, 0.005, bars)), "Close": close},
+        index=days.rename("Date"),
+    )
+
+
+def check_indicators(got, want):
+    import pandas as pd
+
+    for column in indicators.INDICATOR_COLUMNS:
+        if column in ("crossover", "Increase"):
+            assert (got[column].to_numpy() == want[column].to_numpy()).all(), column
+            continue
+        # running sums and pandas' rolling code round differently, the values agree to well within a cent of price scale.
+        # pandas' online rolling std leaves about 1e-9 of the price level behind in windows whose true std is 0 (flat prices)
+        got_values, want_values = got[column].to_numpy(), want[column].to_numpy()
+        scale = np.abs(want["Close"].to_numpy()) if column in ("SD", "UB", "LB") else 0
+        assert (np.isnan(got_values) == np.isnan(want_values)).all(), column
+        close = np.abs(got_values - want_values) <= 1e-7 * (
+            1 + np.abs(want_values) + 100 * scale
+        )
+        assert close[~np.isnan(want_values)].all(), column
+
+
+def bench_indicators(args):
+    import pandas as pd
+
+    for bars in args.bars:
+        for start_price in (5.0, 100.0, 500_000.0):
+            stock_data = synthetic_prices(bars, start_price)
+            want, full = timed(legacy_indicators, stock_data)
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = indicators.IndicatorCache(tmp)
+                # seed with most of the history then feed the rest a few days at a time, like daily loads would
+                seed = bars - args.updates * args.step
+                engine.get("TEST", stock_data.iloc[:seed])
+                times = []
+                for end in range(seed + args.step, bars + 1, args.step):
+                    _, elapsed = timed(engine.get, "TEST", stock_data.iloc[:end])
+                    times.append(elapsed)
+                got = pd.concat([stock_data, engine.get("TEST", stock_data)], axis=1)
+            check_indicators(got, want)
+            print(
+                f"{bars:>7} bars  price {start_price:>9,.0f}  full pandas {full * 1000:7.1f} ms  "
+                f"incremental (+{args.step} bars, incl. file io) {np.median(times) * 1000:6.1f} ms  matches"
+            )
+
+
+def wilder_loop(values, window):
+    out = np.full(len(values), np.nan)
+    average = values[:window].mean()
+    out[window - 1] = average
+    for i in range(window, len(values)):
+        average += (values[i] - average) / window
+        out[i] = average
+    return out
+
+
+def best_of(func, *args, repeat=20):
+    return min(timed(func, *args)[1] for _ in range(repeat))
+
+
+def bench_kernels(args):
+    import pandas as pd
+
+    for bars in args.bars:
+        stock_data = synthetic_prices(bars)
+        close = stock_data["Close"]
+        closes = close.to_numpy(dtype=np.float64)
+        sma = indicators.rolling_mean(closes, 20)
+
+        def pandas_smas():
+            return [close.rolling(window=w).mean() for w in indicators.SMA_WINDOWS]
+
+        def numpy_smas():
+            sums, gaps = indicators.running_sums(closes)
+            return [
+                indicators.window_mean(sums, gaps, w) for w in indicators.SMA_WINDOWS
+            ]
+
+        def pandas_rsi():
+            delta = close.diff()
+            gain, loss = delta.copy(), delta.copy()
+            gain[gain < 0] = 0
+            loss[loss > 0] = 0
+            return 100 - 100 / (
+                1 + gain.rolling(14).mean() / abs(loss.rolling(14).mean())
+            )
+
+        fast, slow = close.rolling(50).mean(), close.rolling(200).mean()
+
+        def pandas_crossovers():
+            out = pd.Series(0, index=close.index)
+            out.loc[(fast > slow) & (fast.shift(1) <= slow.shift(1))] = 1
+            out.loc[(fast < slow) & (fast.shift(1) >= slow.shift(1))] = -1
+            return out
+
+        cases = [
+            ("4 SMAs", pandas_smas, numpy_smas),
+            (
+                "20 day std",
+                lambda: close.rolling(window=20).std(),
+                lambda: indicators.rolling_std(closes, 20, sma),
+            ),
+            ("rsi", pandas_rsi, lambda: indicators.rsi_kernel(closes)),
+            (
+                "crossovers",
+                pandas_crossovers,
+                lambda: indicators.crossovers(fast.to_numpy(), slow.to_numpy()),
+            ),
+            (
+                "everything",
+                lambda: legacy_indicators(stock_data),
+                lambda: indicators.compute(stock_data),
+            ),
+        ]
+        for name, old, new in cases:
+            before, after = best_of(old), best_of(new)
+            print(
+                f"{bars:>8} bars  {name:>11}  pandas {before * 1000:8.2f} ms  numpy {after * 1000:7.2f} ms  speedup {before / after:5.1f}x"
+            )
+
+        check_indicators(
+            pd.concat([stock_data, indicators.compute(stock_data)], axis=1),
+            legacy_indicators(stock_data),
+        )
+        # gaps in the prices have to come out as nan for exactly the windows pandas leaves empty
+        gappy = stock_data.copy()
+        gappy.iloc[np.random.default_rng(1).integers(0, bars, 5), 1] = np.nan
+        check_indicators(
+            pd.concat([gappy, indicators.compute(gappy)], axis=1),
+            legacy_indicators(gappy),
+        )
+        gains = np.maximum(np.diff(closes), 0.0)
+        assert np.allclose(
+            indicators.wilder_mean(gains, 14),
+            wilder_loop(gains, 14),
+            rtol=1e-9,
+            equal_nan=True,
+        )
+        print(f"{bars:>8} bars  matches the pandas indicators (with and without gaps)")
+
+
+def synthetic_ohlc(bars):
+    """Daily bars with high / low / volume on top of synthetic_prices, and the same frame with the indicator columns"""
+    import pandas as pd
+
+    stock_data = synthetic_prices(bars)
+    spread = stock_data["Close"] * 0.01
+    stock_data["High"] = stock_data[["Open", "Close"]].max(axis=1) + spread
+    stock_data["Low"] = stock_data[["Open", "Close"]].min(axis=1) - spread
+    stock_data["Volume"] = 1_000_000.0
+    return stock_data, pd.concat([stock_data, indicators.compute(stock_data)], axis=1)
+
+
+# a ticker without any insider filings, the figures then only show prices
+NO_FILINGS = pl.DataFrame(schema={**storage.INSIDER_SCHEMA, "FILING_DATE": pl.Date})
+
+
+def bench_figures(args):
+    import plotly.io as pio
+    import app
+    import downsample
+
+    empty = NO_FILINGS
+    for bars in args.bars:
+        stock_data, df = synthetic_ohlc(bars)
+
+        def build():
+            figs = [
+                app.get_main_graph("TEST", stock_data, empty),
+                app.make_main_fig(df, empty, "TEST"),
+                app.make_bollinger_fig(df, "TEST"),
+            ]
+            return sum(len(pio.to_json(fig)) for fig in figs)
+
+        results = {}
+        for name, points in [
+            ("every bar", bars + 1),
+            ("downsampled", downsample.MAX_POINTS),
+        ]:
+            default, downsample.MAX_POINTS = downsample.MAX_POINTS, points
+            size, elapsed = timed(build)
+            downsample.MAX_POINTS = default
+            results[name] = (size, elapsed)
+        # LTTB keeps the shape, the highest / lowest close shown should be within a couple percent of the real ones
+        rows = downsample.view(stock_data)
+        assert rows["Close"].max() >= 0.98 * stock_data["Close"].max()
+        assert rows["Close"].min() <= 1.02 * stock_data["Close"].min()
+        print(
+            f"{bars:>7} bars  "
+            + "  ".join(
+                f"{name} {size / 1e6:6.2f} MB {elapsed * 1000:6.0f} ms"
+                for name, (size, elapsed) in results.items()
+            )
+        )
+
+
+# the table the insider page used to render: every filing as one html row
+def legacy_table(db_df):
+    import dash_bootstrap_components as dbc
+    import pandas as pd
+
+    table_df = pd.DataFrame(
+        {
+            "Date": db_df["FILING_DATE"],
+            "Shares": db_df["TRANS_SHARES"],
+            "Price": db_df["TRANS_PRICEPERSHARE"],
+            "Buy/Sell": db_df["TRANS_ACQUIRED_DISP_CD"].map({"A": "Buy", "D": "Sell"}),
+            "Change in Holdings (%)": round(
+                db_df["TRANS_SHARES"] / db_df["SHRS_OWND_FOLWNG_TRANS"] * 100, 2
+            ),
+        }
+    )
+    return dbc.Table.from_dataframe(table_df, id="table")
+
+
+def bench_table(args):
+    import json
+
+    import pandas as pd
+    import plotly
+    import app
+
+    def payload(component):
+        return len(json.dumps(component, cls=plotly.utils.PlotlyJSONEncoder))
+
+    stock_data = synthetic_prices(100).assign(**{"Stock Splits": 0.0})
+    with tempfile.TemporaryDirectory() as tmp:
+        for filings in args.filings:
+            db_path = os.path.join(tmp, f"{filings}.db")
+            df = synthetic_combined(filings, tickers=1)
+            ticker = df["ISSUERTRADINGSYMBOL"][0]
+            con = new_db(db_path)
+            bulk_insert(df, con)
+            con.close()
+            storage.configure(backend="sqlite", db_path=db_path)
+
+            before, before_time = timed(
+                lambda: payload(legacy_table(legacy_read_sqlite(ticker)))
+            )
+            after, after_time = timed(
+                lambda: payload(app.get_table(ticker, stock_data))
+            )
+
+            # paging all the way through with the keyset cursors gives every filing once, newest first
+            pages = app.table_pages(ticker, stock_data, storage.DEFAULT_SORT, [])
+            start = time.perf_counter()
+            rows = []
+            for page in range(app.page_count(pages)):
+                rows += app.table_rows(ticker, stock_data, pages, page)
+            per_page = (time.perf_counter() - start) / app.page_count(pages)
+            want = storage.read_sqlite(ticker).sort(
+                ["FILING_DATE", "ACCESSION_NUMBER"], descending=True
+            )
+            assert [row["Date"] for row in rows] == want["FILING_DATE"].dt.to_string(
+                "%Y-%m-%d"
+            ).to_list()
+            print(
+                f"{filings:>8} filings  full table {before / 1e6:6.2f} MB {before_time * 1000:6.0f} ms  "
+                f"first page {after / 1e6:6.3f} MB {after_time * 1000:5.0f} ms  next pages {per_page * 1000:5.2f} ms/page"
+            )
+
+
+# the loader from before the concurrent fetch: all the insider rows first, then the prices starting from their oldest filing date
+def legacy_get_stock_data(ticker):
+    import app
+    import prices
+
+    db_df = storage.read_insider_data(ticker)
+    start = db_df["FILING_DATE"].min() - datetime.timedelta(days=365)
+    stock_data = prices.get_price_history(ticker, start, datetime.date.today())
+    return stock_data, app.adjust_for_splits(db_df, stock_data)
+
+
+class SlowProvider:
+    """Price provider standing in for yfinance: synthetic daily bars (2000 to 2030) after a fixed network delay"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def fetch(self, ticker, start, end):
+        time.sleep(self.delay)
+        bars = synthetic_prices(8000).assign(
+            High=lambda df: df[["Open", "Close"]].max(axis=1),
+            Low=lambda df: df[["Open", "Close"]].min(axis=1),
+            Volume=1_000_000.0,
+            Dividends=0.0,
+            **{"Stock Splits": 0.0},
+        )
+        return bars[(bars.index >= start) & (bars.index < end)]
+
+
+def bench_load(args):
+    import app
+    import prices
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "real.db")
+        df = synthetic_combined(args.filings, tickers=1)
+        ticker = df["ISSUERTRADINGSYMBOL"][0]
+        con = new_db(db_path)
+        bulk_insert(df, con)
+        con.close()
+        storage.configure(backend="sqlite", db_path=db_path)
+
+        # a remote database is slow too, the insider read gets its own delay on top of the real query
+        read_insider_data = storage.read_insider_data
+
+        def slow_read(ticker, since=None):
+            time.sleep(args.db_delay)
+            return read_insider_data(ticker, since)
+
+        storage.read_insider_data = slow_read
+        loaded = {}
+        try:
+            for name, load in [
+                ("sequential", legacy_get_stock_data),
+                ("concurrent", app.get_stock_data),
+            ]:
+                elapsed = []
+                for run in range(args.runs):
+                    # a fresh price cache every run, the provider is hit like on a cold load
+                    prices.configure(
+                        SlowProvider(args.price_delay),
+                        os.path.join(tmp, f"prices_{name}_{run}"),
+                    )
+                    (stock_data, db_df), seconds = timed(load, ticker)
+                    elapsed.append(seconds)
+                    assert len(db_df) == args.filings and len(stock_data) > 0
+                    loaded[name] = stock_data, db_df
+                print(
+                    f"{name:>10}  {min(elapsed) * 1000:7.0f} ms  (db {args.db_delay * 1000:.0f} ms + prices {args.price_delay * 1000:.0f} ms of delay)"
+                )
+        finally:
+            storage.read_insider_data = read_insider_data
+        # same rows and prices either way
+        for want, got in zip(loaded["sequential"], loaded["concurrent"]):
+            assert want.equals(got)
+
+
+class PerYearProvider(SlowProvider):
+    """SlowProvider whose delay grows with the length of the range asked for, like a download does"""
+
+    def fetch(self, ticker, start, end):
+        import pandas as pd
+
+        years = (pd.Timestamp(end) - pd.Timestamp(start)).days / 365.25
+        return SlowProvider(self.delay * years).fetch(ticker, start, end)
+
+
+def bench_window(args):
+    import json
+
+    import plotly
+
+    import app
+    import prices
+
+    def payload(*components):
+        return len(json.dumps(components, cls=plotly.utils.PlotlyJSONEncoder))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "real.db")
+        df = synthetic_combined(args.filings, tickers=1)
+        # the synthetic filings stop in 2023, moved so the newest one is today and every window has some
+        shift = datetime.date.today() - df["FILING_DATE"].max()
+        df = df.with_columns(pl.col("FILING_DATE") + shift)
+        ticker = df["ISSUERTRADINGSYMBOL"][0]
+        con = new_db(db_path)
+        bulk_insert(df, con)
+        con.close()
+        storage.configure(backend="sqlite", db_path=db_path)
+        indicators.configure(os.path.join(tmp, "indicators"))
+
+        loaded = {}
+        for window in args.windows:
+            # a cold load every time: fresh price cache, nothing saved for the indicators
+            prices.configure(
+                PerYearProvider(args.price_delay), os.path.join(tmp, f"prices_{window}")
+            )
+            start = time.perf_counter()
+            data = app.prepare_ticker(ticker, window)
+            load_time = time.perf_counter() - start
+            stock_data, db_df = data["stock_data"], data["db_df"]
+            figures, figure_time = timed(
+                lambda: (
+                    app.get_table(ticker, stock_data, data["since"]),
+                    app.get_main_graph(ticker, stock_data, db_df),
+                    app.histogram_df_manipulation(
+                        ticker, stock_data, data["monthly_volume"]
+                    ),
+                )
+            )
+            loaded[window] = data
+            print(
+                f"{window:>4}  since {data['since'] or '-':>10}  {len(db_df):>7} filings  {len(stock_data):>6} bars  "
+                f"load {load_time * 1000:6.0f} ms  page 1 {figure_time * 1000:5.0f} ms {payload(*figures) / 1e6:6.2f} MB"
+            )
+
+    # a window is exactly the filings of the full history from its first day on
+    if "all" in loaded:
+        everything = loaded["all"]["db_df"]
+        for window, data in loaded.items():
+            since = datetime.date.fromisoformat(data["since"] or "0001-01-01")
+            want = everything.filter(pl.col("FILING_DATE") >= since)
+            assert sorted(want["ACCESSION_NUMBER"]) == sorted(
+                data["db_df"]["ACCESSION_NUMBER"]
+            ), window
+
+
+# the read path from before the polars frames: pd.read_sql through SQLAlchemy (a python object per value, converted column by column afterwards), v1 layout
+def legacy_read_sqlite(ticker):
+    import pandas as pd
+    import sqlalchemy as sql
+
+    with storage.get_engine().connect() as con:
+        return pd.read_sql(
+            sql.text(storage.layout_sql(storage.TICKER_SQL)),
+            con,
+            params={"ticker": ticker},
+        )
+
+
+def legacy_read_monthly_volume(ticker):
+    import pandas as pd
+    import sqlalchemy as sql
+
+    with storage.get_engine().connect() as con:
+        df = pd.read_sql(
+            sql.text(storage.layout_sql(storage.MONTHLY_SQL)),
+            con,
+            params={"ticker": ticker},
+        )
+    df["month"] = pd.to_datetime(df["month"])
+    return df
+
+
+# the pandas versions of adjust_for_splits, insider_traces, histogram_df_manipulation and add_weekly_volume, they return the arrays the figures were built from
+def legacy_callbacks(ticker, stock_data):
+    import pandas as pd
+
+    import app
+    import encoding
+
+    db_df = legacy_read_sqlite(ticker)
+    split_dates, factor_after = app.split_factors(stock_data)
+    filing_dates = pd.to_datetime(db_df["FILING_DATE"]).values
+    factor = factor_after[np.searchsorted(split_dates, filing_dates, side="right")]
+    db_df = db_df.assign(
+        TRANS_PRICEPERSHARE=(db_df["TRANS_PRICEPERSHARE"] / factor).round(2),
+        TRANS_SHARES=db_df["TRANS_SHARES"] * factor,
+        SHRS_OWND_FOLWNG_TRANS=db_df["SHRS_OWND_FOLWNG_TRANS"] * factor,
+    )
+    traces = []
+    for code in ["A", "D"]:
+        df = db_df[db_df["TRANS_ACQUIRED_DISP_CD"] == code]
+        trace = app.go.Scatter(
+            x=encoding.dates(df["FILING_DATE"]),
+            y=df["TRANS_PRICEPERSHARE"].to_numpy(dtype=np.float64),
+            customdata=df["TRANS_SHARES"].to_numpy(),
+            mode="markers",
+            hovertemplate=app.INSIDER_HOVER,
+        )
+        traces.append((trace.x, trace.y, trace.customdata))
+
+    monthly_volume = legacy_read_monthly_volume(ticker)
+    monthly_close = stock_data["Close"].resample("MS").mean()
+    volume = (
+        monthly_volume.set_index("month")["buy_value"]
+        + monthly_volume.set_index("month")["sell_value"]
+    ).reindex(monthly_close.index, fill_value=0)
+    months = monthly_close.index
+    fig = app.get_histogram(
+        pd.DataFrame({"month": months, "VOLUME": volume.values}),
+        pd.DataFrame({"month": months, "Close": monthly_close.values}),
+        ticker,
+    )
+    histogram = (fig.data[0].x, fig.data[0].y, fig.data[1].y)
+
+    volume_df = pd.DataFrame(stock_data["Volume"])
+    volume_df["week"] = volume_df.index.to_period("W")
+    weekly = volume_df.groupby("week")["Volume"].sum().reset_index()
+    weekly = (weekly["week"].dt.to_timestamp().to_numpy(), weekly["Volume"].to_numpy())
+    return traces, histogram, weekly
+
+
+def polars_callbacks(ticker, stock_data):
+    import app
+
+    db_df = app.adjust_for_splits(storage.read_insider_data(ticker), stock_data)
+    traces = [
+        (trace.x, trace.y, trace.customdata) for trace in app.insider_traces(db_df)
+    ]
+    fig = app.histogram_df_manipulation(
+        ticker, stock_data, storage.read_monthly_volume(ticker)
+    )
+    histogram = (fig.data[0].x, fig.data[0].y, fig.data[1].y)
+    weekly = app.add_weekly_volume(stock_data)
+    weekly = (weekly["week"].to_numpy(), weekly["Volume"].to_numpy())
+    return traces, histogram, weekly
+
+
+def bench_callbacks(args):
+    import encoding
+
+    # 25 years of daily bars with a 2:1 and a 3:1 split, so every filing before them gets adjusted
+    stock_data = synthetic_prices(6300).assign(
+        Volume=1_000_000.0, **{"Stock Splits": 0.0}
+    )
+    stock_data.iloc[[2000, 5000], stock_data.columns.get_loc("Stock Splits")] = [
+        2.0,
+        3.0,
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for filings in args.filings:
+            db_path = os.path.join(tmp, f"{filings}.db")
+            df = synthetic_combined(filings, tickers=1)
+            ticker = df["ISSUERTRADINGSYMBOL"][0]
+            con = new_db(db_path)
+            bulk_insert(df, con)
+            con.close()
+            storage.configure(backend="sqlite", db_path=db_path)
+            # opens the engine before the clock starts
+            storage.first_filing_date(ticker)
+
+            runs = [
+                (
+                    timed(legacy_callbacks, ticker, stock_data),
+                    timed(polars_callbacks, ticker, stock_data),
+                )
+                for _ in range(args.runs)
+            ]
+            (want, _), (got, _) = runs[0]
+            old = min(before[1] for before, _ in runs)
+            new = min(after[1] for _, after in runs)
+
+            # same markers (the rows come back in the same order), histogram bars and weekly volume
+            traces, histogram, weekly = got
+            for want_trace, trace in zip(want[0], traces):
+                for want_values, values in zip(want_trace, trace):
+                    np.testing.assert_array_equal(values, want_values)
+            for want_values, values in zip(want[1], histogram):
+                np.testing.assert_allclose(values, want_values, rtol=1e-12)
+            np.testing.assert_array_equal(weekly[0], want[2][0].astype("datetime64[D]"))
+            np.testing.assert_array_equal(weekly[1], want[2][1])
+            print(
+                f"{filings:>8} filings  pandas {old * 1000:7.1f} ms  polars {new * 1000:7.1f} ms  speedup {old / new:5.1f}x"
+            )
+
+
+# what a screener view would cost without the signal table: a pass over every filing grouped by ticker, on every view. written in sql independently of
+# getTransData.compute_signals so it doubles as the reference the table is checked against
+SCREENER_SCAN = """SELECT ticker, cluster_buys, sells, net_value, cluster_buys * 1.0 / MAX(sells, 1) AS buy_sell_ratio,
+    CAST(julianday(first_buy) - julianday(COALESCE(last_buy, first_filing, first_buy)) AS INTEGER) AS buy_gap_days FROM (
+        SELECT ISSUERTRADINGSYMBOL AS ticker,
+            SUM(FILING_DATE >= :start AND TRANS_ACQUIRED_DISP_CD = 'A') AS cluster_buys,
+            SUM(FILING_DATE >= :start AND TRANS_ACQUIRED_DISP_CD = 'D') AS sells,
+            TOTAL(CASE WHEN FILING_DATE >= :start AND TRANS_ACQUIRED_DISP_CD = 'A' THEN TRANS_SHARES * TRANS_PRICEPERSHARE END)
+                - TOTAL(CASE WHEN FILING_DATE >= :start AND TRANS_ACQUIRED_DISP_CD = 'D' THEN TRANS_SHARES * TRANS_PRICEPERSHARE END) AS net_value,
+            MIN(CASE WHEN FILING_DATE >= :start AND TRANS_ACQUIRED_DISP_CD = 'A' THEN FILING_DATE END) AS first_buy,
+            MAX(CASE WHEN FILING_DATE < :start AND TRANS_ACQUIRED_DISP_CD = 'A' THEN FILING_DATE END) AS last_buy,
+            MIN(CASE WHEN FILING_DATE < :start THEN FILING_DATE END) AS first_filing
+        FROM insider_data WHERE FILING_DATE <= :as_of GROUP BY 1 HAVING MAX(FILING_DATE) >= :start)
+    ORDER BY {signal} DESC, ticker LIMIT :limit"""
+
+
+def bench_screener(args):
+    import app
+
+    df = synthetic_combined(args.rows, tickers=args.tickers)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "real.db")
+        con = new_db(db_path)
+        bulk_insert(df, con)
+        _, build_time = timed(getTransData.rebuild_signals, con)
+        storage.configure(backend="sqlite", db_path=db_path)
+        # opens the engine before the clock starts
+        storage.read_signals(30, "cluster_buys", 1)
+        print(
+            f"{args.rows} rows, {args.tickers} tickers, signal table built in {build_time:.2f}s at ingest"
+        )
+
+        for days in getTransData.SIGNAL_WINDOWS:
+            for signal in storage.SIGNALS:
+                table, table_time = timed(
+                    storage.read_signals, days, signal, app.SCREENER_ROWS
+                )
+                as_of = table["as_of"][0]
+                params = {
+                    "start": str(as_of - datetime.timedelta(days=days - 1)),
+                    "as_of": str(as_of),
+                    "limit": app.SCREENER_ROWS,
+                }
+                scan, scan_time = timed(
+                    lambda: con.execute(
+                        SCREENER_SCAN.format(signal=signal), params
+                    ).fetchall()
+                )
+                # same tickers in the same order with the same values
+                columns = [
+                    "ticker",
+                    "cluster_buys",
+                    "sells",
+                    "net_value",
+                    "buy_sell_ratio",
+                    "buy_gap_days",
+                ]
+                want = pl.DataFrame(
+                    scan,
+                    schema={name: storage.SIGNALS_SCHEMA[name] for name in columns},
+                    orient="row",
+                )
+                assert_frame_equal(table.select(want.columns), want, rel_tol=1e-9)
+                print(
+                    f"{days:>4} days  {signal:>15}  full scan {scan_time * 1000:7.1f} ms  signal table {table_time * 1000:5.2f} ms  "
+                    f"speedup {scan_time / table_time:5.0f}x"
+                )
+        con.close()
+
+
+# the forward returns one filing at a time: a searchsorted into the ticker's cached closes per filing, the way you would check the markers by hand
+def legacy_event_returns(filings, cache_dir):
+    import pandas as pd
+
+    import eventStudy
+
+    tolerance = pd.Timedelta(days=int(eventStudy.ENTRY_TOLERANCE.rstrip("d")))
+    closes = {}
+    rows = []
+    for ticker, filing_date in filings.select("ticker", "filing_date").iter_rows():
+        if ticker not in closes:
+            closes[ticker] = pd.read_parquet(
+                os.path.join(cache_dir, f"{ticker}.parquet"), columns=["Close"]
+            )["Close"]
+        close = closes[ticker]
+        i = close.index.searchsorted(pd.Timestamp(filing_date))
+        if i == len(close) or close.index[i] - pd.Timestamp(filing_date) > tolerance:
+            rows.append([None] * len(eventStudy.HORIZONS))
+            continue
+        rows.append(
+            [
+                (
+                    close.iloc[i + days] / close.iloc[i] - 1
+                    if i + days < len(close)
+                    else None
+                )
+                for days in eventStudy.HORIZONS
+            ]
+        )
+    return pl.DataFrame(
+        rows,
+        schema={column: pl.Float64 for column in eventStudy.RETURN_COLUMNS},
+        orient="row",
+    )
+
+
+def bench_events(args):
+    import eventStudy
+    import prices
+
+    df = synthetic_combined(args.rows, tickers=args.tickers)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "real.db")
+        con = new_db(db_path)
+        bulk_insert(df, con)
+        # every ticker gets 30 years of daily bars in the price cache, written by prices.py the way the dashboard writes them
+        cache_dir = os.path.join(tmp, "price_cache")
+        cache = prices.PriceCache(SlowProvider(0), cache_dir)
+        for ticker in df["ISSUERTRADINGSYMBOL"].unique():
+            cache.get(ticker, "2000-01-01", "2031-01-01")
+
+        filings, read_time = timed(eventStudy.read_sqlite_filings, con)
+        print(
+            f"{len(filings)} filings, {args.tickers} tickers, read in {read_time:.2f}s"
+        )
+        results = {}
+        for workers in args.workers:
+            results[workers], elapsed = timed(
+                eventStudy.run, filings, cache_dir, workers
+            )
+            print(
+                f"engine   {workers:>2} workers  {elapsed:6.2f}s  {len(filings) / elapsed:>10,.0f} filings/sec"
+            )
+        returns = results[args.workers[0]]
+        for workers in args.workers[1:]:
+            assert returns.equals(results[workers])
+        stats, stats_time = timed(eventStudy.event_stats, returns)
+        _, write_time = timed(eventStudy.write_sqlite_results, con, returns, stats)
+        print(
+            f"statistics {stats_time * 1000:.0f} ms, tables written in {write_time:.2f}s"
+        )
+
+        # the loop only gets a sample, it is too slow for the whole table. same values for the same filings
+        sample = filings.sample(min(args.loop_max, len(filings)), seed=0).sort(
+            "ticker", "filing_date", "accession"
+        )
+        want, loop_time = timed(legacy_event_returns, sample, cache_dir)
+        got = sample.join(returns, on="accession", how="left").select(
+            eventStudy.RETURN_COLUMNS
+        )
+        assert_frame_equal(got, want, rel_tol=1e-12)
+        per_filing = loop_time / len(sample)
+        print(
+            f"per filing loop  {per_filing * 1e6:6.0f} us/filing -> {per_filing * len(filings):6.1f}s for every filing"
+        )
+        storage.configure(backend="sqlite", db_path=db_path)
+        ticker = filings["ticker"][0]
+        shown, read_time = timed(storage.read_event_stats, ticker)
+        assert len(shown) == 2 * 2 * len(eventStudy.HORIZONS)
+        print(f"event study tab read {read_time * 1000:.2f} ms")
+        con.close()
+
+
+# what the browser does with a figure before plotly.js can draw it: JSON.parse the response, turn every base64 typed array into a Float64Array etc and parse every
+# date string (plotly.js does that one string at a time when it sets up a date axis). node runs the same V8 engine as chrome
+PARSE_JS = """
+const fs = require("fs");
+const arrays = {f8: Float64Array, f4: Float32Array, i4: Int32Array, i2: Int16Array, i1: Int8Array, u1: Uint8Array};
+const text = fs.readFileSync(process.argv[2], "utf8");
+function walk(node) {
+    if (Array.isArray(node)) {
+        if (typeof node[0] === "string" && !isNaN(Date.parse(node[0]))) return node.map(Date.parse);
+        return node.map(walk);
+    }
+    if (node && typeof node === "object") {
+        if (node.bdata !== undefined) {
+            const bytes = Buffer.from(node.bdata, "base64");
+            return new arrays[node.dtype](bytes.buffer, bytes.byteOffset, bytes.length / arrays[node.dtype].BYTES_PER_ELEMENT);
+        }
+        for (const key in node) node[key] = walk(node[key]);
+    }
+    return node;
+}
+let best = Infinity;
+for (let i = 0; i < 20; i++) {
+    const start = process.hrtime.bigint();
+    walk(JSON.parse(text));
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e6);
+}
+console.log(best);
+"""
+
+
+def browser_parse_ms(payload):
+    """Best of 20 node runs of PARSE_JS on a figure payload, None without node"""
+    import shutil
+    import subprocess
+
+    node = shutil.which("node")
+    if node is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        script, data = os.path.join(tmp, "parse.js"), os.path.join(tmp, "figs.json")
+        with open(script, "w") as f:
+            f.write(PARSE_JS)
+        with open(data, "w") as f:
+            f.write(payload)
+        out = subprocess.run([node, script, data], capture_output=True, text=True)
+    return float(out.stdout)
+
+
+def bench_encoding(args):
+    import base64
+    import json
+
+    import pandas as pd
+    import plotly.io as pio
+    import app
+    import downsample
+    import encoding
+
+    empty = NO_FILINGS
+    modes = [
+        ("iso dates", False, False),
+        ("typed f8", True, False),
+        ("typed f4", True, True),
+    ]
+    for bars in args.bars:
+        stock_data, df = synthetic_ohlc(bars)
+        for label, points in [
+            ("every bar", bars + 1),
+            ("downsampled", downsample.MAX_POINTS),
+        ]:
+            results = []
+            for name, typed, float32 in modes:
+                saved = downsample.MAX_POINTS, encoding.TYPED_DATES, encoding.FLOAT32
+                downsample.MAX_POINTS, encoding.TYPED_DATES, encoding.FLOAT32 = (
+                    points,
+                    typed,
+                    float32,
+                )
+                figs = [
+                    app.get_main_graph("TEST", stock_data, empty),
+                    app.make_main_fig(df, empty, "TEST"),
+                    app.make_ta_fig(df, "TEST"),
+                    app.make_bollinger_fig(df, "TEST"),
+                ]
+                downsample.MAX_POINTS, encoding.TYPED_DATES, encoding.FLOAT32 = saved
+                payload, elapsed = timed(
+                    lambda: "[" + ",".join(pio.to_json(fig) for fig in figs) + "]"
+                )
+                if typed:
+                    # the epoch milliseconds have to decode back to exactly the bars dates
+                    x = json.loads(payload)[0]["data"][0]["x"]
+                    days = np.frombuffer(base64.b64decode(x["bdata"]), dtype=x["dtype"])
+                    want = downsample.view(stock_data, max_points=points).index
+                    assert (pd.to_datetime(days, unit="ms") == want).all()
+                results.append((name, len(payload), elapsed, browser_parse_ms(payload)))
+            print(
+                f"{bars:>7} bars {label:<12}"
+                + "  ".join(
+                    f"{name} {size / 1e6:6.2f} MB {elapsed * 1000:5.0f} ms"
+                    + ("" if parse is None else f" parse {parse:6.1f} ms")
+                    for name, size, elapsed, parse in results
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    dups = sub.add_parser("dups", help="df_dups vectorized vs per group loop")
+    dups.add_argument(
+        "--rows", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000]
+    )
+    dups.add_argument("--loop-max", type=int, default=20_000)
+    dups.set_defaults(func=bench_dups)
+
+    insert = sub.add_parser(
+        "insert", help="old per chunk commit insert vs bulk load mode"
+    )
+    insert.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    insert.set_defaults(func=bench_insert)
+
+    store = sub.add_parser(
+        "storage", help="per ticker lookup latency and size, sqlite vs parquet"
+    )
+    store.add_argument("--rows", type=int, default=2_000_000)
+    store.add_argument("--tickers", type=int, default=5000)
+    store.add_argument("--quarters", type=int, default=8)
+    store.add_argument("--lookups", type=int, default=200)
+    store.set_defaults(func=bench_storage)
+
+    schema = sub.add_parser(
+        "schema",
+        help="database size and per ticker read latency, v1 table vs the migrated v2 layout",
+    )
+    schema.add_argument("--rows", type=int, default=2_000_000)
+    schema.add_argument("--tickers", type=int, default=5000)
+    schema.add_argument("--lookups", type=int, default=200)
+    schema.set_defaults(func=bench_schema)
+
+    splits = sub.add_parser(
+        "splits", help="split adjustment of insider filings, row loop vs vectorized"
+    )
+    splits.add_argument("--filings", type=int, nargs="+", default=[10_000, 50_000])
+    splits.set_defaults(func=bench_splits)
+
+    ind = sub.add_parser(
+        "indicators",
+        help="incremental indicator engine vs full pandas recompute, checks both agree",
+    )
+    ind.add_argument("--bars", type=int, nargs="+", default=[2_500, 10_000])
+    ind.add_argument("--updates", type=int, default=50)
+    ind.add_argument("--step", type=int, default=1)
+    ind.set_defaults(func=bench_indicators)
+
+    kernels = sub.add_parser(
+        "kernels", help="numpy indicator kernels vs the pandas rolling code"
+    )
+    kernels.add_argument("--bars", type=int, nargs="+", default=[5_000, 100_000])
+    kernels.set_defaults(func=bench_kernels)
+
+    figures = sub.add_parser(
+        "figures",
+        help="price figure json size and build time, every bar vs downsampled",
+    )
+    figures.add_argument(
+        "--bars", type=int, nargs="+", default=[2_500, 5_000, 20_000, 100_000]
+    )
+    figures.set_defaults(func=bench_figures)
+
+    load = sub.add_parser(
+        "load",
+        help="cold ticker load with a slow price provider, rows then prices vs both at once",
+    )
+    load.add_argument("--filings", type=int, default=20_000)
+    load.add_argument("--price-delay", type=float, default=0.5)
+    load.add_argument("--db-delay", type=float, default=0.3)
+    load.add_argument("--runs", type=int, default=3)
+    load.set_defaults(func=bench_load)
+
+    window = sub.add_parser(
+        "window",
+        help="cold ticker load and page 1 payload for each date window, with a price download that takes longer the more years it covers",
+    )
+    window.add_argument("--filings", type=int, default=50_000)
+    window.add_argument("--windows", nargs="+", default=["all", "10Y", "5Y", "1Y"])
+    window.add_argument(
+        "--price-delay", type=float, default=0.02, help="seconds per year of prices"
+    )
+    window.set_defaults(func=bench_window)
+
+    callbacks = sub.add_parser(
+        "callbacks",
+        help="per ticker callback time on a large issuer (insider read, split adjustment, markers, histogram, weekly volume), pandas vs polars",
+    )
+    callbacks.add_argument(
+        "--filings", type=int, nargs="+", default=[20_000, 100_000, 500_000]
+    )
+    callbacks.add_argument("--runs", type=int, default=5)
+    callbacks.set_defaults(func=bench_callbacks)
+
+    screener = sub.add_parser(
+        "screener",
+        help="ranked screener view from the precomputed signal table vs a full table scan per view, checks both agree",
+    )
+    screener.add_argument("--rows", type=int, default=2_000_000)
+    screener.add_argument("--tickers", type=int, default=5000)
+    screener.set_defaults(func=bench_screener)
+
+    events = sub.add_parser(
+        "events",
+        help="forward returns after every filing, vectorized engine over a process pool vs a per filing loop, checks both agree",
+    )
+    events.add_argument("--rows", type=int, default=1_000_000)
+    events.add_argument("--tickers", type=int, default=2000)
+    events.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    events.add_argument("--loop-max", type=int, default=20_000)
+    events.set_defaults(func=bench_events)
+
+    table = sub.add_parser(
+        "table",
+        help="insider table payload, every filing as html vs the first page, and the keyset page reads",
+    )
+    table.add_argument("--filings", type=int, nargs="+", default=[5_000, 50_000])
+    table.set_defaults(func=bench_table)
+
+    enc = sub.add_parser(
+        "encoding",
+        help="figure json size, serialize time and browser parse time, iso date strings vs typed arrays",
+    )
+    enc.add_argument("--bars", type=int, nargs="+", default=[5_000, 20_000, 100_000])
+    enc.set_defaults(func=bench_encoding)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,4 +22,27 @@ cur.execute(
     """CREATE INDEX idx_ISSUERTRADINGSYMBOL ON insider_data(ISSUERTRADINGSYMBOL)"""
 )
 con.commit()
+
+# the insider table on the dashboard pages through a ticker's filings in filing date order, this index answers those reads without a sort
+cur.execute(
+    """CREATE INDEX IF NOT EXISTS idx_TICKER_FILING_DATE ON insider_data(ISSUERTRADINGSYMBOL, FILING_DATE, ACCESSION_NUMBER)"""
+)
+# every filing can only be in the table once, getTransData.py upserts on this so reloading a quarter never duplicates rows
+cur.execute(
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_ACCESSION_NUMBER ON insider_data(ACCESSION_NUMBER)"""
+)
+# manifest of the quarter folders that have been loaded, lets getTransData.py skip anything it has already seen
+cur.execute(
+    """CREATE TABLE IF NOT EXISTS loaded_quarters (quarter TEXT PRIMARY KEY, trans_sha256 TEXT, sub_sha256 TEXT, file_bytes INTEGER, file_mtime REAL, row_count INTEGER, loaded_at TEXT)"""
+)
+# per ticker daily / monthly buy and sell volume, kept up to date by getTransData.py so the dashboard doesnt have to aggregate the raw filings
+cur.execute(
+    """CREATE TABLE IF NOT EXISTS insider_daily (ticker TEXT, filing_date TEXT, buy_shares REAL, sell_shares REAL, buy_value REAL, sell_value REAL, filings INTEGER,
+    PRIMARY KEY (ticker, filing_date)) WITHOUT ROWID"""
+)
+cur.execute(
+    """CREATE TABLE IF NOT EXISTS insider_monthly (ticker TEXT, month TEXT, buy_shares REAL, sell_shares REAL, buy_value REAL, sell_value REAL, filings INTEGER,
+    PRIMARY KEY (ticker, month)) WITHOUT ROWID"""
+)
+con.commit()
 con.close()
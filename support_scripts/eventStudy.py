@@ -0,0 +1,389 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import polars as pl
+
+import getTransData
+
+# storage.py and prices.py live in the repo root next to the dashboard
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import storage
+
+"""
+Event study over the whole database: for every insider filing, the return of the stock over the 5, 20, 60 and 250 trading days after it, taken from the
+price history the dashboard keeps on disk (prices.py, one parquet file per ticker in INSIDER_PRICE_CACHE). Tickers without a cached history are left out,
+--fetch downloads them into the cache first.
+The forward returns are worked out once per price bar (close N bars later / close - 1, a shift per ticker) and every filing picks up the bar it was filed on with
+an as-of join (the first bar on or after the filing date, within ENTRY_TOLERANCE), so there is no per filing loop anywhere. The tickers are split into chunks that
+run in a pool of processes (reading and decoding the price files is most of the work), each worker returns its chunk's rows and this process writes them.
+Results go into two tables next to the filings (or into <parquet dir>/events for the parquet backend), rebuilt from scratch on every run:
+    insider_event_returns -> one row per filing: entry bar, entry close and the return over each of HORIZONS (null when the history ends too early)
+    insider_event_stats   -> events, mean / median return and hit rate (share of positive returns) per ticker, buy / sell and horizon, plus the same over every
+                             ticker under the ticker storage.MARKET. The dashboard's event study tab only reads this one (storage.read_event_stats)
+Run it after getTransData.py (and before migrateToV2.py, which copies both tables), e.g. python support_scripts/eventStudy.py --db real.db --workers 8
+"""
+
+HORIZONS = [5, 20, 60, 250]
+# how far after the filing date the entry bar can be: a weekend plus a holiday, not a gap in the cached history
+ENTRY_TOLERANCE = "7d"
+RETURN_COLUMNS = [f"return_{days}" for days in HORIZONS]
+
+FILINGS_SQL = """SELECT ACCESSION_NUMBER, ISSUERTRADINGSYMBOL, FILING_DATE, TRANS_ACQUIRED_DISP_CD, TRANS_SHARES * TRANS_PRICEPERSHARE AS VALUE FROM insider_data
+    WHERE ISSUERTRADINGSYMBOL IS NOT NULL AND FILING_DATE IS NOT NULL AND ACCESSION_NUMBER IS NOT NULL AND TRANS_ACQUIRED_DISP_CD IN ('A', 'D')"""
+# clustered by ticker and filing date like the v2 filings table, one ticker's events are a single range read
+RETURNS_TABLE = f"""CREATE TABLE IF NOT EXISTS insider_event_returns (ticker TEXT NOT NULL, filing_date TEXT NOT NULL, accession TEXT NOT NULL, code TEXT, value REAL,
+    entry_date TEXT, entry_close REAL, {", ".join(f"{column} REAL" for column in RETURN_COLUMNS)}, PRIMARY KEY (ticker, filing_date, accession)) WITHOUT ROWID"""
+STATS_TABLE = """CREATE TABLE IF NOT EXISTS insider_event_stats (ticker TEXT NOT NULL, code TEXT NOT NULL, horizon INTEGER NOT NULL, events INTEGER, mean_return REAL,
+    median_return REAL, hit_rate REAL, PRIMARY KEY (ticker, code, horizon)) WITHOUT ROWID"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Forward returns after every insider filing, from the cached price history"
+    )
+    parser.add_argument(
+        "--db",
+        default="real.db",
+        help="v1 database to read the filings from and write the results to",
+    )
+    parser.add_argument("--backend", choices=["sqlite", "parquet"], default="sqlite")
+    parser.add_argument(
+        "--parquet-dir",
+        default="parquet",
+        help="parquet store for the parquet backend, the results go in its events folder",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("INSIDER_PRICE_CACHE", "price_cache"),
+        help="price cache folder the dashboard uses (INSIDER_PRICE_CACHE)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="processes the tickers are split across, 1 runs everything in this process",
+    )
+    parser.add_argument(
+        "--fetch",
+        action="store_true",
+        help="download the price history of every ticker missing from the cache first (through prices.py, so INSIDER_PRICE_FIXTURES works too)",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.backend == "parquet":
+        filings = read_parquet_filings(args.parquet_dir)
+    else:
+        if not os.path.exists(args.db):
+            exit(f"{args.db} doesnt exist")
+        con = sqlite3.connect(args.db)
+        # same as getTransData.py, a v2 file gets the results copied in by migrateToV2.py
+        if con.execute("PRAGMA user_version").fetchone()[0] >= 2:
+            exit(
+                f"{args.db} is a v2 database, run this on the v1 database and rerun migrateToV2.py"
+            )
+        filings = read_sqlite_filings(con)
+    print(
+        f"read {len(filings)} filings for {filings['ticker'].n_unique()} tickers in {time.perf_counter() - start:.1f}s"
+    )
+
+    if args.fetch:
+        fetch_missing(filings, args.cache_dir)
+    returns = run(filings, args.cache_dir, args.workers)
+    stats = event_stats(returns)
+    if args.backend == "parquet":
+        write_parquet_results(args.parquet_dir, returns, stats)
+    else:
+        write_sqlite_results(con, returns, stats)
+        con.close()
+    priced = returns["entry_date"].is_not_null().sum()
+    print(
+        f"{priced} of {len(returns)} filings priced, done in {time.perf_counter() - start:.1f}s"
+    )
+
+
+def read_sqlite_filings(con: sqlite3.Connection) -> pl.DataFrame:
+    # batches straight into polars like getTransData.rebuild_signals, only the columns the study needs
+    batches = pl.read_database(
+        FILINGS_SQL,
+        con,
+        iter_batches=True,
+        batch_size=1_000_000,
+        schema_overrides={"FILING_DATE": pl.String, "VALUE": pl.Float64},
+    )
+    # an empty table gives no batches at all, the typed empty frame in front keeps the columns
+    empty = pl.DataFrame(
+        schema={
+            "ACCESSION_NUMBER": pl.String,
+            "ISSUERTRADINGSYMBOL": pl.String,
+            "FILING_DATE": pl.String,
+            "TRANS_ACQUIRED_DISP_CD": pl.String,
+            "VALUE": pl.Float64,
+        }
+    )
+    filings = pl.concat([empty, *batches], how="vertical_relaxed").with_columns(
+        pl.col("FILING_DATE").str.to_date("%Y-%m-%d", strict=False)
+    )
+    return filings_frame(filings.lazy())
+
+
+def read_parquet_filings(parquet_dir) -> pl.DataFrame:
+    lf = pl.scan_parquet(os.path.join(parquet_dir, "*.parquet")).filter(
+        pl.col("TRANS_ACQUIRED_DISP_CD").is_in(["A", "D"])
+    )
+    return filings_frame(
+        lf.select(
+            "ACCESSION_NUMBER",
+            "ISSUERTRADINGSYMBOL",
+            "FILING_DATE",
+            "TRANS_ACQUIRED_DISP_CD",
+            VALUE=pl.col("TRANS_SHARES") * pl.col("TRANS_PRICEPERSHARE"),
+        )
+    )
+
+
+# the names the rest of the study uses, sorted by ticker so the chunks are contiguous slices
+def filings_frame(lf: pl.LazyFrame) -> pl.DataFrame:
+    return (
+        lf.select(
+            ticker=pl.col("ISSUERTRADINGSYMBOL"),
+            filing_date=pl.col("FILING_DATE"),
+            accession=pl.col("ACCESSION_NUMBER"),
+            code=pl.col("TRANS_ACQUIRED_DISP_CD"),
+            value=pl.col("VALUE"),
+        )
+        .drop_nulls(["ticker", "filing_date", "accession"])
+        .sort("ticker", "filing_date", "accession")
+        .collect()
+    )
+
+
+def load_prices(cache_dir, tickers) -> pl.DataFrame:
+    """Daily closes of the tickers from the price cache with the forward return over every horizon already worked out per bar
+
+    Args:
+        cache_dir (str): prices.py cache folder, <TICKER>.parquet files written from a pandas frame (the Date index is a column in the file)
+        tickers (list[str]): tickers to read, the ones without a file are skipped
+
+    Returns:
+        pl.DataFrame: ticker, Date (pl.Date), Close and one return_N column per horizon (null for the last N bars), sorted by ticker and Date
+    """
+    frames = []
+    for ticker in tickers:
+        path = os.path.join(cache_dir, f"{ticker}.parquet")
+        if not os.path.exists(path):
+            continue
+        frames.append(
+            pl.read_parquet(path, columns=["Date", "Close"])
+            .drop_nulls("Close")
+            .select(
+                ticker=pl.lit(ticker),
+                Date=pl.col("Date").cast(pl.Date),
+                Close=pl.col("Close"),
+            )
+        )
+    if not frames:
+        return pl.DataFrame(
+            schema={
+                "ticker": pl.String,
+                "Date": pl.Date,
+                "Close": pl.Float64,
+                **{column: pl.Float64 for column in RETURN_COLUMNS},
+            }
+        )
+    prices = pl.concat(frames).sort("ticker", "Date")
+    return prices.with_columns(
+        [
+            (pl.col("Close").shift(-days).over("ticker") / pl.col("Close") - 1).alias(
+                column
+            )
+            for days, column in zip(HORIZONS, RETURN_COLUMNS)
+        ]
+    )
+
+
+def event_returns(filings: pl.DataFrame, prices: pl.DataFrame) -> pl.DataFrame:
+    """As-of joins every filing onto the first price bar of its ticker on or after the filing date (at most ENTRY_TOLERANCE later)
+
+    Args:
+        filings (pl.DataFrame): filings_frame rows
+        prices (pl.DataFrame): load_prices output for (at least) the same tickers
+
+    Returns:
+        pl.DataFrame: the filings with entry_date, entry_close and the return_N columns, all null for a filing without an entry bar
+    """
+    joined = filings.sort("filing_date").join_asof(
+        prices.rename({"Date": "entry_date", "Close": "entry_close"}).sort(
+            "entry_date"
+        ),
+        left_on="filing_date",
+        right_on="entry_date",
+        by="ticker",
+        strategy="forward",
+        tolerance=ENTRY_TOLERANCE,
+        check_sortedness=False,
+    )
+    return joined.sort("ticker", "filing_date", "accession")
+
+
+# runs in a worker process -> one chunk of tickers from reading their price files to their event rows
+def process_tickers(cache_dir, filings):
+    return event_returns(
+        filings, load_prices(cache_dir, filings["ticker"].unique().to_list())
+    )
+
+
+def run(
+    filings: pl.DataFrame, cache_dir, workers=1, chunks_per_worker=4
+) -> pl.DataFrame:
+    """Computes the event rows for every filing, the tickers split into chunks across a pool of processes
+
+    Args:
+        filings (pl.DataFrame): filings_frame rows, sorted by ticker
+        cache_dir (str): price cache folder
+        workers (int): processes, 1 runs every chunk in this process
+        chunks_per_worker (int): chunks handed out per process, a few each so one chunk of heavy tickers doesnt leave the rest of the pool idle
+
+    Returns:
+        pl.DataFrame: event_returns rows for every filing, sorted by ticker, filing date and accession number
+    """
+    start = time.perf_counter()
+    # an empty database (or a parquet store without buys / sells) has no tickers to chunk, the empty frame still gets every column
+    if len(filings) == 0:
+        return event_returns(filings, load_prices(cache_dir, []))
+    tickers = filings["ticker"].unique(maintain_order=True)
+    chunk_count = max(1, min(len(tickers), workers * chunks_per_worker))
+    # contiguous ticker ranges, the filings are sorted by ticker so every chunk is one slice
+    first_tickers = pl.Series(
+        [tickers[len(tickers) * i // chunk_count] for i in range(chunk_count)]
+    )
+    offsets = filings["ticker"].search_sorted(first_tickers).to_list() + [len(filings)]
+    chunks = [filings.slice(low, high - low) for low, high in zip(offsets, offsets[1:])]
+    if workers <= 1:
+        parts = [process_tickers(cache_dir, chunk) for chunk in chunks]
+    else:
+        with getTransData.worker_pool(workers) as pool:
+            parts = list(pool.map(process_tickers, [cache_dir] * len(chunks), chunks))
+    returns = pl.concat(parts).sort("ticker", "filing_date", "accession")
+    print(
+        f"forward returns for {len(returns)} filings in {time.perf_counter() - start:.1f}s ({workers} workers, {chunk_count} chunks)"
+    )
+    return returns
+
+
+def event_stats(returns: pl.DataFrame) -> pl.DataFrame:
+    """Aggregate statistics of the forward returns per ticker, buy / sell and horizon, plus the market wide ones under storage.MARKET. Filings without a return for a horizon dont count
+
+    Args:
+        returns (pl.DataFrame): run output
+
+    Returns:
+        pl.DataFrame: ticker, code, horizon (trading days), events, mean_return, median_return, hit_rate (share of events with a positive return)
+    """
+    long = (
+        returns.select("ticker", "code", *RETURN_COLUMNS)
+        .unpivot(
+            index=["ticker", "code"],
+            variable_name="horizon",
+            value_name="forward_return",
+        )
+        .drop_nulls("forward_return")
+        .with_columns(pl.col("horizon").str.strip_prefix("return_").cast(pl.Int64))
+    )
+    aggregates = dict(
+        events=pl.len().cast(pl.Int64),
+        mean_return=pl.col("forward_return").mean(),
+        median_return=pl.col("forward_return").median(),
+        hit_rate=(pl.col("forward_return") > 0).mean(),
+    )
+    per_ticker = long.group_by("ticker", "code", "horizon").agg(**aggregates)
+    market = (
+        long.group_by("code", "horizon")
+        .agg(**aggregates)
+        .select(pl.lit(storage.MARKET).alias("ticker"), pl.all())
+    )
+    return pl.concat([market, per_ticker.select(market.columns)]).sort(
+        "ticker", "code", "horizon"
+    )
+
+
+def write_sqlite_results(
+    con: sqlite3.Connection, returns: pl.DataFrame, stats: pl.DataFrame
+):
+    start = time.perf_counter()
+    con.execute(RETURNS_TABLE)
+    con.execute(STATS_TABLE)
+    con.execute("DELETE FROM insider_event_returns")
+    con.execute("DELETE FROM insider_event_stats")
+    dates = pl.col("filing_date", "entry_date").dt.to_string("%Y-%m-%d")
+    columns = [
+        "ticker",
+        "filing_date",
+        "accession",
+        "code",
+        "value",
+        "entry_date",
+        "entry_close",
+        *RETURN_COLUMNS,
+    ]
+    con.executemany(
+        f"INSERT INTO insider_event_returns ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        returns.select(columns).with_columns(dates).iter_rows(),
+    )
+    con.executemany(
+        "INSERT INTO insider_event_stats VALUES (?, ?, ?, ?, ?, ?, ?)",
+        stats.iter_rows(),
+    )
+    con.commit()
+    print(
+        f"wrote {len(returns)} event rows and {len(stats)} statistics rows in {time.perf_counter() - start:.1f}s"
+    )
+
+
+# parquet store: like the signals the results go in their own folder, out of the way of the *.parquet glob over the quarter files
+def write_parquet_results(parquet_dir, returns, stats):
+    folder = os.path.join(parquet_dir, "events")
+    os.makedirs(folder, exist_ok=True)
+    for name, df in [("returns", returns), ("stats", stats)]:
+        path = os.path.join(folder, f"{name}.parquet")
+        df.write_parquet(path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+def fetch_missing(filings: pl.DataFrame, cache_dir, threads=8):
+    """Downloads the price history of every ticker the cache has no file for, from a year before its first filing. Threads, the time goes into waiting on the provider"""
+    import prices
+
+    prices.configure(cache_dir=cache_dir)
+    first_filings = filings.group_by("ticker").agg(pl.col("filing_date").min())
+    missing = [
+        (ticker, first)
+        for ticker, first in first_filings.iter_rows()
+        if not os.path.exists(os.path.join(cache_dir, f"{ticker}.parquet"))
+    ]
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(threads) as pool:
+        jobs = [
+            pool.submit(
+                prices.get_price_history, ticker, first - datetime.timedelta(days=365)
+            )
+            for ticker, first in missing
+        ]
+        for job in as_completed(jobs):
+            try:
+                job.result()
+            except Exception:
+                failed += 1
+    print(
+        f"fetched prices for {len(missing) - failed} of {len(missing)} uncached tickers in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
+import argparse
+import datetime
+import hashlib
+import multiprocessing
 import sqlite3
 import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     import polars as pl
@@ -15,31 +24,368 @@ the accession_number (unqiue ID given by SEC). Then the completed dataframe gets
 """
 
 
-# TODO:
-# run once more just have 10 more folders to run through
 def main():
-    # starting from 71 will go through all of the data add to a polars dataframe and VERY efficiently submit it to the database
-    for i in reversed(range(1, 11)):
-        trans_name = os.path.join("data", str(i), "NONDERIV_TRANS.tsv")
-        sub_name = os.path.join("data", str(i), "SUBMISSION.tsv")
+    parser = argparse.ArgumentParser(
+        description="Load the quarterly SEC insider transaction folders into the sqlite database (or the parquet store)"
+    )
+    parser.add_argument(
+        "--data-dir",
+        default="data",
+        help="folder holding one sub folder per quarter (each with NONDERIV_TRANS.tsv and SUBMISSION.tsv)",
+    )
+    parser.add_argument("--db", default="real.db", help="sqlite database to load into")
+    parser.add_argument(
+        "--backend",
+        choices=["sqlite", "parquet"],
+        default="sqlite",
+        help="sqlite loads into --db, parquet writes one ticker sorted file per quarter into --parquet-dir",
+    )
+    parser.add_argument(
+        "--parquet-dir",
+        default="parquet",
+        help="output folder for the parquet backend",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes parsing quarters at the same time, 1 runs everything in this process",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="bulk load mode: drops the ticker index and relaxes durability while loading, then rebuilds the index at the end",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="load every folder even if the manifest says it is already in the database (or the parquet file already exists)",
+    )
+    parser.add_argument(
+        "--rebuild-rollups",
+        action="store_true",
+        help="rebuild the daily / monthly rollup tables from scratch after loading",
+    )
+    args = parser.parse_args()
+
+    folders = find_quarter_folders(args.data_dir)
+    if len(folders) == 0:
+        exit(f"no quarter folders found in {args.data_dir}")
+    start = time.perf_counter()
+    if args.backend == "parquet":
+        rows = write_parquet_store(folders, args.parquet_dir, args.workers, args.force)
+        if rows or not os.path.exists(
+            os.path.join(args.parquet_dir, "signals", "signals.parquet")
+        ):
+            write_parquet_signals(args.parquet_dir)
+        print(f"wrote {rows} rows in {time.perf_counter() - start:.1f}s")
+        return
+    con = sqlite3.connect(args.db)
+    # a v2 file written by migrateToV2.py only has the compact tables, quarters get loaded into the v1 database and migrated again
+    if con.execute("PRAGMA user_version").fetchone()[0] >= 2:
+        exit(
+            f"{args.db} is a v2 database, load into the v1 database and rerun migrateToV2.py"
+        )
+    cur = sqlite3.Cursor(con)
+    ensure_schema(con)
+
+    # skip every quarter the manifest already has so rerunning only loads the new folders
+    fingerprints = {}
+    # the manifest only knows about earlier runs, two folders with the same files in this run are caught here
+    hashes = set()
+    for folder in folders:
+        fingerprint = quarter_fingerprint(con, folder)
+        if fingerprint is None and not args.force:
+            print(f"{folder}: already loaded, skipping")
+            continue
+        fingerprint = fingerprint or quarter_fingerprint(con, folder, True)
+        content = (fingerprint["trans_sha256"], fingerprint["sub_sha256"])
+        if content in hashes:
+            print(f"{folder}: same files as a folder loaded in this run, skipping")
+            continue
+        hashes.add(content)
+        fingerprints[folder] = fingerprint
+    folders = list(fingerprints)
+
+    if args.bulk:
+        start_bulk_load(con)
+    # in bulk mode the ticker index is gone so the rollups get rebuilt in one pass at the end instead of after every quarter
+    if args.workers <= 1:
+        rows = sum(
+            ingest_folder(folder, con, cur, fingerprints[folder], not args.bulk)
+            for folder in folders
+        )
+    else:
+        rows = ingest_parallel(
+            folders, con, cur, args.workers, fingerprints, not args.bulk
+        )
+    if args.bulk:
+        finish_bulk_load(con)
+    elif args.rebuild_rollups:
+        rebuild_rollups(con)
+    # the signals depend on the newest filing in the whole table, so any new rows mean a full recompute
+    has_signals = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'insider_signals'"
+    ).fetchone()
+    if rows or not has_signals:
+        rebuild_signals(con)
+    con.close()
+    print(
+        f"loaded {rows} rows from {len(folders)} folders in {time.perf_counter() - start:.1f}s"
+    )
+
+
+def find_quarter_folders(data_dir):
+    """Finds every folder under data_dir that has both of the SEC tsv files in it. Folders named with numbers (data/1, data/2...) are sorted numerically, the rest by name"""
+    folders = []
+    for name in os.listdir(data_dir):
+        folder = os.path.join(data_dir, name)
+        if os.path.isfile(
+            os.path.join(folder, "NONDERIV_TRANS.tsv")
+        ) and os.path.isfile(os.path.join(folder, "SUBMISSION.tsv")):
+            folders.append(folder)
+    return sorted(
+        folders,
+        key=lambda f: (
+            (0, int(os.path.basename(f)), "")
+            if os.path.basename(f).isdigit()
+            else (1, 0, os.path.basename(f))
+        ),
+    )
+
+
+def quarter_fingerprint(con, folder, force=False):
+    """Works out whether a quarter folder still needs loading by checking it against the loaded_quarters manifest. If the folder name, total size and modification time match what was
+        recorded the files are not even read, otherwise both tsv files get hashed and compared against every quarter loaded so far (the same data under a new folder name is skipped too,
+        main also skips a folder with the same files as one earlier in the same run).
+    Args:
+        con (sqlite3.Connection): connection to the database
+        folder (str): quarter folder
+        force (bool): always return the fingerprint, even if the quarter is already loaded
+    Returns:
+        dict | None: the manifest values for the folder, None if it is already loaded
+    """
+    paths = [
+        os.path.join(folder, "NONDERIV_TRANS.tsv"),
+        os.path.join(folder, "SUBMISSION.tsv"),
+    ]
+    fingerprint = {
+        "quarter": os.path.basename(os.path.normpath(folder)),
+        "file_bytes": sum(os.path.getsize(path) for path in paths),
+        "file_mtime": max(os.path.getmtime(path) for path in paths),
+    }
+    seen = con.execute(
+        "SELECT 1 FROM loaded_quarters WHERE quarter = ? AND file_bytes = ? AND file_mtime = ?",
+        (fingerprint["quarter"], fingerprint["file_bytes"], fingerprint["file_mtime"]),
+    ).fetchone()
+    if seen and not force:
+        return None
+
+    fingerprint["trans_sha256"], fingerprint["sub_sha256"] = map(hash_file, paths)
+    seen = con.execute(
+        "SELECT 1 FROM loaded_quarters WHERE trans_sha256 = ? AND sub_sha256 = ?",
+        (fingerprint["trans_sha256"], fingerprint["sub_sha256"]),
+    ).fetchone()
+    if seen and not force:
+        return None
+    return fingerprint
+
 
-        final_trans = get_trans_frame(trans_name)
-        sub_df = get_sub_frame(sub_name)
+# sha256 of a file read in 1MB blocks so the big tsv files never get loaded all at once
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-        combined_df = sub_df.join(final_trans, on="ACCESSION_NUMBER")
 
-        con = sqlite3.connect("real.db")
-        cur = sqlite3.Cursor(con)
-        # separating the dataframe into chunks like this makes even faster to insert into the database
-        chunk_size = 10000
-        for i in range(0, len(combined_df), chunk_size):
-            chunk = combined_df[i : i + chunk_size]
-            insert_chunk(chunk, con, cur)
-        con.close()
+# adds the quarter to the manifest, called before the quarter is committed so the rows and the manifest entry land in the same transaction
+def record_quarter(con, fingerprint, rows):
+    con.execute(
+        """INSERT INTO loaded_quarters (quarter, trans_sha256, sub_sha256, file_bytes, file_mtime, row_count, loaded_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(quarter) DO UPDATE SET trans_sha256 = excluded.trans_sha256, sub_sha256 = excluded.sub_sha256, file_bytes = excluded.file_bytes,
+        file_mtime = excluded.file_mtime, row_count = excluded.row_count, loaded_at = excluded.loaded_at""",
+        (
+            fingerprint["quarter"],
+            fingerprint["trans_sha256"],
+            fingerprint["sub_sha256"],
+            fingerprint["file_bytes"],
+            fingerprint["file_mtime"],
+            rows,
+            datetime.datetime.now().isoformat(timespec="seconds"),
+        ),
+    )
+
+
+def ingest_folder(folder, con, cur, fingerprint=None, rollups=True, chunk_size=10000):
+    """Runs the whole lazy pipeline for one quarter folder with the polars streaming engine and hands each record batch straight to the database as it comes out,
+        so the full quarter never has to sit in memory at once. The whole quarter is committed as one transaction. Prints the wall time and peak RSS once the folder is done.
+    Args:
+        folder (str): folder containing the NONDERIV_TRANS.tsv and SUBMISSION.tsv for a quarter
+        con (sqlite3.Connection): connection to the database
+        cur (sqlite3.Cursor): cursor for the connection
+        fingerprint (dict): manifest entry from quarter_fingerprint, recorded in the same transaction as the rows
+        rollups (bool): update the daily / monthly rollup tables for the tickers and days this quarter touched
+        chunk_size (int): number of rows in each batch that gets inserted
+    Returns:
+        int: number of rows inserted
+    """
+    start = time.perf_counter()
+    rows = insert_frame(get_combined_frame(folder), con, cur, chunk_size, rollups)
+    if rollups:
+        update_rollups(con)
+    if fingerprint is not None:
+        record_quarter(con, fingerprint, rows)
+    con.commit()
+
+    elapsed = time.perf_counter() - start
+    print(f"{folder}: {rows} rows in {elapsed:.1f}s, peak rss {peak_rss_mb():.0f} MB")
+    return rows
+
+
+def ingest_parallel(
+    folders, con, cur, workers, fingerprints=None, rollups=True, chunk_size=10000
+):
+    """Parses and cleans the quarter folders in a pool of processes while this process is the only one writing to the database (sqlite only allows a single writer).
+        Every worker streams its cleaned quarter into a temporary parquet file and the writer streams those back out into the db in folder order, so a later quarter always
+        wins a duplicate accession number no matter which worker finishes first.
+    Args:
+        folders (list[str]): quarter folders to load
+        con (sqlite3.Connection): connection to the database, every quarter gets committed as its own transaction
+        cur (sqlite3.Cursor): cursor for the connection
+        workers (int): number of worker processes
+        fingerprints (dict): manifest entry for each folder, recorded in the same transaction as its rows
+        rollups (bool): update the rollup tables after each quarter
+        chunk_size (int): number of rows in each batch that gets inserted
+    Returns:
+        int: total number of rows inserted
+    """
+    fingerprints = fingerprints or {}
+    total = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        with worker_pool(workers) as pool:
+            jobs = [
+                pool.submit(clean_folder, folder, os.path.join(tmp, f"{i}.parquet"))
+                for i, folder in enumerate(folders)
+            ]
+            # waiting on the jobs in the order they were submitted, the workers keep parsing the later quarters meanwhile
+            for job in jobs:
+                folder, path, parse_time, worker_rss = job.result()
+                start = time.perf_counter()
+                rows = insert_frame(
+                    pl.scan_parquet(path), con, cur, chunk_size, rollups
+                )
+                if rollups:
+                    update_rollups(con)
+                if folder in fingerprints:
+                    record_quarter(con, fingerprints[folder], rows)
+                con.commit()
+                os.remove(path)
+                total += rows
+                print(
+                    f"{folder}: {rows} rows, parsed in {parse_time:.1f}s (worker peak rss {worker_rss:.0f} MB), "
+                    f"inserted in {time.perf_counter() - start:.1f}s"
+                )
+    return total
+
+
+def worker_pool(workers):
+    # every worker runs its own polars thread pool, split the cores between them instead of oversubscribing. has to be set before the workers import polars
+    os.environ.setdefault(
+        "POLARS_MAX_THREADS", str(max(1, (os.cpu_count() or 1) // workers))
+    )
+    # polars is multithreaded so forking it is not safe, spawn fresh interpreters instead
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def write_parquet_store(folders, out_dir, workers, force=False):
+    """Parquet backend: writes every quarter as its own parquet file sorted by ticker then filing date, with small row groups. The min / max statistics of each row group
+        let the dashboard skip straight to the few row groups holding a ticker (see storage.py). Unlike sqlite there is no single writer so the workers write their files directly.
+    Args:
+        folders (list[str]): quarter folders to write
+        out_dir (str): folder the parquet files go in, one <quarter>.parquet per folder
+        workers (int): number of worker processes, 1 runs everything in this process
+        force (bool): rewrite quarters that already have a parquet file
+    Returns:
+        int: total number of rows written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for folder in folders:
+        path = os.path.join(
+            out_dir, os.path.basename(os.path.normpath(folder)) + ".parquet"
+        )
+        if os.path.exists(path) and not force:
+            print(f"{folder}: {path} already exists, skipping")
+            continue
+        jobs.append((folder, path))
+
+    if workers <= 1:
+        results = [write_parquet_quarter(folder, path) for folder, path in jobs]
+    else:
+        with worker_pool(workers) as pool:
+            results = list(pool.map(write_parquet_quarter, *zip(*jobs))) if jobs else []
+
+    for folder, rows, elapsed, rss in results:
+        print(f"{folder}: {rows} rows in {elapsed:.1f}s, peak rss {rss:.0f} MB")
+    return sum(result[1] for result in results)
+
+
+# rows per parquet row group, small enough that a ticker lookup only decodes a few of them
+PARQUET_ROW_GROUP = 16384
+
+
+def write_parquet_quarter(folder, path):
+    start = time.perf_counter()
+    # write next to the real file and swap it in at the end so a crash never leaves a half written quarter behind
+    tmp = path + ".tmp"
+    get_combined_frame(folder).sort("ISSUERTRADINGSYMBOL", "FILING_DATE").sink_parquet(
+        tmp, row_group_size=PARQUET_ROW_GROUP, statistics=True, engine="streaming"
+    )
+    os.replace(tmp, path)
+    rows = pl.scan_parquet(path).select(pl.len()).collect().item()
+    return folder, rows, time.perf_counter() - start, peak_rss_mb()
+
+
+# runs in a worker process -> cleans one quarter and streams the result into a parquet file for the writer to pick up
+def clean_folder(folder, out_path):
+    start = time.perf_counter()
+    get_combined_frame(folder).sink_parquet(out_path, engine="streaming")
+    return folder, out_path, time.perf_counter() - start, peak_rss_mb()
+
+
+# streams the frame into the db in record batches, order of the rows doesnt matter for the db so the engine can hand back batches in whatever order they finish.
+# track=False skips recording the touched ticker / days, for bulk loads that rebuild the rollups at the end anyway
+def insert_frame(lf: pl.LazyFrame, con, cur, chunk_size=10000, track=True):
+    rows = 0
+    for chunk in lf.collect_batches(
+        chunk_size=chunk_size, maintain_order=False, engine="streaming"
+    ):
+        insert_chunk(chunk, con, cur, track)
+        rows += len(chunk)
+    return rows
+
+
+# builds the full query plan for a quarter -> nothing is read from disk until the frame is collected
+def get_combined_frame(folder) -> pl.LazyFrame:
+    final_trans = get_trans_frame(os.path.join(folder, "NONDERIV_TRANS.tsv"))
+    sub_df = get_sub_frame(os.path.join(folder, "SUBMISSION.tsv"))
+    return sub_df.join(final_trans, on="ACCESSION_NUMBER")
+
+
+# high water mark of the memory used by this process, ru_maxrss is in KB on linux but bytes on mac
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
 
 
 # handles getting transaction data from .tsv file and processing the data before adding to the database
-def get_trans_frame(path) -> pl.DataFrame:
+def get_trans_frame(path, vectorized=True) -> pl.LazyFrame:
     trans_cols = [
         "ACCESSION_NUMBER",
         "TRANS_SHARES",
@@ -47,15 +393,16 @@ def get_trans_frame(path) -> pl.DataFrame:
         "TRANS_ACQUIRED_DISP_CD",
         "SHRS_OWND_FOLWNG_TRANS",
     ]
-    trans_df: pl.DataFrame = get_frame(path, trans_cols)
+    trans_df: pl.LazyFrame = get_frame(path, trans_cols)
     trans_df = trans_df.filter(pl.col("TRANS_PRICEPERSHARE") > 0)
-    # process dups and concat them back with the non dups
-    final_trans = df_dups(trans_df)
-    return final_trans
+    # process dups (vectorized=False runs the old per group loop, which needs the data in memory)
+    if vectorized:
+        return df_dups(trans_df)
+    return df_dups_loop(trans_df.collect()).lazy()
 
 
 # handles getting submission data from .tsv and processing the data before submission to the database
-def get_sub_frame(path) -> pl.DataFrame:
+def get_sub_frame(path) -> pl.LazyFrame:
     sub_cols = ["ACCESSION_NUMBER", "FILING_DATE", "ISSUERTRADINGSYMBOL"]
     sub_df = get_frame(path, sub_cols)
     # remove all non letters in tickers
@@ -86,25 +433,341 @@ def get_sub_frame(path) -> pl.DataFrame:
     return sub_df
 
 
-# helper function that handles optimized insertion into the DB
-def insert_chunk(df: pl.DataFrame, con: sqlite3.Connection, cur: sqlite3.Cursor):
-    data = df.to_numpy()
-    query = f"INSERT INTO insider_data (ACCESSION_NUMBER, FILING_DATE, ISSUERTRADINGSYMBOL, TRANS_SHARES, TRANS_PRICEPERSHARE, TRANS_ACQUIRED_DISP_CD, SHRS_OWND_FOLWNG_TRANS) VALUES (?, ?, ?, ?, ?, ?, ?)"
-    cur.executemany(query, data)
+# helper function that handles optimized insertion into the DB. rows come straight out of the arrow buffers as tuples (no numpy object array in between),
+# committing is left to the caller so a whole quarter goes in as one transaction. a filing that is already in the db gets updated instead of duplicated
+def insert_chunk(
+    df: pl.DataFrame, con: sqlite3.Connection, cur: sqlite3.Cursor, track=True
+):
+    df = df.with_columns(pl.col("FILING_DATE").dt.to_string("%Y-%m-%d"))
+    query = """INSERT INTO insider_data (ACCESSION_NUMBER, FILING_DATE, ISSUERTRADINGSYMBOL, TRANS_SHARES, TRANS_PRICEPERSHARE, TRANS_ACQUIRED_DISP_CD, SHRS_OWND_FOLWNG_TRANS) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ACCESSION_NUMBER) DO UPDATE SET FILING_DATE = excluded.FILING_DATE, ISSUERTRADINGSYMBOL = excluded.ISSUERTRADINGSYMBOL, TRANS_SHARES = excluded.TRANS_SHARES,
+        TRANS_PRICEPERSHARE = excluded.TRANS_PRICEPERSHARE, TRANS_ACQUIRED_DISP_CD = excluded.TRANS_ACQUIRED_DISP_CD, SHRS_OWND_FOLWNG_TRANS = excluded.SHRS_OWND_FOLWNG_TRANS"""
+    cur.executemany(query, df.iter_rows())
+    # remember which ticker / day pairs changed so update_rollups only recomputes those
+    if track:
+        cur.executemany(
+            "INSERT OR IGNORE INTO temp.touched_days (ticker, filing_date) VALUES (?, ?)",
+            df.select("ISSUERTRADINGSYMBOL", "FILING_DATE").unique().iter_rows(),
+        )
+
+
+def ensure_schema(con: sqlite3.Connection):
+    """Makes sure the manifest table, the rollup tables, the unique index on ACCESSION_NUMBER and the (ticker, filing date) index exist. Databases loaded before the index existed can already hold the same filing
+    more than once, those copies are deleted (keeping the first one inserted) before the index is built. Rollup tables that did not exist yet get filled from the whole table once.
+    """
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS loaded_quarters (quarter TEXT PRIMARY KEY, trans_sha256 TEXT, sub_sha256 TEXT, file_bytes INTEGER, file_mtime REAL, row_count INTEGER, loaded_at TEXT)"""
+    )
+    track_touched_days(con)
+    has_unique = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_ACCESSION_NUMBER'"
+    ).fetchone()
+    if not has_unique:
+        print("removing duplicate filings and adding the unique ACCESSION_NUMBER index")
+        con.execute(
+            "DELETE FROM insider_data WHERE rowid NOT IN (SELECT MIN(rowid) FROM insider_data GROUP BY ACCESSION_NUMBER)"
+        )
+        con.execute(ACCESSION_INDEX)
+    has_date_index = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_TICKER_FILING_DATE'"
+    ).fetchone()
+    if not has_date_index:
+        print("adding the (ticker, filing date) index")
+        con.execute(TICKER_DATE_INDEX)
+    has_rollups = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'insider_daily'"
+    ).fetchone()
+    con.execute(ROLLUP_DAILY)
+    con.execute(ROLLUP_MONTHLY)
+    if not has_rollups:
+        print("building the daily / monthly rollup tables")
+        rebuild_rollups(con)
+    con.commit()
+
+
+# per connection scratch table insert_chunk fills with the ticker / days it wrote. an upsert can move a filing to another ticker or day,
+# the trigger records where it used to be so that day gets recomputed as well (no OR IGNORE in there, the outer upsert's conflict handling would override it)
+def track_touched_days(con: sqlite3.Connection):
+    con.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS touched_days (ticker TEXT, filing_date TEXT, PRIMARY KEY (ticker, filing_date))"
+    )
+    con.execute(
+        """CREATE TEMP TRIGGER IF NOT EXISTS track_moved_filings AFTER UPDATE OF ISSUERTRADINGSYMBOL, FILING_DATE ON main.insider_data
+        BEGIN INSERT INTO touched_days SELECT OLD.ISSUERTRADINGSYMBOL, OLD.FILING_DATE
+        WHERE NOT EXISTS (SELECT 1 FROM touched_days WHERE ticker = OLD.ISSUERTRADINGSYMBOL AND filing_date = OLD.FILING_DATE); END"""
+    )
+
+
+# materialized per ticker aggregates of buy / sell volume the dashboard reads instead of grouping the raw filings on every page load.
+# value columns are shares * price per share (dollar volume). filing_date / month are YYYY-MM-DD strings like insider_data, month is the first of the month
+ROLLUP_DAILY = """CREATE TABLE IF NOT EXISTS insider_daily (ticker TEXT, filing_date TEXT, buy_shares REAL, sell_shares REAL, buy_value REAL, sell_value REAL, filings INTEGER,
+    PRIMARY KEY (ticker, filing_date)) WITHOUT ROWID"""
+ROLLUP_MONTHLY = """CREATE TABLE IF NOT EXISTS insider_monthly (ticker TEXT, month TEXT, buy_shares REAL, sell_shares REAL, buy_value REAL, sell_value REAL, filings INTEGER,
+    PRIMARY KEY (ticker, month)) WITHOUT ROWID"""
+
+DAILY_AGGREGATES = """SUM(CASE WHEN TRANS_ACQUIRED_DISP_CD = 'A' THEN TRANS_SHARES ELSE 0 END), SUM(CASE WHEN TRANS_ACQUIRED_DISP_CD = 'D' THEN TRANS_SHARES ELSE 0 END),
+    SUM(CASE WHEN TRANS_ACQUIRED_DISP_CD = 'A' THEN TRANS_SHARES * TRANS_PRICEPERSHARE ELSE 0 END), SUM(CASE WHEN TRANS_ACQUIRED_DISP_CD = 'D' THEN TRANS_SHARES * TRANS_PRICEPERSHARE ELSE 0 END),
+    COUNT(*)"""
+MONTHLY_FROM_DAILY = """INSERT INTO insider_monthly SELECT ticker, substr(filing_date, 1, 8) || '01', SUM(buy_shares), SUM(sell_shares), SUM(buy_value), SUM(sell_value), SUM(filings)
+    FROM insider_daily {where} GROUP BY 1, 2"""
+
+
+def update_rollups(con: sqlite3.Connection):
+    """Recomputes the rollup rows for every ticker / day written since the last call (tracked in temp.touched_days), straight from insider_data so reloading
+    a quarter never double counts. Monthly rows are rebuilt from the daily table for the tickers involved. Runs inside the caller's transaction.
+    """
+    con.execute(
+        "DELETE FROM insider_daily WHERE (ticker, filing_date) IN (SELECT ticker, filing_date FROM temp.touched_days)"
+    )
+    con.execute(
+        f"""INSERT INTO insider_daily SELECT d.ISSUERTRADINGSYMBOL, d.FILING_DATE, {DAILY_AGGREGATES}
+        FROM temp.touched_days t JOIN insider_data d ON d.ISSUERTRADINGSYMBOL = t.ticker AND d.FILING_DATE = t.filing_date GROUP BY 1, 2"""
+    )
+    tickers = "WHERE ticker IN (SELECT DISTINCT ticker FROM temp.touched_days)"
+    con.execute(f"DELETE FROM insider_monthly {tickers}")
+    con.execute(MONTHLY_FROM_DAILY.format(where=tickers))
+    con.execute("DELETE FROM temp.touched_days")
+
+
+# throws the rollups away and builds them again with one pass over insider_data (end of a bulk load, or --rebuild-rollups)
+def rebuild_rollups(con: sqlite3.Connection):
+    start = time.perf_counter()
+    con.execute("DELETE FROM insider_daily")
+    con.execute("DELETE FROM insider_monthly")
+    con.execute(
+        f"INSERT INTO insider_daily SELECT ISSUERTRADINGSYMBOL, FILING_DATE, {DAILY_AGGREGATES} FROM insider_data GROUP BY 1, 2"
+    )
+    con.execute(MONTHLY_FROM_DAILY.format(where=""))
+    con.execute("DELETE FROM temp.touched_days")
     con.commit()
+    print(f"rebuilt rollup tables in {time.perf_counter() - start:.1f}s")
+
+
+# per ticker screener signals for a few trailing windows ending at the newest filing, rebuilt from the whole table after every load (see compute_signals).
+# one secondary index per signal, highest first, so the screener's ranked read is a walk down the front of an index and never a sort.
+# (the primary key columns sit at the end of every index entry of a WITHOUT ROWID table, which is what breaks ties by ticker)
+SIGNAL_WINDOWS = [30, 90, 365]
+SIGNALS = ["cluster_buys", "net_value", "buy_sell_ratio", "buy_gap_days"]
+SIGNALS_TABLE = """CREATE TABLE IF NOT EXISTS insider_signals (window_days INTEGER, ticker TEXT, as_of TEXT, cluster_buys INTEGER, sells INTEGER, net_value REAL,
+    buy_sell_ratio REAL, buy_gap_days INTEGER, last_filing TEXT, PRIMARY KEY (window_days, ticker)) WITHOUT ROWID"""
+SIGNAL_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_signals_{signal} ON insider_signals(window_days, {signal} DESC, ticker)"
+    for signal in SIGNALS
+]
+# only the columns the signals need, shares * price is done by sqlite so one value per filing comes back instead of two
+SIGNAL_SOURCE = """SELECT ISSUERTRADINGSYMBOL, FILING_DATE, TRANS_ACQUIRED_DISP_CD, TRANS_SHARES * TRANS_PRICEPERSHARE AS VALUE FROM {source}
+    WHERE ISSUERTRADINGSYMBOL IS NOT NULL AND FILING_DATE IS NOT NULL"""
 
 
-# little helper function to get the data from file
-def get_frame(path, cols):
+def compute_signals(lf: pl.LazyFrame, as_of=None) -> pl.DataFrame:
+    """Computes the screener signals for every ticker with a filing in each of the SIGNAL_WINDOWS, in one vectorized pass per window (group_by over the filings in the window
+        and over the ones before it, joined per ticker). The table has no insider names, so cluster buys counts buy filings (each one is a single insider's report)
+    Args:
+        lf (pl.LazyFrame): filings with ISSUERTRADINGSYMBOL, FILING_DATE (pl.Date), TRANS_ACQUIRED_DISP_CD and VALUE (shares * price per share)
+        as_of (datetime.date): last day of the windows, defaults to the newest filing (never later than today, a mistyped future date shouldnt move every window)
+    Returns:
+        pl.DataFrame: one row per window and ticker ->
+            cluster_buys    buy filings in the window
+            sells           sell filings in the window
+            net_value       dollars bought minus dollars sold in the window
+            buy_sell_ratio  buy filings per sell filing (sells counted as at least 1, so a ticker with only buys still ranks by its buy count)
+            buy_gap_days    days from the last buy before the window to the first buy in it (from the ticker's first filing if it never had one), null without a buy
+            last_filing     newest filing in the window
+    """
+    filings = lf.select(
+        ticker=pl.col("ISSUERTRADINGSYMBOL"),
+        day=pl.col("FILING_DATE"),
+        buy=pl.col("TRANS_ACQUIRED_DISP_CD") == "A",
+        sell=pl.col("TRANS_ACQUIRED_DISP_CD") == "D",
+        value=pl.col("VALUE").fill_null(0.0),
+    )
+    if as_of is None:
+        newest = filings.select(pl.col("day").max()).collect().item()
+        as_of = min(newest or datetime.date.today(), datetime.date.today())
+    filings = filings.filter(pl.col("day") <= as_of)
+
+    windows = []
+    for days in SIGNAL_WINDOWS:
+        start = as_of - datetime.timedelta(days=days - 1)
+        recent = (
+            filings.filter(pl.col("day") >= start)
+            .group_by("ticker")
+            .agg(
+                cluster_buys=pl.col("buy").sum(),
+                sells=pl.col("sell").sum(),
+                net_value=pl.col("value").filter("buy").sum()
+                - pl.col("value").filter("sell").sum(),
+                first_buy=pl.col("day").filter("buy").min(),
+                last_filing=pl.col("day").max(),
+            )
+        )
+        before = (
+            filings.filter(pl.col("day") < start)
+            .group_by("ticker")
+            .agg(
+                last_buy=pl.col("day").filter("buy").max(),
+                first_filing=pl.col("day").min(),
+            )
+        )
+        windows.append(
+            recent.join(before, on="ticker", how="left").select(
+                window_days=pl.lit(days, pl.Int64),
+                ticker=pl.col("ticker"),
+                as_of=pl.lit(as_of),
+                cluster_buys=pl.col("cluster_buys").cast(pl.Int64),
+                sells=pl.col("sells").cast(pl.Int64),
+                net_value=pl.col("net_value"),
+                buy_sell_ratio=pl.col("cluster_buys") / pl.max_horizontal("sells", 1),
+                buy_gap_days=(
+                    pl.col("first_buy")
+                    - pl.coalesce("last_buy", "first_filing", "first_buy")
+                ).dt.total_days(),
+                last_filing=pl.col("last_filing"),
+            )
+        )
+    # the windows are independent plans, collected together so polars runs them side by side
+    return pl.concat(pl.collect_all(windows)).sort("window_days", "ticker")
+
+
+def rebuild_signals(con: sqlite3.Connection, source="insider_data"):
+    """Recomputes the insider_signals table from every filing in source and commits it. The filings are read in batches straight into polars (4 columns, no pandas)
+
+    Args:
+        con (sqlite3.Connection): connection to the database the table is written to
+        source (str): table the filings are read from (migrateToV2.py reads the attached v1 file)
+    """
+    start = time.perf_counter()
+    batches = pl.read_database(
+        SIGNAL_SOURCE.format(source=source),
+        con,
+        iter_batches=True,
+        batch_size=1_000_000,
+        schema_overrides={"FILING_DATE": pl.String, "VALUE": pl.Float64},
+    )
+    # an empty table gives no batches at all, the typed empty frame in front keeps the columns
+    empty = pl.DataFrame(
+        schema={
+            "ISSUERTRADINGSYMBOL": pl.String,
+            "FILING_DATE": pl.String,
+            "TRANS_ACQUIRED_DISP_CD": pl.String,
+            "VALUE": pl.Float64,
+        }
+    )
+    filings = pl.concat([empty, *batches], how="vertical_relaxed").with_columns(
+        pl.col("FILING_DATE").str.to_date("%Y-%m-%d", strict=False)
+    )
+    signals = compute_signals(filings.lazy().drop_nulls("FILING_DATE"))
+    con.execute(SIGNALS_TABLE)
+    for index in SIGNAL_INDEXES:
+        con.execute(index)
+    con.execute("DELETE FROM insider_signals")
+    con.executemany(
+        "INSERT INTO insider_signals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        signals.with_columns(
+            pl.col("as_of", "last_filing").dt.to_string("%Y-%m-%d")
+        ).iter_rows(),
+    )
+    con.commit()
+    print(
+        f"rebuilt screener signals for {signals['ticker'].n_unique()} tickers in {time.perf_counter() - start:.1f}s"
+    )
+
+
+# parquet store: the signals go in their own folder so the ticker lookups (a *.parquet glob over the quarter files) never scan them
+def write_parquet_signals(out_dir):
+    start = time.perf_counter()
+    folder = os.path.join(out_dir, "signals")
+    os.makedirs(folder, exist_ok=True)
+    lf = pl.scan_parquet(os.path.join(out_dir, "*.parquet")).select(
+        "ISSUERTRADINGSYMBOL",
+        "FILING_DATE",
+        "TRANS_ACQUIRED_DISP_CD",
+        VALUE=pl.col("TRANS_SHARES") * pl.col("TRANS_PRICEPERSHARE"),
+    )
+    path = os.path.join(folder, "signals.parquet")
+    signals = compute_signals(lf.drop_nulls(["ISSUERTRADINGSYMBOL", "FILING_DATE"]))
+    signals.write_parquet(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    print(
+        f"rebuilt screener signals for {signals['ticker'].n_unique()} tickers in {time.perf_counter() - start:.1f}s"
+    )
+
+
+# the upsert in insert_chunk depends on this one so bulk loading leaves it alone
+ACCESSION_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_ACCESSION_NUMBER ON insider_data(ACCESSION_NUMBER)"
+
+# same indexes createRealDBtable.py makes, bulk loading drops them and builds them again once everything is in
+TICKER_INDEX = "CREATE INDEX IF NOT EXISTS idx_ISSUERTRADINGSYMBOL ON insider_data(ISSUERTRADINGSYMBOL)"
+# the insider table on the dashboard reads one page at a time in filing date order, this serves those reads (and the keyset lookups) straight from the index
+TICKER_DATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_TICKER_FILING_DATE ON insider_data(ISSUERTRADINGSYMBOL, FILING_DATE, ACCESSION_NUMBER)"
+
+
+def start_bulk_load(con: sqlite3.Connection):
+    """Puts the database into bulk load mode. The ticker indexes are dropped so inserts dont pay for index maintenance and journaling / fsyncs are turned off.
+    If the load dies part way through the database can be left corrupted, so only use this on a copy or a database you can rebuild.
+    """
+    con.execute("PRAGMA journal_mode = OFF")
+    con.execute("PRAGMA synchronous = OFF")
+    # negative cache size is in KB -> 1GB of page cache
+    con.execute("PRAGMA cache_size = -1048576")
+    con.execute("PRAGMA temp_store = MEMORY")
+    # changing temp_store drops every temp table, so the scratch table has to be made again
+    track_touched_days(con)
+    con.execute("PRAGMA locking_mode = EXCLUSIVE")
+    con.execute("DROP INDEX IF EXISTS idx_ISSUERTRADINGSYMBOL")
+    con.execute("DROP INDEX IF EXISTS idx_TICKER_FILING_DATE")
+    con.commit()
+
+
+# rebuilds the index and the rollup tables in one pass over the table each and puts the normal durability settings back
+def finish_bulk_load(con: sqlite3.Connection):
+    start = time.perf_counter()
+    con.execute(TICKER_INDEX)
+    con.execute(TICKER_DATE_INDEX)
+    con.commit()
+    print(f"rebuilt indexes in {time.perf_counter() - start:.1f}s")
+    rebuild_rollups(con)
+    con.execute("PRAGMA journal_mode = DELETE")
+    con.execute("PRAGMA synchronous = FULL")
+    con.execute("PRAGMA locking_mode = NORMAL")
+    # the exclusive lock is only dropped the next time the file is read
+    con.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+
+
+# little helper function to get the data from file, stays lazy so the rest of the processing gets pushed into the scan
+def get_frame(path, cols) -> pl.LazyFrame:
     desired_columns = cols
     lazyframe1 = pl.scan_csv(path, separator="\t")
-    df = lazyframe1.select(desired_columns).collect()
-    return df
+    return lazyframe1.select(desired_columns)
+
+
+def df_dups(lf):
+    """This function takes in a lazy frame containing the transaction data. All of the rows sharing an ACCESSION_NUMBER get collapsed into one by summing the TRANS_SHARES
+        and the SHRS_OWND_FOLWNG_TRANS columns and averaging the trans_pricepershare column of the duplicates. This is done with a single group_by/agg over the lazy frame
+        instead of looping over every group so it can run inside the streaming engine. Rows without a duplicate come out untouched, same as df_dups_loop.
+    Args:
+        lf (pl.LazyFrame): initial transaction data freshly scanned from the tsv file
+    Returns:
+        pl.LazyFrame: A frame with one row per ACCESSION_NUMBER
+    """
+    is_dup = pl.len() > 1
+
+    # only rows that actually have duplicates get summed / averaged, a lone row keeps its original values (including nulls)
+    def collapse(col, agg):
+        return pl.when(is_dup).then(agg).otherwise(pl.col(col).first()).alias(col)
+
+    return lf.group_by("ACCESSION_NUMBER").agg(
+        collapse("TRANS_SHARES", pl.col("TRANS_SHARES").sum()),
+        # averaged price is rounded to 2 decimals
+        collapse("TRANS_PRICEPERSHARE", pl.col("TRANS_PRICEPERSHARE").mean().round(2)),
+        pl.col("TRANS_ACQUIRED_DISP_CD").first(),
+        collapse("SHRS_OWND_FOLWNG_TRANS", pl.col("SHRS_OWND_FOLWNG_TRANS").sum()),
+    )
 
 
-def df_dups(df):
-    """This function takes in a dataframe containing the transaction data. It splits the data frame into 2 - dups and non dups. All of the dups get processed by summing the TRANS_SHARES
-        and the SHRS_OWND_FOLWNG_TRANS columns and averaging the trans_pricepershare column of the duplicates.
+def df_dups_loop(df):
+    """Original implementation of df_dups which processes each group of duplicates one at a time. It concats every processed group onto a growing frame so it is quadratic in the
+        number of duplicate groups, kept around as the reference implementation for support_scripts/benchmarks.py
     Args:
         df (_type_): initial transaction data freshly read in from the tsv file
     Returns:
@@ -138,7 +801,7 @@ def df_dups(df):
     return final_df
 
 
-# helper function to df_dups
+# helper function to df_dups_loop
 def process_group(group):
     first_row = group.head(1)  # Get the first row of each group
     return pl.DataFrame(
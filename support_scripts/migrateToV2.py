@@ -0,0 +1,116 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import eventStudy
+import getTransData
+
+"""
+Builds a v2 copy of the insider database. getTransData.py keeps loading the v1 layout (one text row per filing, ticker and date stored as strings and a rowid table
+with two indexes on top) and this script turns a loaded real.db into the compact layout the dashboard reads fastest:
+    tickers          -> one row per ticker symbol, the filings refer to it by its integer id (dictionary encoding, 1-2 bytes per row instead of the symbol)
+    insider_filings  -> filing date as days since 1970-01-01 (an integer, 2 bytes) and buy / sell as 1 / 0 (stored in the record header, no payload at all).
+                        WITHOUT ROWID with the primary key (ticker_id, filing_day, accession), so the table itself is the clustered index: a ticker's filings sit
+                        next to each other in date order and a lookup is one range read with no index -> table hops
+The rollup and screener signal tables are rebuilt from the source so read_monthly_volume and read_signals work the same on both, the event study tables are copied. PRAGMA user_version = 2 marks the file, storage.py reads whichever layout
+it finds. Rerun it after loading new quarters into the v1 database, it always writes the whole v2 file (into a temporary file that replaces --dst at the end).
+"""
+
+SCHEMA_VERSION = 2
+
+CREATE_TICKERS = (
+    "CREATE TABLE tickers (ticker_id INTEGER PRIMARY KEY, symbol TEXT NOT NULL UNIQUE)"
+)
+CREATE_FILINGS = """CREATE TABLE insider_filings (ticker_id INTEGER NOT NULL, filing_day INTEGER NOT NULL, accession TEXT NOT NULL, shares REAL, price REAL,
+    acquired INTEGER, owned_after REAL, PRIMARY KEY (ticker_id, filing_day, accession)) WITHOUT ROWID"""
+
+# the filings go in primary key order so the b-tree is written left to right and every page ends up full
+COPY_FILINGS = """INSERT INTO insider_filings SELECT t.ticker_id, CAST(julianday(d.FILING_DATE) - 2440587.5 AS INTEGER), d.ACCESSION_NUMBER, d.TRANS_SHARES,
+    d.TRANS_PRICEPERSHARE, CASE d.TRANS_ACQUIRED_DISP_CD WHEN 'A' THEN 1 WHEN 'D' THEN 0 END, d.SHRS_OWND_FOLWNG_TRANS
+    FROM src.insider_data d JOIN tickers t ON t.symbol = d.ISSUERTRADINGSYMBOL
+    WHERE d.FILING_DATE IS NOT NULL AND d.ACCESSION_NUMBER IS NOT NULL ORDER BY 1, 2, 3"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Copy a v1 insider database (getTransData.py) into the compact v2 layout the dashboard can read"
+    )
+    parser.add_argument("--src", default="real.db", help="v1 database to read")
+    parser.add_argument("--dst", default="real_v2.db", help="v2 database to write")
+    args = parser.parse_args()
+    if not os.path.exists(args.src):
+        exit(f"{args.src} doesnt exist")
+    if os.path.abspath(args.src) == os.path.abspath(args.dst):
+        exit("--dst has to be a different file than --src")
+    start = time.perf_counter()
+    rows, skipped = migrate(args.src, args.dst)
+    print(
+        f"copied {rows} filings into {args.dst} in {time.perf_counter() - start:.1f}s ({skipped} without a ticker, date or accession number left out)"
+    )
+    print(
+        f"{args.src} {os.path.getsize(args.src) / 1e6:.1f} MB -> {args.dst} {os.path.getsize(args.dst) / 1e6:.1f} MB"
+    )
+
+
+def migrate(src, dst):
+    """Writes the v2 database for a v1 one
+
+    Args:
+        src (str): v1 database, only read
+        dst (str): where the v2 database goes, replaced if it exists
+
+    Returns:
+        tuple[int, int]: filings copied, filings left out (no ticker, filing date or accession number, they cant go in the primary key)
+    """
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    # nothing here needs to survive a crash, the temporary file is just thrown away
+    con.execute("PRAGMA journal_mode = OFF")
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("ATTACH DATABASE ? AS src", (f"file:{os.path.abspath(src)}?mode=ro",))
+    con.execute(CREATE_TICKERS)
+    con.execute(CREATE_FILINGS)
+    # ids handed out in symbol order, so sorting by ticker_id is sorting by ticker
+    con.execute(
+        "INSERT INTO tickers (symbol) SELECT DISTINCT ISSUERTRADINGSYMBOL FROM src.insider_data WHERE ISSUERTRADINGSYMBOL IS NOT NULL ORDER BY 1"
+    )
+    con.execute(COPY_FILINGS)
+    rows = con.execute("SELECT COUNT(*) FROM insider_filings").fetchone()[0]
+    total = con.execute("SELECT COUNT(*) FROM src.insider_data").fetchone()[0]
+
+    con.execute(getTransData.ROLLUP_DAILY)
+    con.execute(getTransData.ROLLUP_MONTHLY)
+    con.execute(
+        f"""INSERT INTO insider_daily SELECT ISSUERTRADINGSYMBOL, FILING_DATE, {getTransData.DAILY_AGGREGATES} FROM src.insider_data
+        WHERE ISSUERTRADINGSYMBOL IS NOT NULL GROUP BY 1, 2"""
+    )
+    con.execute(getTransData.MONTHLY_FROM_DAILY.format(where=""))
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    con.commit()
+    # the screener signals keep the ticker symbols, the table is small and storage.read_signals reads it the same way in both layouts
+    getTransData.rebuild_signals(con, source="src.insider_data")
+    # the event study results (eventStudy.py) are keyed by ticker symbol and copied over as they are, if it has been run on the source
+    for create, table in [
+        (eventStudy.RETURNS_TABLE, "insider_event_returns"),
+        (eventStudy.STATS_TABLE, "insider_event_stats"),
+    ]:
+        if con.execute(
+            "SELECT 1 FROM src.sqlite_master WHERE type = 'table' AND name = ?",
+            (table,),
+        ).fetchone():
+            con.execute(create)
+            con.execute(f"INSERT INTO {table} SELECT * FROM src.{table}")
+    con.commit()
+    con.execute("DETACH DATABASE src")
+    con.execute("ANALYZE")
+    con.commit()
+    con.close()
+    os.replace(tmp, dst)
+    return rows, total - rows
+
+
+if __name__ == "__main__":
+    main()